@@ -1,12 +1,22 @@
+import hashlib
+import os
+from collections import Counter
 import dash_leaflet as dl
+import flask
 from dash_extensions.enrich import DashProxy, html, Input, Output, State, dcc, callback_context
-from dash_extensions.javascript import arrow_function, assign
+from dash_extensions.javascript import Namespace, arrow_function
 import dash
-import plotly.express as px
-import pandas as pd
+import numpy as np
+from utils.startup import (LAZY_STARTUP, lazy_module, load_lazy_modules, startup_checkpoint, startup_complete,
+                           startup_phases, track_first_request)
 from utils.data_loader import data_loader
 from utils.geo_utils import set_data_loader, get_available_years, get_default_year
 
+# Графики и таблицы нужны только панели аналитики: модули загружаются при первом построении
+px = lazy_module("plotly.express")
+pd = lazy_module("pandas")
+startup_checkpoint("import")
+
 set_data_loader(data_loader)
 
 from utils.geo_utils import reload_data_types
@@ -14,6 +24,7 @@ reload_data_types()
 
 AVAILABLE_YEARS = get_available_years()
 DEFAULT_YEAR = get_default_year()
+startup_checkpoint("data")
 
 from utils.geo_utils import (
     load_geojson_with_detail,
@@ -27,14 +38,29 @@ from utils.geo_utils import (
     DETAIL_LEVELS,
     CASES,
     DEFAULT_CASE,
+    legend_cache,
     get_filtered_data_types,
     get_delta_legend_info_for_shares,
     get_available_years,
     get_default_year,
     set_data_loader,
     reload_data_types,
-    get_legend_info_with_adjustment
+    get_legend_info_with_adjustment,
+    get_feature_names,
+    get_geometry_json,
+    compute_feature_values,
+    compute_color_bins,
+    get_data_version
 )
+from utils.comparison import delta_cache
+from utils.compression import compressed_cache, compression_bytes, compression_counts, install_compression
+from utils.metrics import install_metrics, metrics
+from utils.result_cache import ResultCache
+from utils.shared_cache import shared_cache
+from utils.indicators import ABSOLUTE_INDICATORS, PRODUCTION_INDICATORS
+from utils.sector_structure import get_share_series, share_cache, structure_cache
+from utils.static_snapshots import install_static_snapshots
+from utils.warmup import WARMUP_STATES, WARMUP_TOP_N, load_states_file, warmup
 from assets.analitics import CASE_ANALYTICS
 
 # Конфигурация карты
@@ -53,110 +79,76 @@ MAP_CONFIG = {
     }
 }
 
-# JavaScript функция для стилей
-style_handle = assign("""function(feature, context){
-    const {classes, colorscale, style, colorProp, categorical, labels} = context.hideout;
-    const value = feature.properties[colorProp];
-    const noDataColor = '#d3d3d3';
-
-    if (value === undefined || value === null) {
-        return {...style, fillColor: noDataColor, fillOpacity: 0.3};
-    }
+# Режим обновления карты:
+#   "vectors" - геометрия загружается браузером один раз по URL (с HTTP-кэшем),
+#               при смене данных передаются только векторы значений в hideout;
+#   "full"    - каждый ответ содержит полный GeoJSON со свойствами.
+MAP_UPDATE_MODE = os.environ.get("MAP_UPDATE_MODE", "vectors")
 
-    if (categorical === true && labels && Array.isArray(labels)) {
-        const index = labels.indexOf(value);
-        if (index >= 0 && index < colorscale.length) {
-            return {
-                ...style, 
-                fillColor: colorscale[index], 
-                fillOpacity: 0.7,
-                weight: 2,
-                color: "#333",
-                opacity: 1
-            };
-        } else {
-            return {
-                ...style, 
-                fillColor: noDataColor, 
-                fillOpacity: 0.3,
-                weight: 2,
-                color: "#333", 
-                opacity: 1
-            };
-        }
-    }
+# Базовые годы пересчета цен в списке "Цены в ценах"
+PRICE_ADJUSTMENT_YEARS = ["2023", "2020", "2015", "2010", "2005", "2000"]
 
-    if (colorProp === "delta") {
-        const numValue = Number(value);
-        if (isNaN(numValue)) {
-            return {...style, fillColor: noDataColor, fillOpacity: 0.3};
-        }
+LAYER_FILES = {
+    "regions": "assets/russia_regions_pf.geojson",
+    "districts": "assets/russia_districts_pf.geojson"
+}
 
-        let colorIndex = 0;
-        for (let i = 0; i < classes.length - 1; i++) {
-            if (numValue >= classes[i] && numValue < classes[i + 1]) {
-                colorIndex = i;
-                break;
-            }
-        }
+# Кэш готовых ответов карты по состоянию (слой, детализация, показатель, годы, режимы);
+# сбрасывается при смене версии данных
+MAP_CACHE_MAX_BYTES = int(os.environ.get("MAP_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+map_payload_cache = ResultCache(MAP_CACHE_MAX_BYTES, version_fn=get_data_version)
 
-        if (numValue >= classes[classes.length - 1]) {
-            colorIndex = colorscale.length - 1;
-        }
+# Подписи и единицы измерения показателей для подсказок в браузере
+INDICATOR_META = {
+    meta.type: {"label": meta.label, "unit": meta.unit, "absolute": meta.absolute}
+    for meta in data_loader.get_indicator_registry().values()
+}
 
-        if (numValue < classes[0]) {
-            colorIndex = 0;
-        }
+# Функция стиля объектов карты - в assets/map_style.js
+style_handle = Namespace("mapStyle")("style")
 
-        const finalColor = colorscale[colorIndex];
-        return {...style, fillColor: finalColor, fillOpacity: 0.7};
-    }
+# Имя модуля передается явно: иначе Dash ищет его по стеку вызовов (inspect.stack), что заметно замедляет запуск
+app = DashProxy(__name__, suppress_callback_exceptions=True)
+server = app.server
 
-    if (colorProp === "none") {
-        return style;
-    }
+_geometry_versions = {}
 
-    const numValue = Number(value);
-    if (isNaN(numValue)) {
-        return {...style, fillColor: noDataColor, fillOpacity: 0.3};
-    }
 
-    let colorIndex = -1;
-    for (let i = 0; i < classes.length - 1; i++) {
-        if (numValue >= classes[i] && numValue < classes[i + 1]) {
-            colorIndex = i;
-            break;
-        }
-    }
+def get_geometry_url(layer, detail_level):
+    # Версия в URL позволяет браузеру кэшировать геометрию без ограничения срока
+    key = (layer, detail_level)
+    if key not in _geometry_versions:
+        payload = get_geometry_json(LAYER_FILES[layer], DETAIL_LEVELS[detail_level]["value"])
+        _geometry_versions[key] = hashlib.sha1(payload).hexdigest()[:12]
+    return app.get_relative_path(f"/geometry/{layer}/{detail_level}.json?v={_geometry_versions[key]}")
 
-    if (colorIndex === -1 && numValue >= classes[classes.length - 1]) {
-        colorIndex = colorscale.length - 1;
-    }
 
-    if (numValue < classes[0]) {
-        colorIndex = 0;
-    }
+@server.route("/geometry/<layer>/<detail_level>.json")
+def serve_geometry(layer, detail_level):
+    if layer not in LAYER_FILES or detail_level not in DETAIL_LEVELS:
+        flask.abort(404)
+    payload = get_geometry_json(LAYER_FILES[layer], DETAIL_LEVELS[detail_level]["value"])
+    response = flask.Response(payload, mimetype="application/json")
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
-    if (colorIndex >= 0 && colorIndex < colorscale.length) {
-        return {
-            ...style, 
-            fillColor: colorscale[colorIndex], 
-            fillOpacity: 0.7,
-            weight: 2,
-            color: "#333",
-            opacity: 1
-        };
-    }
 
-    return {...style, fillColor: noDataColor, fillOpacity: 0.3};
-}""")
+# STATIC_SNAPSHOTS=1: готовые состояния карты браузер загружает из статического снимка
+static_maps_config = install_static_snapshots(server, get_data_version(), MAP_UPDATE_MODE, app.get_relative_path)
 
-app = DashProxy(suppress_callback_exceptions=True)
-server = app.server
+startup_checkpoint("app")
 
-# Начальные данные
-initial_geojson = load_geojson_with_detail("assets/russia_regions_pf.geojson", DETAIL_LEVELS["high"]["value"], DEFAULT_YEAR)
+# Начальные данные; при LAZY_STARTUP карта получает их первым callback'ом после загрузки страницы
 legend_info = get_legend_info("none")
+initial_geojson = None
+initial_geometry_url = None
+if not LAZY_STARTUP:
+    if MAP_UPDATE_MODE == "vectors":
+        initial_geometry_url = get_geometry_url("regions", "high")
+    else:
+        initial_geojson = load_geojson_with_detail(LAYER_FILES["regions"], DETAIL_LEVELS["high"]["value"],
+                                                   DEFAULT_YEAR)
+startup_checkpoint("initial_map")
 
 def create_empty_analytics():
     return html.Div([
@@ -274,6 +266,7 @@ app.layout = html.Div([
                 dl.TileLayer(id="tile-layer"),
                 dl.GeoJSON(
                     data=initial_geojson,
+                    url=initial_geometry_url,
                     style=style_handle,
                     hoverStyle=arrow_function(dict(
                         weight=5,
@@ -425,15 +418,8 @@ app.layout = html.Div([
                               style={"fontSize": "12px", "marginRight": "8px", "color": "black", "fontWeight": "bold"}),
                     dcc.Dropdown(
                         id="price-adjustment-dropdown",
-                        options=[
-                            {"label": "текущих", "value": "none"},
-                            {"label": "2023 г.", "value": "2023"},
-                            {"label": "2020 г.", "value": "2020"},
-                            {"label": "2015 г.", "value": "2015"},
-                            {"label": "2010 г.", "value": "2010"},
-                            {"label": "2005 г.", "value": "2005"},
-                            {"label": "2000 г.", "value": "2000"},
-                        ],
+                        options=[{"label": "текущих", "value": "none"}] +
+                                [{"label": f"{year} г.", "value": year} for year in PRICE_ADJUSTMENT_YEARS],
                         value="none",
                         clearable=False,
                         style={
@@ -517,36 +503,33 @@ app.layout = html.Div([
     dcc.Store(id="comparison-mode", data="absolute"),
     dcc.Store(id="value-display-mode", data="absolute"),
     dcc.Store(id="price-adjustment-year", data="none"),
+    dcc.Store(id="map-layer", data="regions"),
+    dcc.Store(id="map-state-key", data=None),
+    dcc.Store(id="static-maps", data=static_maps_config),
+    dcc.Store(id="map-static-miss", data=None),
     dcc.Store(id="first-visit", data=True),
+    dcc.Store(id="indicator-meta", data=INDICATOR_META),
     welcome_modal,
     case_modal,
 ], className="map-container", id="main-container")
+startup_checkpoint("layout")
 
 # Вспомогательные функции
 def get_regions_data(region_names, data_type, year, is_regions=True, adjustment_year="none"):
-    regions_data = {}
-    for region_name in region_names:
-        years_data = {}
-        for data_year in AVAILABLE_YEARS:
-            indicator_data = data_loader.get_indicator_data(data_type, data_year, is_regions)
-            if region_name in indicator_data:
-                value = indicator_data[region_name]
-                if adjustment_year != "none" and adjustment_year is not None and data_type not in ["population", "none"]:
-                    try:
-                        from utils.price_adjuster import price_adjuster
-                        target_year = int(adjustment_year)
-                        adjusted_value = price_adjuster.adjust_value(
-                            value, region_name, data_year, target_year, is_regions
-                        )
-                        years_data[data_year] = adjusted_value
-                    except Exception:
-                        years_data[data_year] = value
-                else:
-                    years_data[data_year] = value
-            else:
-                years_data[data_year] = 0
-        regions_data[region_name] = {data_type: years_data}
-    return regions_data
+    """Таблица регионы × годы выбранного показателя (пропуски - 0)"""
+    region_names = list(dict.fromkeys(region_names))
+    base_year = None
+    if adjustment_year != "none" and adjustment_year is not None and data_type not in ["population", "none"]:
+        base_year = int(adjustment_year)
+
+    values, mask = data_loader.get_indicator_matrix(data_type, region_names, AVAILABLE_YEARS, is_regions, base_year)
+    values[~mask] = 0
+    return pd.DataFrame(values, index=pd.Index(region_names, name='Регион'), columns=AVAILABLE_YEARS)
+
+def _year_values(regions_data, year):
+    if year in regions_data.columns:
+        return regions_data[year]
+    return pd.Series(0.0, index=regions_data.index)
 
 def create_summary_tab(regions_data, data_type, year, adjustment_year="none"):
     data_list = []
@@ -554,22 +537,17 @@ def create_summary_tab(regions_data, data_type, year, adjustment_year="none"):
     if adjustment_year != "none":
         adjustment_info = f" (в ценах {adjustment_year} г.)"
 
-    for region, data in regions_data.items():
-        value = data.get(data_type, {}).get(year, 0)
-        available_indicators = data_loader.get_available_indicators()
-        indicator_meta = next((ind for ind in available_indicators if ind["type"] == data_type), None)
-        unit = indicator_meta["unit"] if indicator_meta else ""
+    indicator_meta = data_loader.get_indicator_meta(data_type)
+    unit = indicator_meta.unit if indicator_meta else ""
 
-        data_list.append({
-            'Регион': region,
-            'Значение': round(value, 2),
-            'Единица измерения': unit
-        })
-
-    if not data_list:
+    df = pd.DataFrame({
+        'Регион': regions_data.index,
+        'Значение': _year_values(regions_data, year).round(2).to_numpy(),
+        'Единица измерения': unit
+    })
+    if df.empty:
         return html.Div("Нет данных для выбранных регионов")
 
-    df = pd.DataFrame(data_list)
     total_value = df['Значение'].sum()
     avg_value = df['Значение'].mean()
     max_value = df['Значение'].max()
@@ -608,28 +586,18 @@ def create_summary_tab(regions_data, data_type, year, adjustment_year="none"):
         table
     ])
 
-def create_charts_tab(regions_data, data_type, year, adjustment_year="none"):
+def create_charts_tab(regions_data, data_type, year, adjustment_year="none", is_regions=True):
     chart_data = []
     adjustment_info = ""
     if adjustment_year != "none":
         adjustment_info = f" (в ценах {adjustment_year} г.)"
 
-    for region_name, data in regions_data.items():
-        for y in AVAILABLE_YEARS:
-            value = data.get(data_type, {}).get(y, 0)
-            chart_data.append({
-                'Регион': region_name,
-                'Год': y,
-                'Значение': value
-            })
-
-    if not chart_data:
+    if regions_data.empty:
         return html.Div("Нет данных для построения графиков")
 
-    df = pd.DataFrame(chart_data)
-    available_indicators = data_loader.get_available_indicators()
-    indicator_meta = next((ind for ind in available_indicators if ind["type"] == data_type), None)
-    indicator_label = indicator_meta["label"] if indicator_meta else "Показатель"
+    df = regions_data.melt(ignore_index=False, var_name='Год', value_name='Значение').reset_index()
+    indicator_meta = data_loader.get_indicator_meta(data_type)
+    indicator_label = indicator_meta.label if indicator_meta else "Показатель"
 
     charts = []
 
@@ -640,23 +608,14 @@ def create_charts_tab(regions_data, data_type, year, adjustment_year="none"):
     charts.append(dcc.Graph(figure=trend_fig, style={'marginBottom': '20px'}))
 
     # График динамики долей для производственных показателей
-    production_indicators = ["mining_industry", "manufacturing_industry", "agriculture", "services", "water_supply", "energy_supply"]
-    if data_type in production_indicators:
-        shares_chart_data = []
-        for region_name in regions_data.keys():
-            for y in AVAILABLE_YEARS:
-                current_value = regions_data[region_name].get(data_type, {}).get(y, 0)
-                total_data = data_loader.get_indicator_data("total_volume", y, True)
-                region_total = total_data.get(region_name, 1)
-                if region_total > 0:
-                    share = (current_value / region_total) * 100
-                else:
-                    share = 0
-                shares_chart_data.append({
-                    'Регион': region_name,
-                    'Год': y,
-                    'Доля, %': share
-                })
+    if data_type in PRODUCTION_INDICATORS:
+        region_names = list(regions_data.index)
+        shares = np.nan_to_num(get_share_series(data_type, region_names, AVAILABLE_YEARS, is_regions))
+        shares_chart_data = [
+            {'Регион': region_name, 'Год': y, 'Доля, %': float(shares[i, j])}
+            for i, region_name in enumerate(region_names)
+            for j, y in enumerate(AVAILABLE_YEARS)
+        ]
         if shares_chart_data:
             shares_df = pd.DataFrame(shares_chart_data)
             shares_fig = px.line(shares_df, x='Год', y='Доля, %', color='Регион',
@@ -679,22 +638,16 @@ def create_rankings_tab(regions_data, data_type, year, adjustment_year="none"):
     if adjustment_year != "none":
         adjustment_info = f" (в ценах {adjustment_year} г.)"
 
-    data_list = []
-    for region, data in regions_data.items():
-        value = data.get(data_type, {}).get(year, 0)
-        data_list.append({
-            'Регион': region,
-            'Значение': round(value, 2)
-        })
-
-    if not data_list:
+    if regions_data.empty:
         return html.Div("Нет данных для рейтингов")
 
-    df = pd.DataFrame(data_list)
-    available_indicators = data_loader.get_available_indicators()
-    indicator_meta = next((ind for ind in available_indicators if ind["type"] == data_type), None)
-    unit = indicator_meta["unit"] if indicator_meta else ""
-    indicator_label = indicator_meta["label"] if indicator_meta else "Показатель"
+    df = pd.DataFrame({
+        'Регион': regions_data.index,
+        'Значение': _year_values(regions_data, year).round(2).to_numpy()
+    })
+    indicator_meta = data_loader.get_indicator_meta(data_type)
+    unit = indicator_meta.unit if indicator_meta else ""
+    indicator_label = indicator_meta.label if indicator_meta else "Показатель"
 
     value_ranking = df.nlargest(min(10, len(df)), 'Значение')[['Регион', 'Значение']].reset_index(drop=True)
     value_ranking['Ранг'] = value_ranking.index + 1
@@ -805,10 +758,12 @@ def create_legend_content(legend_info, year, compare_year=None, display_mode="ab
 
 def get_legend_data(data_type, compare_year, comparison_mode, display_mode, is_regions, adjustment_year="none", target_year=None):
     if compare_year != "none":
-        if display_mode == "relative" and data_type != "total_volume" and data_type not in ["salary", "gdp", "gdp_per_capita", "population"]:
-            legend_info = get_delta_legend_info_for_shares(data_type, compare_year, comparison_mode, is_regions)
+        if display_mode == "relative" and data_type != "total_volume" and data_type not in ABSOLUTE_INDICATORS:
+            legend_info = get_delta_legend_info_for_shares(data_type, compare_year, comparison_mode, is_regions,
+                                                           current_year=target_year)
         else:
-            legend_info = get_delta_legend_info(data_type, compare_year, comparison_mode, is_regions)
+            legend_info = get_delta_legend_info(data_type, compare_year, comparison_mode, is_regions,
+                                                current_year=target_year, adjustment_year=adjustment_year)
     else:
         legend_info = get_legend_info_with_adjustment(data_type, display_mode, is_regions, adjustment_year, target_year)
     return legend_info
@@ -830,75 +785,284 @@ def get_active_layer(regions_class, districts_class):
     file_path = "assets/russia_regions_pf.geojson" if is_regions else "assets/russia_districts_pf.geojson"
     return is_regions, file_path
 
+# Обновление карты разбито на этапы со своими ключами кэша; каждый запускается только
+# при изменении своих входов:
+#   состояние интерфейса - слой и хранилища выбора, в браузере (assets/map_state.js);
+#   геометрия - URL слоя, при смене слоя или детализации (режим "vectors");
+#   значения, легенда и классификация - при смене показателя, годов или режимов.
+# Счетчики: map_callback_calls - вызовы серверных callback'ов карты,
+# map_stage_runs - фактические вычисления этапов (промахи кэша).
+map_callback_calls = Counter()
+map_stage_runs = Counter()
+
+# Метрики всех callback'ов, кэшей и этапов карты - на странице METRICS_PATH (/metrics)
+metrics.register_cache("map_payload", map_payload_cache.stats)
+metrics.register_cache("shared", shared_cache.stats)
+metrics.register_cache("deltas", delta_cache.stats)
+metrics.register_cache("legends", legend_cache.stats)
+metrics.register_cache("sector_structures", structure_cache.stats)
+metrics.register_cache("sector_shares", share_cache.stats)
+metrics.register_counter("map_callback_calls", map_callback_calls, "callback")
+metrics.register_counter("map_stage_runs", map_stage_runs, "stage")
+metrics.register_gauge("startup_seconds", startup_phases, "phase")
+metrics.register_gauge("warmup_states", warmup.progress, "field")
+metrics.register_counter("prefetch", warmup.prefetch_counts, "result")
+metrics.register_cache("compressed", compressed_cache.stats)
+metrics.register_counter("compression", compression_counts, "result")
+metrics.register_counter("compression_bytes", compression_bytes, "stage")
+install_metrics(app)
+install_compression(app)
+track_first_request(server)
+
+
+def get_map_state_key(layer, data_type, year, compare_year, comparison_mode, display_mode, adjustment_year):
+    """Ключ состояния карты без параметров, не влияющих на результат"""
+    if compare_year == "none":
+        comparison_mode = None
+    return layer, data_type, year, compare_year, comparison_mode, display_mode, adjustment_year
+
+
+def get_map_legend(state_key):
+    """Этап легенды: (legend_info, содержимое легенды)"""
+    def build():
+        map_stage_runs["legend"] += 1
+        layer, data_type, year, compare_year, comparison_mode, display_mode, adjustment_year = state_key
+        legend_info = get_legend_data(data_type, compare_year, comparison_mode, display_mode, layer == "regions",
+                                      adjustment_year, year)
+        return legend_info, create_legend_content(legend_info, year, compare_year, display_mode, adjustment_year)
+
+    return map_payload_cache.get_or_compute(("legend",) + state_key, build)
+
+
+def get_map_values(state_key, detail_level):
+    """Этап значений: векторы по объектам карты ("vectors") или GeoJSON со свойствами ("full")"""
+    layer, data_type, year, compare_year, comparison_mode, display_mode, adjustment_year = state_key
+    file_path = LAYER_FILES[layer]
+
+    if MAP_UPDATE_MODE == "vectors":
+        # Упрощение сохраняет порядок объектов, поэтому векторы не зависят от детализации
+        key = ("values",) + state_key
+
+        def build():
+            map_stage_runs["values"] += 1
+            region_names = get_feature_names(file_path, DETAIL_LEVELS[detail_level]["value"])
+            return compute_feature_values(region_names, year, data_type, compare_year, comparison_mode,
+                                          display_mode, adjustment_year, layer == "regions")
+    else:
+        key = ("values", detail_level) + state_key
+
+        def build():
+            map_stage_runs["values"] += 1
+            return get_map_data(file_path, detail_level, year, data_type, compare_year, comparison_mode,
+                                display_mode, adjustment_year)
+
+    return map_payload_cache.get_or_compute(key, build)
+
+
+def get_map_hideout(state_key, detail_level):
+    """Этап классификации: hideout слоя (шкала, классы и в режиме "vectors" номера цветов)"""
+    def build():
+        map_stage_runs["classification"] += 1
+        data_type = state_key[1]
+        legend_info, _ = get_map_legend(state_key)
+        hideout = dict(
+            colorscale=legend_info["colorscale"],
+            classes=legend_info["classes"],
+            style=REGIONS_STYLE,
+            colorProp=legend_info["colorProp"]
+        )
+
+        if data_type == "dominant_sector" and legend_info.get("categorical"):
+            hideout["categorical"] = True
+            hideout["labels"] = legend_info["labels"]
+
+        if MAP_UPDATE_MODE == "vectors":
+            vectors = get_map_values(state_key, detail_level)
+            color_values = vectors["deltas"] if legend_info["colorProp"] == "delta" else vectors["values"]
+            if color_values is None:
+                color_values = [None] * len(vectors["values"])
+            hideout.update(vectors)
+            hideout["bins"] = compute_color_bins(color_values, legend_info)
+        return hideout
+
+    return map_payload_cache.get_or_compute(("classification",) + state_key, build)
+
+
+def build_map_payload(layer, detail_level, year, data_type, compare_year, comparison_mode, display_mode,
+                      adjustment_year):
+    """Данные карты, hideout и легенда для одного состояния карты"""
+    state_key = get_map_state_key(layer, data_type, year, compare_year, comparison_mode, display_mode,
+                                  adjustment_year)
+    geojson_data = dash.no_update if MAP_UPDATE_MODE == "vectors" else get_map_values(state_key, detail_level)
+    _, legend_content = get_map_legend(state_key)
+    return geojson_data, get_map_hideout(state_key, detail_level), legend_content
+
+def build_properties_patch(current_geojson, geojson_data):
+    """Patch для geojson.data: только изменившиеся поля properties, координаты не передаются"""
+    current_features = current_geojson["features"]
+    features = geojson_data["features"]
+    if len(current_features) != len(features):
+        return geojson_data
+
+    patch = dash.Patch()
+    for i, (current_feature, feature) in enumerate(zip(current_features, features)):
+        current_properties = current_feature.get("properties")
+        properties = feature.get("properties") or {}
+        if current_properties is None:
+            patch["features"][i]["properties"] = properties
+            continue
+        for field, value in properties.items():
+            if field not in current_properties or current_properties[field] != value:
+                patch["features"][i]["properties"][field] = value
+        for field in current_properties.keys() - properties.keys():
+            del patch["features"][i]["properties"][field]
+    return patch
+
+def get_prefetch_states(layer, detail_level, year, data_type, compare_year, comparison_mode, display_mode,
+                        adjustment_year):
+    """Вероятные следующие состояния карты: соседние годы текущего показателя"""
+    if data_type == "none" or year not in AVAILABLE_YEARS:
+        return []
+    pos = AVAILABLE_YEARS.index(year)
+    return [(layer, detail_level, AVAILABLE_YEARS[i], data_type, compare_year, comparison_mode, display_mode,
+             adjustment_year)
+            for i in (pos + 1, pos - 1) if 0 <= i < len(AVAILABLE_YEARS)]
+
+def get_warmup_states():
+    """Состояния для прогрева: из конфигурации, по статистике обращений или показатели кейсов по порядку"""
+    states = load_states_file(WARMUP_STATES) if WARMUP_STATES else warmup.stats.top(WARMUP_TOP_N)
+    if not states:
+        indicators = [indicator for case in CASES.values() for indicator in case["allowed_indicators"]]
+        states = [(indicator, DEFAULT_YEAR, "regions", "high") for indicator in dict.fromkeys(indicators)]
+    # Первым - состояние открытой страницы
+    states = list(dict.fromkeys([("none", DEFAULT_YEAR, "regions", "high")] + states))
+    # Записи о показателях, годах или слоях, которых уже нет, пропускаются
+    states = [state for state in states if state[0] in DATA_TYPES.keys() and state[1] in AVAILABLE_YEARS
+              and state[2] in LAYER_FILES and state[3] in DETAIL_LEVELS]
+    return [(layer, detail_level, year, data_type, "none", "absolute", "absolute", "none")
+            for data_type, year, layer, detail_level in states[:WARMUP_TOP_N]]
+
+warmup.configure(lambda state: build_map_payload(*state), get_warmup_states)
+
 # Callback'ы
-@app.callback(
-    [Output("geojson", "data"),
-     Output("geojson", "hideout"),
-     Output("map-legend", "children"),
-     Output("regions-label", "className"),
+# Состояние интерфейса: хранилища обновляются только при изменении своего входа,
+# поэтому аналитика и подсказка не пересчитываются при смене, например, режима сравнения
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="map_state", function_name="layer"),
+    [Output("regions-label", "className"),
      Output("districts-label", "className"),
-     Output("current-data-type", "data"),
+     Output("map-layer", "data")],
+    [Input("regions-label", "n_clicks"),
+     Input("districts-label", "n_clicks")],
+    State("map-layer", "data"),
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="map_state", function_name="sync"),
+    [Output("current-data-type", "data"),
      Output("current-year", "data"),
      Output("compare-year", "data"),
      Output("comparison-mode", "data"),
      Output("price-adjustment-year", "data")],
     [Input("data-type-dropdown", "value"),
      Input("year-dropdown", "value"),
-     Input("detail-dropdown", "value"),
-     Input("regions-label", "n_clicks"),
-     Input("districts-label", "n_clicks"),
      Input("compare-year-dropdown", "value"),
      Input("comparison-mode-radio", "value"),
-     Input("value-display-mode", "data"),
      Input("price-adjustment-dropdown", "value")],
-    [State("regions-label", "className"),
-     State("districts-label", "className"),
-     State("current-data-type", "data"),
-     State("current-year", "data"),
-     State("price-adjustment-year", "data")]
+    prevent_initial_call=True
 )
-def master_callback(data_type, year, detail_level, regions_clicks, districts_clicks,
-                    compare_year, comparison_mode, display_mode, adjustment_year,
-                    regions_class, districts_class, current_data_type, current_year, current_adjustment):
-    ctx = callback_context
-    if not ctx.triggered:
-        return dash.no_update, dash.no_update, dash.no_update, regions_class, districts_class, data_type, year, compare_year, comparison_mode, current_adjustment
-
-    trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
-
-    new_regions_class = regions_class
-    new_districts_class = districts_class
-
-    if trigger_id == "regions-label":
-        new_regions_class = "switch-label active"
-        new_districts_class = "switch-label"
-        is_regions = True
-    elif trigger_id == "districts-label":
-        new_regions_class = "switch-label"
-        new_districts_class = "switch-label active"
-        is_regions = False
-    else:
-        is_regions = "active" in regions_class
-
-    file_path = "assets/russia_regions_pf.geojson" if is_regions else "assets/russia_districts_pf.geojson"
-
-    geojson_data = get_map_data(file_path, detail_level, year, data_type, compare_year, comparison_mode, display_mode, adjustment_year)
-    legend_info = get_legend_data(data_type, compare_year, comparison_mode, display_mode, is_regions, adjustment_year, year)
 
-    hideout = dict(
-        colorscale=legend_info["colorscale"],
-        classes=legend_info["classes"],
-        style=REGIONS_STYLE,
-        colorProp=legend_info["colorProp"]
+if MAP_UPDATE_MODE == "vectors":
+    @app.callback(
+        Output("geojson", "url"),
+        [Input("map-layer", "data"),
+         Input("detail-dropdown", "value")],
+        State("geojson", "url"),
+        # Без начального URL (LAZY_STARTUP) геометрия запрашивается сразу после загрузки страницы
+        prevent_initial_call=not LAZY_STARTUP
+    )
+    def update_geometry(layer, detail_level, current_geometry_url):
+        # Геометрия уже в браузере: URL меняется только при смене слоя или детализации
+        map_callback_calls["geometry"] += 1
+        geometry_url = get_geometry_url(layer, detail_level)
+        if geometry_url == current_geometry_url:
+            return dash.no_update
+        map_stage_runs["geometry"] += 1
+        return geometry_url
+
+# Входы данных карты: слой, показатель, годы, режимы; в режиме "full" детализация меняет данные,
+# в режиме "vectors" - только геометрию
+MAP_DATA_INPUTS = [("map-layer", "data"), ("data-type-dropdown", "value"), ("year-dropdown", "value"),
+                   ("compare-year-dropdown", "value"), ("comparison-mode-radio", "value"),
+                   ("value-display-mode", "data"), ("price-adjustment-dropdown", "value")]
+MAP_DETAIL_INPUT = ("detail-dropdown", "value")
+
+if static_maps_config is not None:
+    # Статический снимок: браузер сам загружает состояние, сервер считает только промахи
+    app.clientside_callback(
+        dash.ClientsideFunction(namespace="static_maps", function_name="load"),
+        [Output("geojson", "data"),
+         Output("geojson", "hideout"),
+         Output("map-legend", "children"),
+         Output("map-state-key", "data"),
+         Output("map-static-miss", "data")],
+        [Input(*dependency) for dependency in MAP_DATA_INPUTS] +
+        [(Input if static_maps_config["with_detail"] else State)(*MAP_DETAIL_INPUT)],
+        State("static-maps", "data"),
+        prevent_initial_call=False
+    )
+    map_data_dependencies = dict(
+        output=[Output("geojson", "data", allow_duplicate=True),
+                Output("geojson", "hideout", allow_duplicate=True),
+                Output("map-legend", "children", allow_duplicate=True),
+                Output("map-state-key", "data", allow_duplicate=True)],
+        inputs=[Input("map-static-miss", "data")] +
+               [State(*dependency) for dependency in MAP_DATA_INPUTS + [MAP_DETAIL_INPUT, ("map-state-key", "data")]],
+        prevent_initial_call=True
+    )
+else:
+    map_data_dependencies = dict(
+        output=[Output("geojson", "data"),
+                Output("geojson", "hideout"),
+                Output("map-legend", "children"),
+                Output("map-state-key", "data")],
+        inputs=[Input(*dependency) for dependency in MAP_DATA_INPUTS] +
+               [(Input if MAP_UPDATE_MODE == "full" else State)(*MAP_DETAIL_INPUT), State("map-state-key", "data")]
     )
 
-    if data_type == "dominant_sector" and legend_info.get("categorical"):
-        hideout["categorical"] = True
-        hideout["labels"] = legend_info["labels"]
-
-    legend_content = create_legend_content(legend_info, year, compare_year, display_mode, adjustment_year)
-
-    return geojson_data, hideout, legend_content, new_regions_class, new_districts_class, data_type, year, compare_year, comparison_mode, adjustment_year
+def update_map_data(layer, data_type, year, compare_year, comparison_mode, display_mode, adjustment_year,
+                    detail_level, current_state_key):
+    map_callback_calls["map_data"] += 1
+    state_key = get_map_state_key(layer, data_type, year, compare_year, comparison_mode, display_mode,
+                                  adjustment_year)
+    stored_key = list(state_key) + ([detail_level] if MAP_UPDATE_MODE == "full" else [])
+    if stored_key == current_state_key:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    geojson_data, hideout, legend_content = build_map_payload(
+        layer, detail_level, year, data_type, compare_year, comparison_mode, display_mode, adjustment_year)
+
+    if data_type != "none":
+        warmup.stats.record((data_type, year, layer, detail_level))
+    warmup.prefetch(get_prefetch_states(layer, detail_level, year, data_type, compare_year, comparison_mode,
+                                        display_mode, adjustment_year))
+
+    # Полный GeoJSON - только при смене слоя или детализации, иначе изменения свойств объектов
+    if MAP_UPDATE_MODE == "full" and current_state_key and current_state_key[0] == layer \
+            and current_state_key[-1] == detail_level:
+        current_geojson = get_map_values(tuple(current_state_key[:-1]), detail_level)
+        geojson_data = build_properties_patch(current_geojson, geojson_data)
+
+    return geojson_data, hideout, legend_content, stored_key
+
+if static_maps_config is not None:
+    @app.callback(**map_data_dependencies)
+    def update_map_data_on_miss(miss, *args):
+        # Состояния нет в снимке (например, сравнение годов) - расчет на сервере
+        return update_map_data(*args)
+else:
+    app.callback(**map_data_dependencies)(update_map_data)
 
 @app.callback(
     [Output("absolute-value-label", "className"),
@@ -928,8 +1092,7 @@ def switch_display_mode(absolute_clicks, relative_clicks, absolute_class, relati
     Input("current-data-type", "data")
 )
 def toggle_value_switch(data_type):
-    production_indicators = ["mining_industry", "manufacturing_industry", "agriculture", "services", "water_supply", "energy_supply"]
-    return {"display": "flex", "marginLeft": "10px"} if data_type in production_indicators else {"display": "none"}
+    return {"display": "flex", "marginLeft": "10px"} if data_type in PRODUCTION_INDICATORS else {"display": "none"}
 
 @app.callback(
     [Output("data-type-dropdown", "options"),
@@ -1006,23 +1169,32 @@ def update_analytics_tab(active_tab, selected_regions, data_type, year, regions_
         return html.Div("Выберите регионы и тип данных для анализа")
 
     is_regions = "active" in regions_class
-    regions_data = get_regions_data(selected_regions, data_type, year, is_regions, adjustment_year)
-
-    if not regions_data:
-        return html.Div("Нет данных для выбранных регионов")
-
+    key = (active_tab, tuple(selected_regions), data_type, year, is_regions, str(adjustment_year), get_data_version())
     try:
-        if active_tab == "summary":
-            return create_summary_tab(regions_data, data_type, year, adjustment_year)
-        elif active_tab == "charts":
-            return create_charts_tab(regions_data, data_type, year, adjustment_year)
-        elif active_tab == "rankings":
-            return create_rankings_tab(regions_data, data_type, year, adjustment_year)
-        return html.Div("Выберите вкладку")
+        return shared_cache.get_or_compute(
+            "analytics", key,
+            lambda: create_analytics_tab(active_tab, selected_regions, data_type, year, is_regions, adjustment_year)
+        )
     except Exception as e:
         return html.Div(f"Ошибка при отображении аналитики: {str(e)}")
 
-@app.callback(
+def create_analytics_tab(active_tab, selected_regions, data_type, year, is_regions, adjustment_year):
+    regions_data = get_regions_data(selected_regions, data_type, year, is_regions, adjustment_year)
+
+    if regions_data.empty:
+        return html.Div("Нет данных для выбранных регионов")
+
+    if active_tab == "summary":
+        return create_summary_tab(regions_data, data_type, year, adjustment_year)
+    elif active_tab == "charts":
+        return create_charts_tab(regions_data, data_type, year, adjustment_year, is_regions)
+    elif active_tab == "rankings":
+        return create_rankings_tab(regions_data, data_type, year, adjustment_year)
+    return html.Div("Выберите вкладку")
+
+# Подсказка при наведении считается в браузере (assets/hover.js) - без запроса к серверу
+app.clientside_callback(
+    dash.ClientsideFunction(namespace="hover", function_name="render"),
     Output("hover-info", "children"),
     [Input("geojson", "hoverData"),
      Input("current-data-type", "data"),
@@ -1031,89 +1203,10 @@ def update_analytics_tab(active_tab, selected_regions, data_type, year, regions_
      Input("comparison-mode", "data"),
      Input("value-display-mode", "data"),
      Input("price-adjustment-year", "data")],
+    [State("geojson", "hideout"),
+     State("indicator-meta", "data")],
     prevent_initial_call=True
 )
-def update_hover_info(feature, data_type, year, compare_year, comparison_mode, display_mode, adjustment_year):
-    if not feature:
-        return html.Div("Наведите на регион для информации")
-
-    properties = feature.get('properties', {})
-    region_name = properties.get('name', 'Неизвестно')
-    adjustment_info = ""
-    if adjustment_year != "none":
-        adjustment_info = f" (в ценах {adjustment_year} г.)"
-
-    absolute_indicators = ["salary", "gdp", "gdp_per_capita", "population"]
-
-    if compare_year != "none" and compare_year is not None and 'delta' in properties:
-        delta = properties['delta']
-        if delta is not None:
-            if data_type in absolute_indicators:
-                if comparison_mode == "absolute":
-                    return html.Div([
-                        html.Strong(f"{region_name}"),
-                        html.Br(),
-                        f"{year} vs {compare_year}: {delta:+.0f} ед.{adjustment_info}"
-                    ])
-                else:
-                    return html.Div([
-                        html.Strong(f"{region_name}"),
-                        html.Br(),
-                        f"{year} vs {compare_year}: {delta:+.1f}%{adjustment_info}"
-                    ])
-            elif display_mode == "relative" and data_type != "total_volume":
-                return html.Div([
-                    html.Strong(f"{region_name}"),
-                    html.Br(),
-                    f"Изменение доли {year} vs {compare_year}: {delta:+.1f} п.п.{adjustment_info}"
-                ])
-            else:
-                unit = "ед." if comparison_mode == "absolute" else "%"
-                return html.Div([
-                    html.Strong(f"{region_name}"),
-                    html.Br(),
-                    f"{year} vs {compare_year}: {delta:+.1f} {unit}{adjustment_info}"
-                ])
-
-    elif data_type != "none":
-        value = properties.get(data_type)
-
-        if value is None:
-            return html.Div([
-                html.Strong(f"{region_name}"),
-                html.Br(),
-                "Нет данных"
-            ])
-
-        if display_mode == "relative":
-            display_text = f"{value:.1f}%"
-            label = "Доля"
-        else:
-            available_indicators = data_loader.get_available_indicators()
-            indicator_meta = next((ind for ind in available_indicators if ind["type"] == data_type), None)
-            unit = indicator_meta["unit"] if indicator_meta else "ед."
-
-            try:
-                if value == int(value):
-                    display_text = f"{value:,.0f} {unit}".replace(",", " ")
-                else:
-                    display_text = f"{value:,.1f} {unit}".replace(",", " ")
-            except (TypeError, ValueError):
-                display_text = f"{value} {unit}"
-
-            label = "Значение"
-
-        return html.Div([
-            html.Strong(f"{region_name} ({year} год){adjustment_info}"),
-            html.Br(),
-            f"{label}: {display_text}"
-        ])
-    else:
-        return html.Div([
-            html.Strong(f"{region_name}"),
-            html.Br(),
-            "Выберите тип данных"
-        ])
 
 @app.callback(
     [Output("case-description-modal", "className"),
@@ -1206,7 +1299,7 @@ def update_detail_description(detail_level_key):
         "high": "Максимальная детализация, рекомендуется для мощных компьютеров",
         "low": "Оптимальный баланс качества и производительности"
     }
-    return f"{level_info['label']} ({level_info['value'] * 100:.0f}%) - {descriptions[detail_level_key]}"
+    return f"{level_info['label']} ({level_info['value'] * 100:.0f}%) - {descriptions.get(detail_level_key, '')}"
 
 @app.callback(
     [Output("current-data-type", "data", allow_duplicate=True),
@@ -1244,5 +1337,10 @@ def manage_welcome_modal(close_clicks, start_clicks, main_id, first_visit):
 
     return "welcome-modal", first_visit
 
+startup_checkpoint("callbacks")
+startup_complete()
+
 if __name__ == "__main__":
+    load_lazy_modules()
+    warmup.start()
     app.run(debug=False, host='0.0.0.0', port=8050)
\ No newline at end of file
@@ -0,0 +1,127 @@
+// Подсказка при наведении на регион: считается в браузере без запроса к серверу.
+// Значения объекта берутся из его properties или, в режиме "vectors", из hideout по индексу;
+// подписи, единицы измерения и признаки показателей - из хранилища indicator-meta.
+
+(function () {
+    function component(type, children) {
+        const props = children === undefined ? {} : {children: children};
+        return {namespace: "dash_html_components", type: type, props: props};
+    }
+
+    function card(title, text) {
+        return component("Div", [component("Strong", title), component("Br"), text]);
+    }
+
+    // toFixed для неотрицательного числа с округлением точной середины к четному, как в Python
+    function fixed(value, digits) {
+        const text = value.toFixed(digits);
+        if (value >= 1e21) {
+            return text;
+        }
+        const [integer, fraction] = value.toFixed(100).split(".");
+        if (/^50*$/.test(fraction.slice(digits))) {
+            const last = digits > 0 ? fraction[digits - 1] : integer[integer.length - 1];
+            if (Number(last) % 2 === 0) {
+                return digits > 0 ? `${integer}.${fraction.slice(0, digits)}` : integer;
+            }
+        }
+        return text;
+    }
+
+    // Аналог f"{value:+.Nf}" в Python: знак всегда, включая "-0.0"
+    function signed(value, digits) {
+        const negative = value < 0 || Object.is(value, -0);
+        return (negative ? "-" : "+") + fixed(Math.abs(value), digits);
+    }
+
+    // Аналог f"{value:,.Nf}".replace(",", " ")
+    function grouped(value, digits) {
+        const negative = value < 0 || Object.is(value, -0);
+        const [integer, fraction] = fixed(Math.abs(value), digits).split(".");
+        const text = (negative ? "-" : "") + integer.replace(/\B(?=(\d{3})+(?!\d))/g, " ");
+        return fraction === undefined ? text : text + "." + fraction;
+    }
+
+    function featureProperties(feature, dataType, hideout) {
+        const properties = feature.properties || {};
+        const idx = properties.idx;
+        if (idx === undefined || idx === null || !hideout || !("values" in hideout)) {
+            return properties;
+        }
+
+        const result = Object.assign({}, properties);
+        if (dataType !== "none" && idx < hideout.values.length) {
+            result[dataType] = hideout.values[idx];
+        }
+        if (hideout.deltas !== undefined && hideout.deltas !== null && idx < hideout.deltas.length) {
+            result.delta = hideout.deltas[idx];
+        }
+        return result;
+    }
+
+    function render(feature, dataType, year, compareYear, comparisonMode, displayMode, adjustmentYear,
+                    hideout, indicatorMeta) {
+        if (!feature) {
+            return component("Div", "Наведите на регион для информации");
+        }
+
+        const properties = featureProperties(feature, dataType, hideout);
+        const regionName = properties.name !== undefined ? properties.name : "Неизвестно";
+        const adjustmentInfo = adjustmentYear !== "none" ? ` (в ценах ${adjustmentYear} г.)` : "";
+        const meta = (indicatorMeta || {})[dataType];
+
+        if (compareYear !== "none" && compareYear !== null && compareYear !== undefined && "delta" in properties) {
+            const delta = properties.delta;
+            if (delta === null || delta === undefined) {
+                return null;
+            }
+            if (meta && meta.absolute) {
+                if (comparisonMode === "absolute") {
+                    return card(regionName, `${year} vs ${compareYear}: ${signed(delta, 0)} ед.${adjustmentInfo}`);
+                }
+                return card(regionName, `${year} vs ${compareYear}: ${signed(delta, 1)}%${adjustmentInfo}`);
+            }
+            if (displayMode === "relative" && dataType !== "total_volume") {
+                return card(regionName, `Изменение доли ${year} vs ${compareYear}: ${signed(delta, 1)} п.п.${adjustmentInfo}`);
+            }
+            const unit = comparisonMode === "absolute" ? "ед." : "%";
+            return card(regionName, `${year} vs ${compareYear}: ${signed(delta, 1)} ${unit}${adjustmentInfo}`);
+        }
+
+        if (dataType === "none") {
+            return card(regionName, "Выберите тип данных");
+        }
+
+        const value = properties[dataType];
+        if (value === null || value === undefined) {
+            return card(regionName, "Нет данных");
+        }
+
+        let label;
+        let displayText;
+        if (displayMode === "relative") {
+            label = "Доля";
+            if (typeof value !== "number") {
+                displayText = `${value}%`;
+            } else {
+                displayText = `${(value < 0 || Object.is(value, -0)) ? "-" : ""}${fixed(Math.abs(value), 1)}%`;
+            }
+        } else {
+            const unit = meta ? meta.unit : "ед.";
+            if (typeof value !== "number") {
+                displayText = `${value} ${unit}`;
+            } else if (Number.isInteger(value)) {
+                displayText = `${grouped(value, 0)} ${unit}`;
+            } else {
+                displayText = `${grouped(value, 1)} ${unit}`;
+            }
+            label = "Значение";
+        }
+
+        return card(`${regionName} (${year} год)${adjustmentInfo}`, `${label}: ${displayText}`);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        hover: {render: render}
+    });
+})();
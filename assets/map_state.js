@@ -0,0 +1,46 @@
+// Состояние интерфейса карты: переключатель слоя и хранилища выбора пользователя.
+// Считается в браузере без запроса к серверу. Выход обновляется, только если изменился
+// его вход, - зависящие от хранилищ callback'и не запускаются лишний раз.
+
+(function () {
+    function noUpdate() {
+        return window.dash_clientside.no_update;
+    }
+
+    function triggeredIds() {
+        const context = window.dash_clientside.callback_context;
+        const triggered = (context && context.triggered) || [];
+        return triggered.map((item) => item.prop_id.split(".")[0]);
+    }
+
+    function layer(regionsClicks, districtsClicks, currentLayer) {
+        const triggered = triggeredIds();
+        let nextLayer = currentLayer;
+        if (triggered.includes("regions-label")) {
+            nextLayer = "regions";
+        } else if (triggered.includes("districts-label")) {
+            nextLayer = "districts";
+        }
+        if (nextLayer === currentLayer) {
+            return [noUpdate(), noUpdate(), noUpdate()];
+        }
+        return [
+            nextLayer === "regions" ? "switch-label active" : "switch-label",
+            nextLayer === "districts" ? "switch-label active" : "switch-label",
+            nextLayer
+        ];
+    }
+
+    // Порядок входов совпадает с порядком хранилищ на выходе
+    const SYNC_INPUTS = ["data-type-dropdown", "year-dropdown", "compare-year-dropdown",
+                         "comparison-mode-radio", "price-adjustment-dropdown"];
+
+    function sync(...values) {
+        const triggered = triggeredIds();
+        return SYNC_INPUTS.map((id, i) => triggered.includes(id) ? values[i] : noUpdate());
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        map_state: {layer: layer, sync: sync}
+    });
+})();
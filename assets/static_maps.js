@@ -0,0 +1,55 @@
+// Загрузка готовых состояний карты из статического снимка (python build_cache.py snapshots).
+// Файл состояния берется из HTTP-кэша браузера или со статического сервера; сервер Dash
+// получает запрос только при промахе - состояния нет в снимке (например, сравнение годов).
+// Путь файла строится так же, как в utils/static_snapshots.snapshot_name.
+
+(function () {
+    // Номер последнего запроса: ответ устаревшего запроса не перезаписывает карту
+    let latestRequest = 0;
+
+    function noUpdate() {
+        return window.dash_clientside.no_update;
+    }
+
+    function snapshotUrl(config, layer, detailLevel, dataType, year, adjustmentYear, displayMode) {
+        const detailPart = config.with_detail ? `${detailLevel}/` : "";
+        return `${config.base}${layer}/${detailPart}${dataType}/${year}_${adjustmentYear}_${displayMode}.json`;
+    }
+
+    async function load(layer, dataType, year, compareYear, comparisonMode, displayMode, adjustmentYear,
+                        detailLevel, config) {
+        const request = ++latestRequest;
+        // Промах: новое значение хранилища запускает расчет на сервере
+        const miss = [noUpdate(), noUpdate(), noUpdate(), noUpdate(), request];
+        if (!config || compareYear !== "none" || dataType === null || dataType === undefined) {
+            return miss;
+        }
+        let payload;
+        try {
+            const response = await fetch(snapshotUrl(config, layer, detailLevel, dataType, year,
+                                                     adjustmentYear, displayMode));
+            if (!response.ok) {
+                return request === latestRequest ? miss : miss.map(noUpdate);
+            }
+            payload = await response.json();
+        } catch (e) {
+            return request === latestRequest ? miss : miss.map(noUpdate);
+        }
+        if (request !== latestRequest) {
+            return miss.map(noUpdate);
+        }
+        // Ключ состояния сбрасывается: следующий ответ сервера придет целиком, а не изменениями
+        // относительно состояния, которого у клиента уже нет
+        return [
+            payload.data === null ? noUpdate() : payload.data,
+            payload.hideout,
+            payload.legend,
+            null,
+            noUpdate()
+        ];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        static_maps: {load: load}
+    });
+})();
@@ -0,0 +1,59 @@
+# Вызов callback'ов Dash тем же запросом, что отправляет браузер (POST /_dash-update-component)
+#
+# Callback выбирается по имени функции; входы и состояния передаются словарем
+# {"id.property": значение}, недостающие заполняются None.
+
+import json
+from typing import Dict, Iterable, Optional
+
+UPDATE_PATH = "/_dash-update-component"
+
+
+def _outputs(output: str):
+    if output.startswith(".."):
+        return [dict(zip(("id", "property"), item.rsplit(".", 1))) for item in output.strip(".").split("...")]
+    component_id, prop = output.rsplit(".", 1)
+    return {"id": component_id, "property": prop}
+
+
+class DashCallbacks:
+    def __init__(self, app):
+        self.app = app
+        self._dependencies = None
+
+    @property
+    def dependencies(self) -> Dict[str, Dict]:
+        """Зависимости серверных callback'ов по имени функции"""
+        if self._dependencies is None:
+            # Список callback'ов DashProxy заполняет при первом обращении к приложению
+            self.app.server.test_client().get("/_dash-dependencies")
+            by_name = {}
+            for output, callback in self.app.callback_map.items():
+                # Клиентские callback'и (assets/*.js) на сервер не обращаются
+                if callback.get("callback") is None:
+                    continue
+                name = getattr(callback["callback"], "__name__", output)
+                by_name[name] = {"output": output, "inputs": callback["inputs"], "state": callback["state"]}
+            self._dependencies = by_name
+        return self._dependencies
+
+    def names(self) -> Iterable[str]:
+        return self.dependencies.keys()
+
+    def build_request(self, name: str, values: Dict, changed: Optional[Iterable[str]] = None) -> Dict:
+        dependency = self.dependencies[name]
+
+        def fill(items):
+            return [{"id": item["id"], "property": item["property"],
+                     "value": values.get(f'{item["id"]}.{item["property"]}')} for item in items]
+
+        return {
+            "output": dependency["output"],
+            "outputs": _outputs(dependency["output"]),
+            "inputs": fill(dependency["inputs"]),
+            "state": fill(dependency["state"]),
+            "changedPropIds": list(changed or [])
+        }
+
+    def encode(self, name: str, values: Dict, changed: Optional[Iterable[str]] = None) -> bytes:
+        return json.dumps(self.build_request(name, values, changed)).encode("utf-8")
@@ -0,0 +1,457 @@
+# Нагрузочный тест: параллельные пользователи воспроизводят запросы callback'ов Dash
+#
+#   python benchmarks/loadtest.py                                   - в процессе (Flask test client)
+#   python benchmarks/loadtest.py --target gunicorn --workers 4     - через локальный gunicorn
+#   python benchmarks/loadtest.py --scenario years --concurrency 16 --duration 60
+#   python benchmarks/loadtest.py --replay session.jsonl            - записанная последовательность
+#
+# Каждый виртуальный пользователь ведет состояние страницы как браузер: начальные значения
+# берутся из /_dash-layout, ответы callback'ов записываются обратно, действия пользователя
+# порождают те же серверные callback'и, что и на странице. Подсказка при наведении считается
+# в браузере (assets/hover.js) и запросов к серверу не создает.
+#
+# Отчет: пропускная способность, p50/p95/p99 задержки по callback'ам, ошибки и память
+# процесса (в процессе) или каждого воркера gunicorn (RSS, PSS, USS из /proc).
+#
+# Формат --replay / --save-scenario - JSON Lines, по строке на запрос:
+#   {"callback": "<имя функции>", "changed": ["id.prop", ...], "values": {"id.prop": значение}}
+# values - изменения состояния страницы перед запросом; строка с полем "output" - готовое
+# тело запроса /_dash-update-component (например, скопированное из инструментов браузера).
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+SCENARIOS = ("mixed", "indicators", "years", "selection")
+
+
+# Состояние страницы
+
+def collect_layout_values(node, values: Dict):
+    """Начальные значения свойств всех компонентов с id из JSON макета Dash"""
+    if isinstance(node, list):
+        for item in node:
+            collect_layout_values(item, values)
+    elif isinstance(node, dict):
+        props = node.get("props")
+        if isinstance(props, dict):
+            component_id = props.get("id")
+            if isinstance(component_id, str):
+                for prop, value in props.items():
+                    if prop not in ("id", "children"):
+                        values[f"{component_id}.{prop}"] = value
+            for value in props.values():
+                if isinstance(value, (list, dict)):
+                    collect_layout_values(value, values)
+    return values
+
+
+def option_values(values: Dict, key: str) -> List:
+    return [option["value"] if isinstance(option, dict) else option for option in values.get(key) or []]
+
+
+def apply_response(session: Dict, payload: Dict):
+    for component_id, props in (payload.get("response") or {}).items():
+        for prop, value in props.items():
+            # Частичные обновления (Patch) меняют большие свойства, которые сценариям не нужны
+            if isinstance(value, dict) and "__dash_patch_update" in value:
+                continue
+            session[f"{component_id}.{prop}"] = value
+
+
+# Сценарии: последовательности действий пользователя и порождаемых ими callback'ов
+
+def _step(callback: str, changed: List[str], values: Optional[Dict] = None) -> Dict:
+    return {"callback": callback, "changed": changed, "values": values or {}}
+
+
+def indicator_switch(data_type, with_analytics: bool) -> List[Dict]:
+    steps = [_step("update_map_data", ["data-type-dropdown.value"],
+                   {"data-type-dropdown.value": data_type, "current-data-type.data": data_type}),
+             _step("toggle_value_switch", ["current-data-type.data"])]
+    if with_analytics:
+        steps.append(_step("update_analytics_tab", ["current-data-type.data"]))
+    return steps
+
+
+def year_change(year, with_analytics: bool) -> List[Dict]:
+    steps = [_step("update_map_data", ["year-dropdown.value"], {"year-dropdown.value": year, "current-year.data": year})]
+    if with_analytics:
+        steps.append(_step("update_analytics_tab", ["current-year.data"]))
+    return steps
+
+
+def region_click(region: str) -> List[Dict]:
+    return [_step("handle_region_selection", ["geojson.clickData"], {"geojson.clickData": {"properties": {"name": region}}}),
+            _step("update_analytics_tab", ["selected-regions.data"])]
+
+
+def build_scenario(name: str, layout_values: Dict, regions: List[str], rng: random.Random,
+                   length: int = 40) -> List[Dict]:
+    data_types = [value for value in option_values(layout_values, "data-type-dropdown.options") if value != "none"]
+    years = option_values(layout_values, "year-dropdown.options")
+    steps = []
+
+    if name in ("selection", "mixed"):
+        steps.extend(indicator_switch(rng.choice(data_types), False))
+        for region in rng.sample(regions, min(len(regions), 5)):
+            steps.extend(region_click(region))
+        for tab in ("charts", "rankings", "summary"):
+            steps.append(_step("update_analytics_tab", ["analytics-tabs.value"], {"analytics-tabs.value": tab}))
+
+    with_analytics = name != "indicators"
+    while len(steps) < length:
+        if name == "indicators" or (name == "mixed" and rng.random() < 0.5):
+            steps.extend(indicator_switch(rng.choice(data_types), with_analytics))
+        elif name in ("years", "mixed"):
+            # Перебор годов подряд - как при прокрутке списка
+            start = rng.randrange(len(years))
+            for year in years[start:] + years[:start]:
+                steps.extend(year_change(year, with_analytics))
+        else:
+            steps.extend(region_click(rng.choice(regions)))
+    return steps
+
+
+def load_replay(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Транспорт
+
+class InProcessTransport:
+    def __init__(self):
+        import app
+        from utils.startup import load_lazy_modules
+        # Как в wsgi.py: отложенные модули загружаются до параллельных запросов
+        load_lazy_modules()
+        self.app = app.app
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.server.test_client()
+        return client
+
+    def get(self, path: str) -> bytes:
+        return self._client().get(path).data
+
+    def post(self, path: str, body: bytes):
+        response = self._client().post(path, data=body, content_type="application/json")
+        return response.status_code, response.data
+
+    def pids(self) -> Dict[str, int]:
+        return {"process": os.getpid()}
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    def __init__(self, host: str, port: int, master_pid: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.master_pid = master_pid
+        self._local = threading.local()
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None):
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                headers = {"Content-Type": "application/json"} if body is not None else {}
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                # Воркер мог закрыть соединение - повтор через новое
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+    def get(self, path: str) -> bytes:
+        return self._request("GET", path)[1]
+
+    def post(self, path: str, body: bytes):
+        return self._request("POST", path, body)
+
+    def pids(self) -> Dict[str, int]:
+        if self.master_pid is None:
+            return {}
+        pids = {"master": self.master_pid}
+        for i, pid in enumerate(sorted(child_pids(self.master_pid))):
+            pids[f"worker-{i}"] = pid
+        return pids
+
+    def close(self):
+        pass
+
+
+class GunicornTransport(HTTPTransport):
+    """Локальный gunicorn с gunicorn.conf.py на свободном порту; останавливается в close()"""
+
+    def __init__(self, workers: int, preload: bool = True, startup_timeout: float = 120):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        env = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers),
+                   GUNICORN_PRELOAD="1" if preload else "0")
+        self.process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                                        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL)
+        super().__init__("127.0.0.1", port, self.process.pid)
+
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError("gunicorn завершился при запуске")
+            try:
+                self.get("/_dash-dependencies")
+                if len(child_pids(self.process.pid)) >= workers:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                self.close()
+                raise RuntimeError("gunicorn не запустился вовремя")
+            time.sleep(0.5)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+# Память процессов
+
+def child_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS и USS (частная память) процесса в МБ по /proc/<pid>/smaps_rollup"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[-1] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "uss_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1)
+    }
+
+
+# Запуск
+
+class LoadTest:
+    def __init__(self, transport, callbacks, layout_values: Dict, scenarios: List[List[Dict]],
+                 duration: Optional[float], iterations: Optional[int], think_time: float):
+        self.transport = transport
+        self.callbacks = callbacks
+        self.layout_values = layout_values
+        self.scenarios = scenarios
+        self.duration = duration
+        self.iterations = iterations
+        self.think_time = think_time
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _request(self, session: Dict, step: Dict):
+        if "output" in step:
+            name, body = step["output"], json.dumps(step).encode("utf-8")
+        else:
+            session.update(step.get("values") or {})
+            name = step["callback"]
+            body = self.callbacks.encode(name, session, step.get("changed"))
+
+        start = time.perf_counter()
+        try:
+            status, data = self.transport.post("/_dash-update-component", body)
+        except (http.client.HTTPException, OSError):
+            status, data = 0, b""
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.samples[name].append(elapsed)
+            self.bytes[name] += len(data)
+            if status not in (200, 204):
+                self.errors[name] += 1
+        if status == 200 and data:
+            apply_response(session, json.loads(data))
+
+    def _user(self, scenario: List[Dict], deadline: Optional[float]):
+        iteration = 0
+        while True:
+            session = dict(self.layout_values)
+            for step in scenario:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                self._request(session, step)
+                if self.think_time:
+                    time.sleep(self.think_time)
+            iteration += 1
+            if self.iterations is not None and iteration >= self.iterations:
+                return
+
+    def run(self) -> float:
+        deadline = time.monotonic() + self.duration if self.duration else None
+        threads = [threading.Thread(target=self._user, args=(scenario, deadline), daemon=True)
+                   for scenario in self.scenarios]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_report(test: LoadTest, elapsed: float, memory: Dict) -> Dict:
+    callbacks = {}
+    all_samples = []
+    for name, samples in sorted(test.samples.items()):
+        samples = sorted(samples)
+        all_samples.extend(samples)
+        callbacks[name] = {
+            "requests": len(samples),
+            "errors": test.errors.get(name, 0),
+            "bytes_per_request": round(test.bytes[name] / len(samples)),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "max_ms": round(samples[-1] * 1000, 2)
+        }
+    all_samples.sort()
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": len(all_samples),
+        "errors": sum(test.errors.values()),
+        "throughput_rps": round(len(all_samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(all_samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(all_samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(all_samples, 99) * 1000, 2),
+        "callbacks": callbacks,
+        "memory": memory
+    }
+
+
+def print_report(report: Dict):
+    print(f"\nЗапросов: {report['requests']} за {report['elapsed_s']} с, {report['throughput_rps']} запр/с, "
+          f"ошибок: {report['errors']}")
+    print(f"Все запросы: p50 {report['p50_ms']} мс, p95 {report['p95_ms']} мс, p99 {report['p99_ms']} мс\n")
+    print(f"{'callback':<28} {'запросов':>9} {'ошибок':>7} {'байт':>9} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for name, stats in report["callbacks"].items():
+        print(f"{name[:28]:<28} {stats['requests']:>9} {stats['errors']:>7} {stats['bytes_per_request']:>9} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    if report["memory"]:
+        print(f"\n{'процесс':<12} {'RSS, МБ':>9} {'PSS, МБ':>9} {'USS, МБ':>9}")
+        for name, memory in report["memory"].items():
+            print(f"{name:<12} {memory.get('rss_mb', 0):>9} {memory.get('pss_mb', 0):>9} {memory.get('uss_mb', 0):>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест callback'ов Dash")
+    parser.add_argument("--target", choices=("inprocess", "gunicorn", "url"), default="inprocess",
+                        help="inprocess - Flask test client, gunicorn - локальный gunicorn, url - запущенный сервер")
+    parser.add_argument("--url", default="127.0.0.1:8000", help="Адрес сервера для --target url (host:port)")
+    parser.add_argument("--workers", type=int, default=2, help="Число воркеров gunicorn")
+    parser.add_argument("--no-preload", action="store_true", help="gunicorn без preload_app")
+    parser.add_argument("--concurrency", type=int, default=4, help="Число одновременных пользователей")
+    parser.add_argument("--duration", type=float, default=20.0, help="Длительность теста, с")
+    parser.add_argument("--iterations", type=int, help="Число проходов сценария каждым пользователем "
+                                                       "(вместо --duration)")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="mixed", help="Синтетический сценарий")
+    parser.add_argument("--replay", help="Файл JSON Lines с последовательностью запросов")
+    parser.add_argument("--save-scenario", help="Сохранить сценарий первого пользователя в JSON Lines")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Пауза между запросами пользователя, с")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл отчета (JSON)")
+    args = parser.parse_args(argv)
+
+    os.chdir(PROJECT_ROOT)
+    os.environ.setdefault("SHARED_CACHE_BACKEND", "none")
+    # Синтетический трафик не должен попадать в статистику обращений для прогрева
+    os.environ.setdefault("WARMUP_STATS_PATH", "")
+    import app
+    from benchmarks.dash_client import DashCallbacks
+    from utils.geo_utils import get_feature_names
+
+    if args.target == "gunicorn":
+        transport = GunicornTransport(args.workers, preload=not args.no_preload)
+    elif args.target == "url":
+        host, _, port = args.url.rpartition(":")
+        transport = HTTPTransport(host or "127.0.0.1", int(port))
+    else:
+        transport = InProcessTransport()
+
+    try:
+        layout_values = collect_layout_values(json.loads(transport.get("/_dash-layout")), {})
+        layout_values.setdefault("analytics-tabs.value", "summary")
+        regions = get_feature_names(app.LAYER_FILES["regions"], app.DETAIL_LEVELS["high"]["value"])
+
+        if args.replay:
+            scenarios = [load_replay(args.replay)] * args.concurrency
+        else:
+            scenarios = [build_scenario(args.scenario, layout_values, regions, random.Random(args.seed + i))
+                         for i in range(args.concurrency)]
+        if args.save_scenario:
+            with open(args.save_scenario, "w", encoding="utf-8") as f:
+                for step in scenarios[0]:
+                    f.write(json.dumps(step, ensure_ascii=False) + "\n")
+
+        test = LoadTest(transport, DashCallbacks(app.app), layout_values, scenarios,
+                        None if args.iterations else args.duration, args.iterations, args.think_time)
+        print(f"Нагрузка: {args.target}, пользователей {args.concurrency}, сценарий "
+              f"{args.replay or args.scenario}, {f'{args.iterations} проходов' if args.iterations else f'{args.duration} с'}")
+        elapsed = test.run()
+        memory = {name: process_memory(pid) for name, pid in transport.pids().items()}
+    finally:
+        transport.close()
+
+    report = build_report(test, elapsed, memory)
+    report["config"] = {key: value for key, value in vars(args).items()}
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# Бенчмарки горячих путей: загрузка данных, показатели, доли и сектора, ИПЦ,
+# упрощение геометрии и callback карты целиком (HTTP-запрос Dash)
+#
+#   python benchmarks/run.py                        - замеры на исходных данных
+#   python benchmarks/run.py --scale 1 10 --annual  - плюс синтетические данные: регионы ×10, ежегодные годы
+#   python benchmarks/run.py --baseline old.json    - сравнение с сохраненным результатом
+#   python benchmarks/run.py --only callback        - только замеры, в имени которых есть подстрока
+#
+# Результат - JSON (по умолчанию benchmarks/results/latest.json): время одного вызова в секундах
+# (min / median / mean / stdev по --repeat сериям). С --baseline код возврата 1, если медиана
+# какого-либо замера выросла больше чем на --threshold.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+# Общий дисковый кэш подменил бы вычисления чтением готовых результатов
+os.environ.setdefault("SHARED_CACHE_BACKEND", "none")
+# Упреждающий расчет в фоне прогрел бы "холодные" замеры, а статистика обращений - не от пользователей
+os.environ.setdefault("PREFETCH_ENABLED", "0")
+os.environ.setdefault("WARMUP_STATS_PATH", "")
+
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, "latest.json")
+
+
+class Runner:
+    def __init__(self, repeat: int, min_time: float, only=None):
+        self.repeat = repeat
+        self.min_time = min_time
+        self.only = only or []
+        self.results = []
+
+    def run(self, name: str, params: dict, func):
+        if self.only and not any(pattern in name for pattern in self.only):
+            return
+        timer = timeit.Timer(func)
+        # Число вызовов в серии - такое, чтобы серия длилась не меньше min_time
+        number = 1
+        while True:
+            elapsed = timer.timeit(number)
+            if elapsed >= self.min_time or number >= 10 ** 6:
+                break
+            number = max(number * 2, int(number * self.min_time / max(elapsed, 1e-9) * 1.2))
+        samples = [elapsed / number] + [timer.timeit(number) / number for _ in range(self.repeat - 1)]
+
+        result = {
+            "name": name,
+            "params": params,
+            "number": number,
+            "repeat": self.repeat,
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "mean": statistics.mean(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0
+        }
+        self.results.append(result)
+        print(f"{name:<40} {_format_params(params):<60} {_format_time(result['median']):>10}")
+
+
+def _format_params(params: dict) -> str:
+    return " ".join(f"{key}={value}" for key, value in params.items())
+
+
+def _format_time(seconds: float) -> str:
+    for unit, factor in (("с", 1), ("мс", 1e-3), ("мкс", 1e-6)):
+        if seconds >= factor:
+            return f"{seconds / factor:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} нс"
+
+
+def _result_key(result: dict) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True, ensure_ascii=False)
+
+
+def bench_data_loader(runner: Runner):
+    from utils.data_loader import DataLoader
+    from utils.mmap_store import STORE_DIR, get_store_path, open_store
+
+    runner.run("data_loader.construct", {"source": "excel"}, lambda: DataLoader(use_cache=False))
+    runner.run("data_loader.construct", {"source": "cache"}, lambda: DataLoader())
+    store_path = get_store_path() or STORE_DIR
+    if open_store(store_path) is not None:
+        runner.run("data_loader.construct", {"source": "store"}, lambda: DataLoader(store_path=store_path))
+
+
+def datasets(scales, annual: bool):
+    """(параметры, DataLoader, PriceAdjuster) для исходных и синтетических данных"""
+    from benchmarks.synthetic import scale_cpi_arrays, scale_indicator_arrays
+    from utils.data_loader import DataLoader, data_loader
+    from utils.price_adjuster import PriceAdjuster, price_adjuster
+
+    for scale, is_annual in itertools.product(scales, [False, True] if annual else [False]):
+        params = {"scale": scale, "annual": is_annual}
+        if scale == 1 and not is_annual:
+            yield params, data_loader, price_adjuster
+            continue
+        arrays = scale_indicator_arrays(data_loader._store_arrays(), scale, is_annual)
+        loader = DataLoader(arrays=arrays)
+        adjuster = PriceAdjuster(arrays=scale_cpi_arrays(price_adjuster._cpi_arrays(), scale))
+        yield dict(params, arrays=arrays), loader, adjuster
+
+
+def bench_data(runner: Runner, scales, annual: bool):
+    from utils import geo_utils, sector_structure
+    from utils.data_loader import DataLoader
+
+    original_loader = geo_utils._get_data_loader()
+    for params, loader, adjuster in datasets(scales, annual):
+        arrays = params.pop("arrays", None)
+        if arrays is not None:
+            runner.run("data_loader.construct", dict(params, source="arrays"), lambda: DataLoader(arrays=arrays))
+
+        geo_utils.set_data_loader(loader)
+        sector_structure.clear_cache()
+        try:
+            year = loader.get_available_years()[-1]
+            first_year = loader.get_available_years()[0]
+            for is_regions in (True, False):
+                case = dict(params, regions=len(loader.get_region_ids(is_regions)), years=len(loader.available_years),
+                            is_regions=is_regions)
+
+                def indicator_cold():
+                    loader._indicator_dicts.clear()
+                    return loader.get_indicator_data("salary", year, is_regions)
+
+                def shares_cold():
+                    sector_structure.clear_cache()
+                    return geo_utils.calculate_relative_shares("mining_industry", year, is_regions)
+
+                def dominant_cold():
+                    sector_structure.clear_cache()
+                    return geo_utils.calculate_dominant_sector(year, is_regions)
+
+                runner.run("get_indicator_data", dict(case, cache="cold"), indicator_cold)
+                runner.run("get_indicator_data", dict(case, cache="warm"),
+                           lambda: loader.get_indicator_data("salary", year, is_regions))
+                runner.run("calculate_relative_shares", dict(case, cache="cold"), shares_cold)
+                runner.run("calculate_relative_shares", dict(case, cache="warm"),
+                           lambda: geo_utils.calculate_relative_shares("mining_industry", year, is_regions))
+                runner.run("calculate_dominant_sector", dict(case, cache="cold"), dominant_cold)
+
+                region = loader.get_region_ids(is_regions)[-1]
+                runner.run("calculate_cumulative_inflation", case,
+                           lambda: adjuster.calculate_cumulative_inflation(region, first_year, year, is_regions))
+                region_ids = loader.get_region_ids(is_regions)
+                runner.run("get_inflation_factors", case,
+                           lambda: adjuster.get_inflation_factors(region_ids, first_year, year, is_regions))
+        finally:
+            geo_utils.set_data_loader(original_loader)
+            sector_structure.clear_cache()
+
+
+def bench_geometry(runner: Runner, scales):
+    from benchmarks.synthetic import scale_features
+    from utils.geo_utils import DETAIL_LEVELS
+    from utils.geometry_build import GEOJSON_FILES, simplify_features
+
+    for file_path in GEOJSON_FILES:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "r", encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        for scale in scales:
+            scaled = scale_features(features, scale)
+            # Уровень 1.0 не упрощается - геометрия отдается как есть
+            for key, level in DETAIL_LEVELS.items():
+                if level["value"] >= 1.0:
+                    continue
+                runner.run("simplify_features",
+                           {"file": os.path.basename(file_path), "scale": scale, "features": len(scaled),
+                            "detail": key, "tolerance": level["value"]},
+                           lambda: simplify_features(scaled, level["value"]))
+
+
+def bench_callback(runner: Runner):
+    import app
+    from benchmarks.dash_client import UPDATE_PATH, DashCallbacks
+    from utils import sector_structure
+
+    callbacks = DashCallbacks(app.app)
+    client = app.server.test_client()
+    year = app.DEFAULT_YEAR
+
+    for layer, data_type, compare_year, display_mode, adjustment_year in itertools.product(
+            ["regions", "districts"], ["salary", "mining_industry", "dominant_sector"], ["none", 2010],
+            ["absolute", "relative"], ["none", "2015"]):
+        if data_type == "dominant_sector" and (compare_year != "none" or display_mode != "absolute"):
+            continue
+        values = {
+            "map-layer.data": layer, "data-type-dropdown.value": data_type, "year-dropdown.value": year,
+            "compare-year-dropdown.value": compare_year, "comparison-mode-radio.value": "relative",
+            "value-display-mode.data": display_mode, "price-adjustment-dropdown.value": adjustment_year,
+            "detail-dropdown.value": "high", "map-state-key.data": None
+        }
+        body = callbacks.encode("update_map_data", values, ["data-type-dropdown.value"])
+
+        def call():
+            response = client.post(UPDATE_PATH, data=body, content_type="application/json")
+            if response.status_code != 200:
+                raise RuntimeError(f"update_map_data: HTTP {response.status_code}")
+            return response
+
+        def call_cold():
+            app.map_payload_cache.clear()
+            sector_structure.clear_cache()
+            return call()
+
+        params = {"mode": app.MAP_UPDATE_MODE, "layer": layer, "data_type": data_type, "compare_year": compare_year,
+                  "display_mode": display_mode, "adjustment_year": adjustment_year}
+        runner.run("callback.update_map_data", dict(params, cache="cold"), call_cold)
+        runner.run("callback.update_map_data", dict(params, cache="warm"), call)
+
+
+def compare(results, baseline, threshold: float) -> int:
+    """Таблица изменений относительно baseline; возвращает число замедлений больше threshold"""
+    base = {_result_key(result): result for result in baseline.get("results", [])}
+    regressions = 0
+    print(f"\n{'замер':<40} {'параметры':<60} {'было':>10} {'стало':>10} {'изм.':>8}")
+    for result in results:
+        old = base.get(_result_key(result))
+        if old is None:
+            status, change = "новый", ""
+        else:
+            ratio = result["median"] / old["median"] if old["median"] else float("inf")
+            change = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio > 1 + threshold:
+                status = "ХУЖЕ"
+                regressions += 1
+            elif ratio < 1 / (1 + threshold):
+                status = "лучше"
+            else:
+                status = ""
+        print(f"{result['name']:<40} {_format_params(result['params']):<60} "
+              f"{_format_time(old['median']) if old else '-':>10} {_format_time(result['median']):>10} "
+              f"{change:>8} {status}")
+    print(f"\nЗамедлений больше {threshold:.0%}: {regressions}")
+    return regressions
+
+
+def _metadata(args) -> dict:
+    import numpy as np
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {"scale": args.scale, "annual": args.annual, "repeat": args.repeat, "min_time": args.min_time,
+                 "only": args.only}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих путей приложения")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1],
+                        help="Коэффициенты числа регионов для синтетических данных (1 - исходные данные)")
+    parser.add_argument("--annual", action="store_true", help="Дополнительно - данные с ежегодными годами")
+    parser.add_argument("--repeat", type=int, default=5, help="Число серий замера")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Минимальная длительность серии, с")
+    parser.add_argument("--only", nargs="+", help="Только замеры, в имени которых есть одна из подстрок")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Файл результата (JSON)")
+    parser.add_argument("--baseline", help="Сохраненный результат для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Допустимое замедление (доля, 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    # Пути к data/ и assets/ в приложении относительные
+    os.chdir(PROJECT_ROOT)
+    runner = Runner(args.repeat, args.min_time, args.only)
+    started = time.perf_counter()
+    bench_data_loader(runner)
+    bench_data(runner, args.scale, args.annual)
+    bench_geometry(runner, args.scale)
+    bench_callback(runner)
+
+    report = {"meta": _metadata(args), "results": runner.results}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nГотово: {len(runner.results)} замеров за {time.perf_counter() - started:.1f} с, результат - {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if compare(runner.results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# Синтетические наборы данных для бенчмарков: исходные данные, увеличенные в scale раз
+# по числу регионов и (annual=True) дополненные до ежегодного ряда.
+#
+# Копии регионов получают имена "<регион> #k" и значения исходного региона со случайным
+# множителем (генератор с фиксированным seed - наборы воспроизводимы).
+
+import json
+from typing import Dict, List
+
+import numpy as np
+
+COPY_SUFFIX = " #{}"
+
+
+def _copy_names(names, scale: int) -> List[str]:
+    names = [str(name) for name in names]
+    return names + [name + COPY_SUFFIX.format(k) for k in range(1, scale) for name in names]
+
+
+def _noise(rng: np.random.Generator, shape, scale: int) -> np.ndarray:
+    factors = rng.lognormal(0.0, 0.1, size=shape)
+    factors[..., :shape[-1] // scale] = 1.0
+    return factors
+
+
+def _interpolate_years(values: np.ndarray, mask: np.ndarray, years: List[int]):
+    """Ежегодный ряд: линейная интерполяция между соседними годами с данными"""
+    annual_years = list(range(years[0], years[-1] + 1))
+    annual_values = np.full(values.shape[:1] + (len(annual_years),) + values.shape[2:], np.nan)
+    annual_mask = np.zeros(annual_values.shape, dtype=bool)
+
+    for left, right in zip(range(len(years) - 1), range(1, len(years))):
+        start, end = years[left], years[right]
+        both = mask[:, left] & mask[:, right]
+        for year in range(start, end + 1):
+            weight = (year - start) / (end - start)
+            pos = year - years[0]
+            if year == start:
+                annual_values[:, pos], annual_mask[:, pos] = values[:, left], mask[:, left]
+            elif year == end:
+                annual_values[:, pos], annual_mask[:, pos] = values[:, right], mask[:, right]
+            else:
+                annual_values[:, pos] = np.where(both, values[:, left] * (1 - weight) + values[:, right] * weight,
+                                                 np.nan)
+                annual_mask[:, pos] = both
+    return annual_values, annual_mask, annual_years
+
+
+def scale_indicator_arrays(arrays: Dict[str, np.ndarray], scale: int = 1, annual: bool = False,
+                           seed: int = 0) -> Dict[str, np.ndarray]:
+    """Массивы DataLoader (формат кэша) с регионами ×scale и, при annual, ежегодными данными"""
+    rng = np.random.default_rng(seed)
+    result = dict(arrays)
+    for prefix in ("regions_", "districts_"):
+        values = np.asarray(arrays[f"{prefix}values"], dtype=float)
+        mask = np.asarray(arrays[f"{prefix}mask"], dtype=bool)
+        years = [int(year) for year in arrays[f"{prefix}years"]]
+        columns_by_year = {int(year): columns
+                           for year, columns in json.loads(str(arrays[f"{prefix}columns_by_year"])).items()}
+
+        if scale > 1:
+            values = np.tile(values, (1, 1, scale))
+            mask = np.tile(mask, (1, 1, scale))
+            values = values * _noise(rng, values.shape, scale)
+            result[f"{prefix}region_ids"] = np.array(_copy_names(arrays[f"{prefix}region_ids"], scale), dtype=str)
+
+        if annual and len(years) > 1:
+            values, mask, annual_years = _interpolate_years(values, mask, years)
+            known = sorted(columns_by_year)
+            columns_by_year = {year: columns_by_year[max(y for y in known if y <= year)] for year in annual_years}
+            years = annual_years
+
+        result[f"{prefix}values"] = values
+        result[f"{prefix}mask"] = mask
+        result[f"{prefix}years"] = np.array(years, dtype=np.int64)
+        result[f"{prefix}columns_by_year"] = np.array(json.dumps(
+            {str(year): columns for year, columns in columns_by_year.items()}, ensure_ascii=False))
+    return result
+
+
+def scale_cpi_arrays(arrays: Dict[str, np.ndarray], scale: int = 1, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Таблицы ИПЦ (формат кэша PriceAdjuster) с регионами ×scale; годы в ИПЦ уже ежегодные"""
+    if scale <= 1:
+        return dict(arrays)
+    rng = np.random.default_rng(seed)
+    result = dict(arrays)
+    for prefix in ("regions_", "districts_"):
+        if f"{prefix}values" not in arrays:
+            continue
+        values = np.tile(np.asarray(arrays[f"{prefix}values"], dtype=float), (scale, 1))
+        # Индекс около 1.0: шум на отклонение от единицы, а не на сам индекс
+        factors = rng.lognormal(0.0, 0.1, size=values.shape)
+        factors[:len(values) // scale] = 1.0
+        result[f"{prefix}values"] = 1.0 + (values - 1.0) * factors
+        result[f"{prefix}index"] = np.array(_copy_names(arrays[f"{prefix}index"], scale), dtype=str)
+    return result
+
+
+def _shift_coordinates(coordinates, offset: float):
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return [coordinates[0] + offset] + list(coordinates[1:])
+    return [_shift_coordinates(item, offset) for item in coordinates]
+
+
+def scale_features(features: List[Dict], scale: int = 1) -> List[Dict]:
+    """Объекты GeoJSON ×scale: копии смещены по долготе, чтобы не совпадать с исходными"""
+    result = list(features)
+    for k in range(1, scale):
+        for feature in features:
+            geometry = feature.get("geometry")
+            if geometry and "coordinates" in geometry:
+                geometry = {**geometry, "coordinates": _shift_coordinates(geometry["coordinates"], 0.01 * k)}
+            properties = dict(feature.get("properties") or {})
+            if "name" in properties:
+                properties["name"] = str(properties["name"]) + COPY_SUFFIX.format(k)
+            result.append({**feature, "geometry": geometry, "properties": properties})
+    return result
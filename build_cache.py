@@ -0,0 +1,86 @@
+# Сборка предкомпилированных артефактов для быстрого старта воркеров
+#
+#   python build_cache.py data       - бинарный кэш данных из data/*.xlsx
+#   python build_cache.py geometry   - упрощенная геометрия для уровней детализации
+#   python build_cache.py store      - отображаемое в память хранилище (данные, ИПЦ, геометрия)
+#   python build_cache.py snapshots  - статический снимок всех состояний карты (сжатые JSON)
+#   python build_cache.py assets     - сжатые копии .gz/.br файлов assets/ (GeoJSON, скрипты, стили)
+
+import argparse
+import sys
+import os
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def build_data(args):
+    from utils.data_cache import rebuild_data_cache, CACHE_DIR
+    rebuild_data_cache()
+    return CACHE_DIR
+
+
+def build_geometry(args):
+    from utils.geometry_build import build_lod_artifacts, GEOMETRY_DIR
+    tolerances = args.tolerances
+    if not tolerances:
+        from utils.geo_utils import DETAIL_LEVELS
+        tolerances = sorted({level["value"] for level in DETAIL_LEVELS.values() if level["value"] < 1.0})
+    for path in build_lod_artifacts(tolerances):
+        print(path)
+    return GEOMETRY_DIR
+
+
+def build_store(args):
+    from utils.mmap_store import build_store as build
+    return build(args.path)
+
+
+def build_snapshots(args):
+    from utils.static_snapshots import build_snapshots as build
+    return build(args.path, args.processes)
+
+
+def build_assets(args):
+    from utils.compression import compress_assets
+    folder = os.path.join(PROJECT_ROOT, "assets")
+    for path in compress_assets(folder):
+        print(path)
+    return folder
+
+
+COMMANDS = {
+    "data": build_data,
+    "geometry": build_geometry,
+    "store": build_store,
+    "snapshots": build_snapshots,
+    "assets": build_assets,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка кэшей и артефактов приложения")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("data", help="Пересобрать бинарный кэш данных и ИПЦ из Excel-файлов")
+    geometry_parser = subparsers.add_parser("geometry", help="Собрать упрощенную геометрию для уровней детализации")
+    geometry_parser.add_argument("--tolerances", type=float, nargs="+",
+                                 help="Допуски упрощения (по умолчанию - из DETAIL_LEVELS)")
+    store_parser = subparsers.add_parser("store", help="Собрать хранилище массивов для отображения в память")
+    store_parser.add_argument("--path", help="Каталог хранилища (по умолчанию DATA_STORE_PATH или cache/store)")
+    snapshots_parser = subparsers.add_parser("snapshots", help="Собрать статический снимок всех состояний карты")
+    snapshots_parser.add_argument("--path", help="Каталог снимков (по умолчанию STATIC_SNAPSHOTS_PATH "
+                                                 "или cache/static_maps)")
+    snapshots_parser.add_argument("--processes", type=int, help="Число процессов (по умолчанию - число ядер)")
+    subparsers.add_parser("assets", help="Сжать файлы assets/ в соседние .gz/.br")
+
+    args = parser.parse_args(argv)
+    # Пути к data/ и assets/ в приложении относительные
+    os.chdir(PROJECT_ROOT)
+    started = time.perf_counter()
+    target = COMMANDS[args.command](args)
+    print(f"Готово ({args.command}): {target} за {time.perf_counter() - started:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
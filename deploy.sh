@@ -4,6 +4,15 @@ echo "Running deployment script..."
 # Установка зависимостей для Dash
 pip install dash plotly pandas dash-leaflet dash-extensions
 
+# Предварительная сборка бинарного кэша данных (воркеры не разбирают Excel при старте)
+python build_cache.py data
+# Упрощенная геометрия для уровней детализации карты
+python build_cache.py geometry
+# Хранилище массивов для mmap (используется при DATA_STORE_PATH=cache/store)
+python build_cache.py store
+
+# Запуск: gunicorn -c gunicorn.conf.py (preload_app, общий снимок данных для воркеров)
+
 # Дополнительные команды если нужны
 # python manage.py migrate
 # python manage.py collectstatic --noinput
\ No newline at end of file
@@ -0,0 +1,33 @@
+# Конфигурация gunicorn: gunicorn -c gunicorn.conf.py
+#
+# По умолчанию приложение загружается в мастер-процессе (preload_app), который
+# готовит неизменяемый снимок данных до запуска воркеров - они делят его память.
+# GUNICORN_PRELOAD=0 возвращает загрузку приложения в каждом воркере.
+
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "wsgi:application"
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+
+def when_ready(server):
+    # Вызывается в мастере после загрузки приложения и до запуска воркеров
+    if preload_app:
+        from utils.snapshot import prepare_snapshot
+        prepare_snapshot()
+
+
+def post_fork(server, worker):
+    from utils.snapshot import after_fork
+    after_fork()
+
+
+def post_worker_init(worker):
+    # Приложение уже загружено (в мастере или в самом воркере): прогрев кэшей карты в фоне
+    from utils.warmup import warmup
+    warmup.start()
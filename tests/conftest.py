@@ -0,0 +1,8 @@
+# Общие настройки тестов: запуск из корня проекта (python -m pytest)
+
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
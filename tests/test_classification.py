@@ -0,0 +1,94 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from utils.classification import (
+    DELTA_STEPS, DIVERGING_COLORSCALE, SCHEMES, SEQUENTIAL_COLORSCALE,
+    classify, jenks_breaks, scheme_colorscale, symmetric_breaks
+)
+
+
+def _ssd(groups):
+    return sum(float(((group - group.mean()) ** 2).sum()) for group in groups)
+
+
+def _best_split_ssd(array, k):
+    """Полный перебор разбиений отсортированного массива на k непустых классов"""
+    n = len(array)
+    return min(_ssd(np.split(array, cuts)) for cuts in combinations(range(1, n), k - 1))
+
+
+@pytest.mark.parametrize("scheme", SCHEMES)
+@pytest.mark.parametrize("values", [[], [np.nan, np.nan], [np.inf, -np.inf, np.nan]])
+def test_classify_empty_input(scheme, values):
+    assert classify(values, scheme) == []
+
+
+def test_classify_unknown_scheme():
+    with pytest.raises(ValueError):
+        classify([1.0, 2.0], "unknown")
+
+
+def test_classify_ignores_nan():
+    values = [5.0, np.nan, 1.0, 3.0, np.inf]
+    assert classify(values, "equal_interval", k=2) == [1.0, 3.0, 5.0]
+    assert classify(values, "quantile", k=2) == [1.0, 3.0, 5.0]
+
+
+def test_symmetric_breaks_round_step():
+    breaks = classify([-7.0, 3.0], "symmetric", k=8, steps=DELTA_STEPS["absolute"])
+    assert breaks == symmetric_breaks(-7.0, 3.0, DELTA_STEPS["absolute"])
+    assert breaks == [-4, -3, -2, -1, 0, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_jenks_is_optimal(seed):
+    array = np.sort(np.random.default_rng(seed).normal(size=9).round(2))
+    k = 3
+    breaks = jenks_breaks(array, k)
+    assert len(breaks) == k + 1
+
+    groups = [array[(array >= low) & (array < high)] for low, high in zip(breaks[:-1], breaks[1:])]
+    groups[-1] = array[array >= breaks[-2]]
+    assert sum(len(group) for group in groups) == len(array)
+    assert _ssd(groups) == pytest.approx(_best_split_ssd(array, k))
+
+
+def test_jenks_breaks_strictly_increasing():
+    # Отдельный максимум раньше давал повторную последнюю границу
+    values = [1.0, 1.0, 1.1, 1.2, 5.0, 5.1, 5.2, 100.0]
+    breaks = jenks_breaks(values, 4)
+    assert all(low < high for low, high in zip(breaks[:-1], breaks[1:]))
+    assert breaks[0] == 1.0
+    assert breaks[-1] == 100.0
+
+
+def test_jenks_equal_values_stay_in_one_class():
+    breaks = jenks_breaks([2.0, 2.0, 2.0, 7.0, 7.0], 5)
+    assert breaks == [2.0, 4.5, 7.0]
+
+
+def test_scheme_colorscale():
+    assert scheme_colorscale("symmetric", 9) == DIVERGING_COLORSCALE
+    for scheme in ("quantile", "equal_interval", "jenks"):
+        colorscale = scheme_colorscale(scheme, 4)
+        assert len(colorscale) == 4
+        assert set(colorscale) <= set(SEQUENTIAL_COLORSCALE)
+        assert colorscale[0] == SEQUENTIAL_COLORSCALE[0]
+        assert colorscale[-1] == SEQUENTIAL_COLORSCALE[-1]
+    assert scheme_colorscale("jenks", 0) == []
+
+
+@pytest.mark.parametrize("scheme", ["quantile", "equal_interval", "jenks"])
+def test_tied_values_give_no_empty_classes(scheme):
+    breaks = classify(np.array([0.0] * 8 + [1.0, 5.0]), scheme, k=5)
+    assert all(low < high for low, high in zip(breaks[:-1], breaks[1:]))
+    assert breaks[0] == 0.0
+    assert breaks[-1] == 5.0
+
+
+@pytest.mark.parametrize("scheme", ["quantile", "equal_interval", "jenks"])
+def test_constant_values_give_one_class(scheme):
+    assert classify([3.0] * 6 + [np.nan], scheme, k=5) == [3.0, 3.0]
+    assert len(scheme_colorscale(scheme, 1)) == 1
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from utils import comparison
+from utils.geo_utils import _get_data_loader
+
+CURRENT_YEAR = 2023
+COMPARE_YEAR = 2020
+
+
+@pytest.fixture
+def data_loader():
+    comparison.clear_cache()
+    yield _get_data_loader()
+    comparison.clear_cache()
+
+
+def _values(data_loader, data_type, year):
+    values, mask = data_loader.get_indicator_array(data_type, year, True)
+    return np.where(mask, values, np.nan)
+
+
+def _shares(data_loader, data_type, year):
+    # Доля в суммарном объеме: NaN без значения, 0 без суммарного объема или при нулевом
+    values = _values(data_loader, data_type, year)
+    totals = _values(data_loader, "total_volume", year)
+    shares = np.full(values.shape, np.nan)
+    if np.isnan(totals).all():
+        return shares
+    divisible = ~np.isnan(values) & ~np.isnan(totals) & (np.nan_to_num(totals) != 0)
+    shares[~np.isnan(values)] = 0.0
+    shares[divisible] = values[divisible] / totals[divisible] * 100
+    return shares
+
+
+@pytest.mark.parametrize("data_type", ["salary", "population"])
+def test_compute_deltas_matches_direct_computation(data_loader, data_type):
+    result = comparison.compute_deltas(data_type, CURRENT_YEAR, COMPARE_YEAR)
+    current = _values(data_loader, data_type, CURRENT_YEAR)
+    compare = _values(data_loader, data_type, COMPARE_YEAR)
+
+    np.testing.assert_array_equal(result["current"], current)
+    np.testing.assert_array_equal(result["compare"], compare)
+    np.testing.assert_array_equal(result["absolute"], current - compare)
+
+    expected_relative = np.full(current.shape, np.nan)
+    for i, (new, old) in enumerate(zip(current, compare)):
+        if not np.isnan(new) and not np.isnan(old):
+            expected_relative[i] = 0.0 if old == 0 else (new - old) / old * 100
+    np.testing.assert_allclose(result["relative"], expected_relative)
+
+    expected_share = _shares(data_loader, data_type, CURRENT_YEAR) - _shares(data_loader, data_type, COMPARE_YEAR)
+    np.testing.assert_allclose(result["share_pp"], expected_share)
+    assert len(result["absolute"]) == len(data_loader.get_region_ids(True))
+
+
+def test_compute_deltas_results_are_read_only(data_loader):
+    result = comparison.compute_deltas("salary", CURRENT_YEAR, COMPARE_YEAR)
+    for array in result.values():
+        with pytest.raises(ValueError):
+            array[0] = 0
+
+
+def test_price_adjustment_applies_to_monetary_indicators_only(data_loader):
+    nominal = comparison.compute_deltas("salary", CURRENT_YEAR, COMPARE_YEAR)
+    adjusted = comparison.compute_deltas("salary", CURRENT_YEAR, COMPARE_YEAR, adjustment_year=CURRENT_YEAR)
+    assert not np.allclose(nominal["compare"], adjusted["compare"], equal_nan=True)
+
+    population = comparison.compute_deltas("population", CURRENT_YEAR, COMPARE_YEAR)
+    population_adjusted = comparison.compute_deltas("population", CURRENT_YEAR, COMPARE_YEAR,
+                                                    adjustment_year=CURRENT_YEAR)
+    np.testing.assert_array_equal(population["absolute"], population_adjusted["absolute"])
+
+
+def test_compute_deltas_cached_per_data_version(data_loader, monkeypatch):
+    first = comparison.compute_deltas("salary", CURRENT_YEAR, COMPARE_YEAR)
+    assert comparison.compute_deltas("salary", CURRENT_YEAR, COMPARE_YEAR) is first
+
+    # Новая версия данных: прежний результат не возвращается
+    monkeypatch.setattr(data_loader, "_data_version", "changed")
+    second = comparison.compute_deltas("salary", CURRENT_YEAR, COMPARE_YEAR)
+    assert second is not first
+    assert comparison.delta_cache.stats()["invalidations"] >= 1
+
+
+def test_take_aligned(data_loader):
+    region_ids = data_loader.get_region_ids(True)
+    values = np.arange(len(region_ids), dtype=float)
+    values[1] = np.nan
+    assert comparison.take_aligned(values, [region_ids[2], "unknown", region_ids[1], region_ids[0]]) == \
+        [2.0, None, None, 0.0]
+
+
+def test_alignment_cache_is_bounded_and_versioned(data_loader, monkeypatch):
+    region_ids = data_loader.get_region_ids(True)
+    # Каждая выборка аналитики - свой ключ, но кэш не растет без ограничения
+    for i in range(comparison.ALIGNMENT_CACHE_ENTRIES * 3):
+        positions = comparison.align_to_regions([region_ids[i % len(region_ids)], f"unknown-{i}"])
+        assert list(positions) == [i % len(region_ids), -1]
+    assert comparison.alignment_cache.stats()["entries"] <= comparison.ALIGNMENT_CACHE_ENTRIES
+
+    first = comparison.align_to_regions(region_ids)
+    assert comparison.align_to_regions(region_ids) is first
+    monkeypatch.setattr(data_loader, "_data_version", "changed")
+    assert comparison.align_to_regions(region_ids) is not first
@@ -0,0 +1,53 @@
+import gzip
+import json
+
+import dash
+import pytest
+from dash import Input, Output, html
+
+from utils.compression import COMPRESSION_MIN_BYTES, install_compression
+from utils.metrics import install_metrics, metrics
+
+PAYLOAD = "x" * (COMPRESSION_MIN_BYTES * 4)
+
+
+@pytest.fixture
+def client():
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id="source"), html.Div(id="target")])
+
+    @app.callback(Output("target", "children"), Input("source", "children"))
+    def fill_target(value):
+        return PAYLOAD
+
+    # Тот же порядок, что в app.py: метрики, затем сжатие
+    install_metrics(app)
+    install_compression(app)
+    metrics.reset()
+    yield app.server.test_client()
+    metrics.reset()
+
+
+def _call(client, encoding):
+    body = {"output": "target.children", "outputs": {"id": "target", "property": "children"},
+            "inputs": [{"id": "source", "property": "children", "value": None}], "changedPropIds": []}
+    return client.post("/_dash-update-component", data=json.dumps(body), content_type="application/json",
+                       headers={"Accept-Encoding": encoding})
+
+
+def _histogram_sum(metric: str) -> float:
+    line = next(line for line in metrics.render().splitlines()
+                if line.startswith(f"{metric}_sum") and 'name="fill_target"' in line)
+    return float(line.rsplit(" ", 1)[1])
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "identity"])
+def test_callback_bytes_are_uncompressed_size(client, encoding):
+    response = _call(client, encoding)
+    assert response.status_code == 200
+    data = gzip.decompress(response.data) if encoding == "gzip" else response.data
+    assert PAYLOAD in json.loads(data)["response"]["target"].values()
+    assert response.headers.get("Content-Encoding") == (encoding if encoding == "gzip" else None)
+
+    assert _histogram_sum("dash_callback_response_bytes") == len(data)
+    assert _histogram_sum("dash_callback_wire_bytes") == len(response.data)
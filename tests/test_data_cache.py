@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from utils import data_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.xlsx"
+    path.write_bytes(b"original content")
+    return str(path)
+
+
+def _arrays():
+    return {"values": np.arange(6, dtype=float).reshape(2, 3), "names": np.array(["a", "b"])}
+
+
+def test_round_trip(cache_dir, source):
+    assert data_cache.load_arrays("test", [source]) is None
+    path = data_cache.save_arrays("test", [source], _arrays())
+    assert path == data_cache.get_cache_path("test")
+    assert os.path.dirname(path) == str(cache_dir)
+
+    loaded = data_cache.load_arrays("test", [source])
+    assert sorted(loaded) == ["names", "values"]
+    np.testing.assert_array_equal(loaded["values"], _arrays()["values"])
+    np.testing.assert_array_equal(loaded["names"], _arrays()["names"])
+    # Временные файлы атомарной записи не остаются
+    assert os.listdir(cache_dir) == ["test.npz"]
+
+
+def test_changed_source_invalidates(cache_dir, source):
+    data_cache.save_arrays("test", [source], _arrays())
+    with open(source, "wb") as f:
+        f.write(b"changed content!")
+    assert data_cache.load_arrays("test", [source]) is None
+
+
+def test_same_size_change_detected_by_hash(cache_dir, source):
+    data_cache.save_arrays("test", [source], _arrays())
+    stat = os.stat(source)
+    with open(source, "wb") as f:
+        f.write(b"Original content")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert data_cache.load_arrays("test", [source]) is None
+
+
+def test_touched_source_still_valid(cache_dir, source):
+    data_cache.save_arrays("test", [source], _arrays())
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert data_cache.load_arrays("test", [source]) is not None
+
+
+def test_source_list_change_invalidates(cache_dir, source, tmp_path):
+    data_cache.save_arrays("test", [source], _arrays())
+    other = tmp_path / "other.xlsx"
+    other.write_bytes(b"other")
+    assert data_cache.load_arrays("test", [source, str(other)]) is None
+
+    os.remove(source)
+    assert data_cache.load_arrays("test", [source]) is None
+
+
+def test_format_version_change_invalidates(cache_dir, source, monkeypatch):
+    data_cache.save_arrays("test", [source], _arrays())
+    monkeypatch.setattr(data_cache, "CACHE_FORMAT_VERSION", data_cache.CACHE_FORMAT_VERSION + 1)
+    assert data_cache.load_arrays("test", [source]) is None
+
+
+def test_corrupted_cache_is_ignored(cache_dir, source):
+    data_cache.save_arrays("test", [source], _arrays())
+    with open(data_cache.get_cache_path("test"), "wb") as f:
+        f.write(b"not a npz file")
+    assert data_cache.load_arrays("test", [source]) is None
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from utils.geo_utils import _get_data_loader
+
+
+@pytest.fixture
+def data_loader():
+    return _get_data_loader()
+
+
+def test_indicator_data_is_a_fresh_dict(data_loader):
+    data = data_loader.get_indicator_data("salary", 2023)
+    region = next(iter(data))
+    value = data[region]
+
+    data[region] = -1.0
+    data["unknown"] = 0.0
+    again = data_loader.get_indicator_data("salary", 2023)
+    assert again is not data
+    assert again[region] == value
+    assert "unknown" not in again
+
+
+def test_indicator_data_matches_array(data_loader):
+    values, mask = data_loader.get_indicator_array("salary", 2023)
+    region_ids = data_loader.get_region_ids()
+    data = data_loader.get_indicator_data("salary", 2023)
+    assert data == {region_ids[i]: float(values[i]) for i in np.flatnonzero(mask)}
+
+
+@pytest.mark.parametrize("data_type, year", [("salary", 2023), ("unknown", 2023), ("salary", 1900)])
+def test_indicator_arrays_are_read_only(data_loader, data_type, year):
+    values, mask = data_loader.get_indicator_array(data_type, year)
+    assert len(values) == len(mask) == len(data_loader.get_region_ids())
+    with pytest.raises(ValueError):
+        values[0] = 0.0
+    with pytest.raises(ValueError):
+        mask[0] = True
@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.price_adjuster import ROW_ALIGNMENT_ENTRIES, PriceAdjuster
+
+# 2003 пропущен в таблице; пустой, нулевой и отрицательный индексы
+YEARS = [2000, 2001, 2002, 2004, 2005, 2006, 2007]
+REGIONS = ["a", "b", "c", "d"]
+
+
+@pytest.fixture
+def cpi_values():
+    values = np.random.default_rng(0).uniform(1.0, 1.2, (len(REGIONS), len(YEARS)))
+    values[1, 2] = np.nan
+    values[2, 4] = 0.0
+    values[3, 0] = -1.0
+    return values
+
+
+@pytest.fixture
+def adjuster(cpi_values):
+    return PriceAdjuster(arrays={"regions_index": np.array(REGIONS), "regions_years": np.array(YEARS),
+                                 "regions_values": cpi_values})
+
+
+def _direct_factor(values, row, from_year, to_year):
+    """Перемножение индексов по годам, как до префиксных матриц"""
+    column = {year: i for i, year in enumerate(YEARS)}
+    if from_year == to_year:
+        return 1.0
+    factor = 1.0
+    for year in range(min(from_year, to_year), max(from_year, to_year)):
+        if year not in column:
+            return 1.0
+        factor *= values[row, column[year]]
+    if from_year < to_year:
+        return factor
+    return 1.0 / factor if factor != 0 else math.inf
+
+
+def _same(a, b):
+    return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-12)
+
+
+def test_cumulative_inflation_matches_direct_product(adjuster, cpi_values):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for row, region in enumerate(REGIONS):
+            for from_year in YEARS:
+                for to_year in YEARS:
+                    assert _same(adjuster.calculate_cumulative_inflation(region, from_year, to_year),
+                                 _direct_factor(cpi_values, row, from_year, to_year)), (region, from_year, to_year)
+
+
+def test_matrix_and_factors_match_scalar(adjuster):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matrix = adjuster.get_inflation_matrix(REGIONS + ["unknown"], YEARS, 2007)
+        factors = adjuster.get_inflation_factors(REGIONS + ["unknown"], 2000, 2002)
+        for row, region in enumerate(REGIONS):
+            for column, year in enumerate(YEARS):
+                assert _same(matrix[row, column], adjuster.calculate_cumulative_inflation(region, year, 2007))
+            assert _same(factors[row], adjuster.calculate_cumulative_inflation(region, 2000, 2002))
+    assert list(matrix[-1]) == [1.0] * len(YEARS)
+    assert factors[-1] == 1.0
+
+
+def test_row_alignments_are_bounded(adjuster):
+    # Выборки регионов аналитики не копятся без ограничения
+    for i in range(ROW_ALIGNMENT_ENTRIES * 3):
+        selection = [REGIONS[i % len(REGIONS)], f"unknown-{i}"]
+        factors = adjuster.get_inflation_factors(selection, 2004, 2007)
+        assert factors[1] == 1.0
+    assert adjuster._row_alignments.stats()["entries"] <= ROW_ALIGNMENT_ENTRIES
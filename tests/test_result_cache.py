@@ -0,0 +1,87 @@
+from utils.result_cache import ResultCache, estimate_size
+
+
+def test_estimate_size_counts_json_and_bytes():
+    assert estimate_size(b"abcd") == 4
+    assert estimate_size({"a": 1}) == len('{"a": 1}')
+    assert estimate_size(object()) == 0
+
+
+def test_get_or_compute_computes_once():
+    cache = ResultCache(1024)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [1, 2, 3]
+
+    assert cache.get_or_compute("key", compute) == [1, 2, 3]
+    assert cache.get_or_compute("key", compute) == [1, 2, 3]
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResultCache(30, size_fn=lambda value: 10)
+    for key in "abc":
+        cache.set(key, key)
+    # Чтение делает "a" самой свежей записью - вытесняется "b"
+    assert cache.get("a") == "a"
+    cache.set("d", "d")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+    stats = cache.stats()
+    assert stats["bytes"] == 30
+    assert stats["evictions"] == 1
+
+
+def test_max_entries():
+    cache = ResultCache(1024, max_entries=2, size_fn=lambda value: 1)
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_replacing_key_updates_size():
+    cache = ResultCache(100, size_fn=len)
+    cache.set("key", "x" * 40)
+    cache.set("key", "x" * 10)
+    assert cache.stats()["bytes"] == 10
+    assert cache.stats()["entries"] == 1
+
+
+def test_oversized_value_is_rejected_without_eviction():
+    cache = ResultCache(10, size_fn=len)
+    cache.set("small", "12345")
+    cache.set("large", "x" * 11)
+
+    assert cache.get("large") is None
+    assert cache.get("small") == "12345"
+    assert cache.stats()["rejected"] == 1
+    assert cache.stats()["evictions"] == 0
+
+
+def test_version_change_invalidates():
+    version = ["v1"]
+    cache = ResultCache(1024, version_fn=lambda: version[0])
+    cache.set("key", "old")
+    assert cache.get("key") == "old"
+
+    version[0] = "v2"
+    assert cache.get("key") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["bytes"] == 0
+
+    cache.set("key", "new")
+    assert cache.get("key") == "new"
+
+
+def test_clear():
+    cache = ResultCache(1024)
+    cache.set("key", "value")
+    cache.clear()
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
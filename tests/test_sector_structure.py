@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from utils import comparison, geo_utils, sector_structure
+from utils.data_loader import DataLoader
+from utils.indicators import REVERSE_MAPPING
+
+YEAR = 2023
+COMPARE_YEAR = 2020
+
+
+@pytest.fixture
+def data_loader():
+    sector_structure.clear_cache()
+    comparison.clear_cache()
+    yield geo_utils._get_data_loader()
+    sector_structure.clear_cache()
+    comparison.clear_cache()
+
+
+def _with_doubled_totals(data_loader) -> DataLoader:
+    """Те же данные, но суммарный объем производства вдвое больше: доли вдвое меньше"""
+    arrays = {key: np.array(value) for key, value in data_loader._store_arrays().items()}
+    for prefix in ("regions_", "districts_"):
+        indicators = [str(name) for name in arrays[f"{prefix}indicators"]]
+        position = indicators.index(REVERSE_MAPPING.get("total_volume", "total_volume"))
+        arrays[f"{prefix}values"][position] *= 2
+    return DataLoader(arrays=arrays)
+
+
+def test_share_vector_matches_indicator(data_loader):
+    values, mask = data_loader.get_indicator_array("salary", YEAR)
+    totals, total_mask = data_loader.get_indicator_array("total_volume", YEAR)
+    shares = sector_structure.get_share_vector("salary", YEAR)
+    expected = sector_structure.share_of_total(np.where(mask, values, np.nan), np.where(total_mask, totals, np.nan))
+    np.testing.assert_allclose(shares, expected)
+    assert sector_structure.get_share_vector("salary", YEAR) is shares
+
+
+def test_caches_follow_data_version(data_loader, monkeypatch):
+    structure = sector_structure.get_sector_structure(YEAR)
+    shares = sector_structure.get_share_vector("salary", YEAR)
+    share_pp = comparison.compute_deltas("mining_industry", YEAR, COMPARE_YEAR)["share_pp"]
+
+    monkeypatch.setattr(geo_utils, "_data_loader", _with_doubled_totals(data_loader))
+    assert sector_structure.get_sector_structure(YEAR) is not structure
+    np.testing.assert_allclose(sector_structure.get_share_vector("salary", YEAR), shares / 2)
+    # Изменение долей в сравнении годов считается по долям новой версии данных
+    np.testing.assert_allclose(comparison.compute_deltas("mining_industry", YEAR, COMPARE_YEAR)["share_pp"],
+                               share_pp / 2)
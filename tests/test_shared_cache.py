@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from utils import shared_cache
+from utils.shared_cache import FileCache, NullCache, SQLiteCache, make_key
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def cache(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteCache(str(tmp_path / "shared.sqlite3"))
+    return FileCache(str(tmp_path / "shared"))
+
+
+def test_round_trip(cache):
+    value = {"classes": [0.0, 1.5], "values": np.arange(3.0)}
+    cache.set("legend", ("salary", 2023), value)
+    loaded = cache.get("legend", ("salary", 2023))
+    assert loaded["classes"] == value["classes"]
+    np.testing.assert_array_equal(loaded["values"], value["values"])
+    assert cache.get("legend", ("salary", 2020)) is None
+    assert cache.get("other", ("salary", 2023)) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_get_or_compute(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_compute("ns", "key", compute) == "value"
+    assert cache.get_or_compute("ns", "key", compute) == "value"
+    assert len(calls) == 1
+
+
+def test_expired_entry_is_a_miss(cache):
+    cache.set("ns", "key", "value", ttl=-1)
+    assert cache.get("ns", "key") is None
+    cache.set("ns", "key", "value", ttl=60)
+    assert cache.get("ns", "key") == "value"
+
+
+def test_code_version_change_is_a_miss(cache, monkeypatch):
+    cache.set("ns", "key", "value")
+    old_key = make_key("ns", "key")
+
+    monkeypatch.setattr(shared_cache, "_code_version", "changed")
+    assert make_key("ns", "key") != old_key
+    assert cache.get("ns", "key") is None
+
+
+def test_code_version_is_stable():
+    assert shared_cache.get_code_version() == shared_cache.get_code_version()
+    assert len(shared_cache.get_code_version()) == 16
+
+
+def test_eviction_keeps_new_entry(tmp_path):
+    for cache in (SQLiteCache(str(tmp_path / "shared.sqlite3"), max_bytes=2500),
+                  FileCache(str(tmp_path / "shared"), max_bytes=2500)):
+        for i in range(5):
+            cache.set("ns", i, b"x" * 1000)
+        assert cache.get("ns", 4) == b"x" * 1000
+        assert cache.stats()["bytes"] <= 2500
+
+
+def test_sqlite_evicts_least_recently_read(tmp_path):
+    # У FileCache порядок задает mtime файлов, его точность зависит от ФС - проверяется только SQLite
+    cache = SQLiteCache(str(tmp_path / "shared.sqlite3"), max_bytes=3500)
+    for i in range(3):
+        cache.set("ns", i, b"x" * 1000)
+    assert cache.get("ns", 0) is not None
+    cache.set("ns", 3, b"x" * 1000)
+
+    assert cache.get("ns", 1) is None
+    assert all(cache.get("ns", i) is not None for i in (0, 2, 3))
+
+
+def test_oversized_value_is_not_stored(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "shared.sqlite3"), max_bytes=100)
+    cache.set("ns", "key", b"x" * 1000)
+    assert cache.get("ns", "key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_sqlite_read_does_not_write(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "shared.sqlite3"))
+    cache.set("ns", "key", "value")
+    before = cache._connection().total_changes
+    for _ in range(10):
+        assert cache.get("ns", "key") == "value"
+    assert cache._connection().total_changes == before
+
+
+def test_clear(cache):
+    cache.set("ns", "key", "value")
+    cache.clear()
+    assert cache.get("ns", "key") is None
+
+
+def test_null_cache_always_misses():
+    cache = NullCache()
+    cache.set("ns", "key", "value")
+    assert cache.get("ns", "key", "default") == "default"
+    assert cache.get_or_compute("ns", "key", lambda: 42) == 42
+
+
+def test_backend_must_implement_storage():
+    class Incomplete(shared_cache._SharedCacheBase):
+        def _read(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete("path")
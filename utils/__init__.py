@@ -17,7 +17,12 @@ from .geo_utils import (
     get_available_years,
     get_default_year,
     set_data_loader,
-    reload_data_types
+    reload_data_types,
+    get_feature_names,
+    get_geometry_json,
+    compute_feature_values,
+    compute_color_bins,
+    get_data_version
 )
 
 from .data_loader import data_loader
@@ -42,5 +47,10 @@ __all__ = [
     'get_default_year',
     'set_data_loader',
     'reload_data_types',
+    'get_feature_names',
+    'get_geometry_json',
+    'compute_feature_values',
+    'compute_color_bins',
+    'get_data_version',
     'data_loader'
 ]
\ No newline at end of file
@@ -0,0 +1,153 @@
+# Построение границ классов для легенд карты
+#
+# Схемы: symmetric (симметричная расходящаяся шкала с "круглым" шагом вокруг нуля),
+# quantile, equal_interval и jenks (естественные границы Фишера-Дженкса) - последние три
+# раскрашиваются последовательной шкалой (scheme_colorscale).
+# Схема легенд сравнения годов задается DELTA_LEGEND_SCHEME (по умолчанию symmetric).
+
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+SCHEMES = ("symmetric", "quantile", "equal_interval", "jenks")
+DEFAULT_DELTA_SCHEME = os.environ.get("DELTA_LEGEND_SCHEME", "symmetric")
+if DEFAULT_DELTA_SCHEME not in SCHEMES:
+    print(f"Неизвестная схема легенды DELTA_LEGEND_SCHEME={DEFAULT_DELTA_SCHEME}, используется symmetric")
+    DEFAULT_DELTA_SCHEME = "symmetric"
+
+DIVERGING_COLORSCALE = [
+    '#8b0000', '#ff0000', '#ff6666', '#ffcccc', '#f0f0f0',
+    '#ccffcc', '#66ff66', '#00ff00', '#008000'
+]
+
+# Последовательная шкала для схем, границы которых не центрированы на нуле
+# (quantile, equal_interval, jenks): цвет растет вместе со значением
+SEQUENTIAL_COLORSCALE = [
+    '#f7fbff', '#deebf7', '#c6dbef', '#9ecae1',
+    '#6baed6', '#4292c6', '#2171b5', '#084594'
+]
+
+# Шаг симметричной шкалы в зависимости от максимального модуля изменения:
+# (порог, шаг) по возрастанию порога и шаг для значений выше последнего порога
+DELTA_STEPS = {
+    "absolute": ([(10, 1), (50, 5), (200, 20), (1000, 100)], 500),
+    "relative": ([(10, 2), (30, 5), (70, 10)], 20),
+    "share": ([(5, 1), (15, 3), (30, 5), (50, 10)], 15)
+}
+
+
+def _finite_sorted(values: Sequence[float]) -> np.ndarray:
+    array = np.asarray(values, dtype=float)
+    return np.sort(array[np.isfinite(array)])
+
+
+def _distinct_breaks(breaks: np.ndarray) -> List[float]:
+    # Совпадающие границы (повторы значений) дали бы пустые классы нулевой ширины;
+    # все значения одинаковы - один класс [v, v], как у jenks_breaks
+    unique = [float(b) for b in np.unique(breaks)]
+    return unique if len(unique) > 1 else unique * 2
+
+
+def quantile_breaks(values: Sequence[float], k: int) -> List[float]:
+    array = _finite_sorted(values)
+    return _distinct_breaks(np.quantile(array, np.linspace(0, 1, k + 1)))
+
+
+def equal_interval_breaks(values: Sequence[float], k: int) -> List[float]:
+    array = _finite_sorted(values)
+    return _distinct_breaks(np.linspace(array[0], array[-1], k + 1))
+
+
+def jenks_breaks(values: Sequence[float], k: int) -> List[float]:
+    """Естественные границы: минимизация суммы квадратов отклонений внутри классов"""
+    array = _finite_sorted(values)
+    n = len(array)
+    k = max(1, min(k, len(np.unique(array))))
+
+    sums = np.concatenate(([0.0], np.cumsum(array)))
+    squares = np.concatenate(([0.0], np.cumsum(array * array)))
+
+    def within_ssd(starts: np.ndarray, end: int) -> np.ndarray:
+        # Сумма квадратов отклонений для отрезков array[start:end]
+        counts = end - starts
+        segment_sum = sums[end] - sums[starts]
+        return squares[end] - squares[starts] - segment_sum * segment_sum / counts
+
+    # Класс может начинаться только там, где значение меняется: одинаковые значения - в одном классе
+    can_start = np.concatenate(([False], array[1:] > array[:-1], [False]))
+
+    # cost[c, j] - минимальная ошибка разбиения первых j значений на c + 1 классов
+    cost = np.full((k, n + 1), np.inf)
+    split = np.zeros((k, n + 1), dtype=np.intp)
+    cost[0, 1:] = squares[1:] - sums[1:] * sums[1:] / np.arange(1, n + 1)
+    for c in range(1, k):
+        for j in range(c + 1, n + 1):
+            starts = np.arange(c, j)
+            candidates = np.where(can_start[starts], cost[c - 1, starts] + within_ssd(starts, j), np.inf)
+            best = int(np.argmin(candidates))
+            cost[c, j] = candidates[best]
+            split[c, j] = starts[best]
+
+    bounds = [n]
+    for c in range(k - 1, 0, -1):
+        bounds.append(int(split[c, bounds[-1]]))
+    bounds.reverse()
+
+    # Граница между классами - середина между последним значением класса и первым значением
+    # следующего: границы строго возрастают, и класс из одного максимального значения не вырождается
+    breaks = [float(array[0])]
+    breaks.extend(float(array[end - 1] + array[end]) / 2 for end in bounds[:-1])
+    breaks.append(float(array[-1]))
+    return breaks
+
+
+def symmetric_breaks(min_val: float, max_val: float, steps: Tuple[List[Tuple[float, float]], float],
+                     classes_per_side: int = 4) -> List[float]:
+    thresholds, default_step = steps
+    max_abs = max(abs(min_val), abs(max_val))
+    step = next((step for threshold, step in thresholds if max_abs < threshold), default_step)
+
+    negative_classes = [-step * i for i in range(classes_per_side, 0, -1)]
+    positive_classes = [step * i for i in range(1, classes_per_side + 1)]
+    return negative_classes + [0] + positive_classes
+
+
+def classify(values: Sequence[float], scheme: str = "quantile", k: int = 5,
+             steps: Tuple[List[Tuple[float, float]], float] = None) -> List[float]:
+    """Границы классов (не больше k + 1 значения); для пустого набора или одних NaN - пустой список"""
+    if scheme not in SCHEMES:
+        raise ValueError(f"Неизвестная схема классификации: {scheme}")
+    array = _finite_sorted(values)
+    if not len(array):
+        return []
+    if scheme == "symmetric":
+        return symmetric_breaks(float(array[0]), float(array[-1]), steps or DELTA_STEPS["absolute"], k // 2)
+    if scheme == "quantile":
+        return quantile_breaks(array, k)
+    if scheme == "equal_interval":
+        return equal_interval_breaks(array, k)
+    return jenks_breaks(array, k)
+
+
+def diverging_colorscale(num_colors: int) -> List[str]:
+    colorscale = list(DIVERGING_COLORSCALE)
+    if num_colors < len(colorscale):
+        start_idx = (len(colorscale) - num_colors) // 2
+        colorscale = colorscale[start_idx:start_idx + num_colors]
+    return colorscale
+
+
+def sequential_colorscale(num_colors: int) -> List[str]:
+    """num_colors цветов последовательной шкалы от светлого к темному"""
+    if num_colors <= 0:
+        return []
+    positions = np.linspace(0, len(SEQUENTIAL_COLORSCALE) - 1, num_colors).round().astype(int)
+    return [SEQUENTIAL_COLORSCALE[i] for i in positions]
+
+
+def scheme_colorscale(scheme: str, num_colors: int) -> List[str]:
+    """Расходящаяся шкала для симметричной схемы, последовательная - для остальных"""
+    if scheme == "symmetric":
+        return diverging_colorscale(num_colors)
+    return sequential_colorscale(num_colors)
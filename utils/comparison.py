@@ -0,0 +1,114 @@
+# Векторизованное сравнение показателя между годами
+#
+# Все массивы выровнены по общему порядку регионов DataLoader.get_region_ids().
+# Отсутствующие данные - NaN в любом из результатов; результаты кэшируются
+# и используются как картой, так и легендами изменений. Ключ кэша включает версию данных,
+# объем ограничен DELTA_CACHE_MAX_BYTES (по умолчанию 32 МБ). Позиции регионов хранятся для
+# ALIGNMENT_CACHE_ENTRIES последних списков: выборки аналитики не копятся без ограничения.
+
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.indicators import MONETARY_INDICATORS
+from utils.result_cache import ResultCache
+from utils.sector_structure import get_share_vector
+
+DELTA_CACHE_MAX_BYTES = int(os.environ.get("DELTA_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+ALIGNMENT_CACHE_ENTRIES = 64
+
+
+def _get_data_loader():
+    from utils.geo_utils import _get_data_loader as get_loader
+    return get_loader()
+
+
+def _data_version() -> str:
+    return _get_data_loader().get_data_version()
+
+
+def _result_size(result: Dict[str, np.ndarray]) -> int:
+    return sum(array.nbytes for array in result.values())
+
+
+delta_cache = ResultCache(DELTA_CACHE_MAX_BYTES, version_fn=_data_version, size_fn=_result_size)
+alignment_cache = ResultCache(1024 * 1024, max_entries=ALIGNMENT_CACHE_ENTRIES, version_fn=_data_version,
+                              size_fn=lambda positions: positions.nbytes)
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+def _indicator_values(data_type: str, year: int, is_regions: bool, adjustment_year) -> np.ndarray:
+    data_loader = _get_data_loader()
+    values, mask = data_loader.get_indicator_array(data_type, year, is_regions)
+    values = np.where(mask, values, np.nan)
+
+    if adjustment_year != "none" and data_type in MONETARY_INDICATORS:
+        from utils.price_adjuster import price_adjuster
+        values = price_adjuster.adjust_array(values, data_loader.get_region_ids(is_regions),
+                                             year, int(adjustment_year), is_regions)
+    return values
+
+
+def compute_deltas(data_type: str, current_year: int, compare_year: int, is_regions: bool = True,
+                   adjustment_year="none") -> Dict[str, np.ndarray]:
+    """Изменения показателя между двумя годами одним проходом.
+
+    absolute - разность значений, relative - изменение в % (0 при нулевом базовом значении),
+    share_pp - изменение доли в суммарном объеме, п.п. Денежные показатели обоих лет
+    пересчитываются в цены adjustment_year.
+    """
+    key = (data_type, current_year, compare_year, is_regions, str(adjustment_year), _data_version())
+    result = delta_cache.get(key)
+    if result is not None:
+        return result
+
+    current = _indicator_values(data_type, current_year, is_regions, adjustment_year)
+    compare = _indicator_values(data_type, compare_year, is_regions, adjustment_year)
+
+    absolute = current - compare
+    relative = np.full(absolute.shape, np.nan)
+    valid = ~np.isnan(absolute)
+    nonzero = valid & (compare != 0)
+    relative[valid] = 0.0
+    relative[nonzero] = absolute[nonzero] / compare[nonzero] * 100
+
+    share_pp = get_share_vector(data_type, current_year, is_regions) - \
+        get_share_vector(data_type, compare_year, is_regions)
+
+    result = {
+        "current": _read_only(current),
+        "compare": _read_only(compare),
+        "absolute": _read_only(absolute),
+        "relative": _read_only(relative),
+        "share_pp": _read_only(share_pp)
+    }
+    delta_cache.set(key, result)
+    return result
+
+
+def align_to_regions(region_names: Sequence[str], is_regions: bool = True) -> np.ndarray:
+    """Позиции region_names в общем порядке регионов (-1 для неизвестных)"""
+    key = (is_regions, tuple(region_names))
+    positions = alignment_cache.get(key)
+    if positions is None:
+        region_index = _get_data_loader().get_region_index(is_regions)
+        positions = _read_only(np.array([region_index.get(name, -1) for name in region_names], dtype=np.intp))
+        alignment_cache.set(key, positions)
+    return positions
+
+
+def take_aligned(values: np.ndarray, region_names: Sequence[str], is_regions: bool = True) -> List[Optional[float]]:
+    """Значения в порядке region_names; NaN и неизвестные регионы - None"""
+    positions = align_to_regions(region_names, is_regions)
+    taken = np.where(positions >= 0, values[positions], np.nan)
+    return [None if np.isnan(value) else float(value) for value in taken.tolist()]
+
+
+def clear_cache():
+    delta_cache.clear()
+    alignment_cache.clear()
@@ -0,0 +1,155 @@
+# Сжатие ответов сервера: brotli/gzip по Accept-Encoding
+#
+# Ответы callback'ов (_dash-update-component), геометрия и бандлы компонентов Dash сжимаются
+# на лету, если их объем не меньше COMPRESSION_MIN_BYTES (по умолчанию 1 КБ). Сжатые байты
+# кэшируются по хэшу ответа: одинаковые ответы, собранные из кэша результатов карты, сжимаются
+# один раз. Объем кэша - COMPRESSION_CACHE_MAX_BYTES (по умолчанию 32 МБ).
+#
+# Файлы assets/ отдаются готовыми соседями .br/.gz (python build_cache.py assets), если они
+# не старше исходного файла. Ответы, у которых уже есть Content-Encoding (статический снимок
+# карты), не трогаются. COMPRESSION_ENABLED=0 отключает сжатие, brotli - необязательная зависимость.
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from collections import Counter
+from typing import List, Optional
+
+from utils.result_cache import ResultCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "1") != "0"
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get("COMPRESSION_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 5))
+
+COMPRESSIBLE_TYPES = {"application/json", "application/geo+json", "application/javascript",
+                      "text/javascript", "text/css", "text/html", "text/plain", "image/svg+xml"}
+ASSET_EXTENSIONS = (".geojson", ".json", ".js", ".css", ".svg", ".html")
+# Кодировка -> суффикс готового файла
+SIBLING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+compressed_cache = ResultCache(COMPRESSION_CACHE_MAX_BYTES)
+compression_counts = Counter()
+compression_bytes = Counter()
+
+
+def available_encodings() -> List[str]:
+    """Поддерживаемые кодировки в порядке предпочтения"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(data: bytes, encoding: str, best: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+def negotiate(accept_encodings) -> Optional[str]:
+    """Лучшая кодировка из Accept-Encoding клиента (None - без сжатия)"""
+    return accept_encodings.best_match(available_encodings())
+
+
+def get_compressed(data: bytes, encoding: str) -> bytes:
+    key = (encoding, hashlib.sha1(data).digest())
+    compressed = compressed_cache.get(key)
+    if compressed is None:
+        compressed = compress(data, encoding)
+        compressed_cache.set(key, compressed)
+    return compressed
+
+
+def compress_assets(folder: str) -> List[str]:
+    """Записать соседей .gz (и .br) для текстовых файлов каталога; актуальные не пересобираются"""
+    written = []
+    for directory, _, files in os.walk(folder):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if not name.endswith(ASSET_EXTENSIONS) or os.path.getsize(path) < COMPRESSION_MIN_BYTES:
+                continue
+            with open(path, "rb") as f:
+                data = None
+                for encoding in available_encodings():
+                    target = path + SIBLING_SUFFIXES[encoding]
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    if data is None:
+                        data = f.read()
+                    tmp_path = f"{target}.{os.getpid()}.tmp"
+                    with open(tmp_path, "wb") as out:
+                        out.write(compress(data, encoding, best=True))
+                    os.replace(tmp_path, target)
+                    written.append(target)
+    return written
+
+
+def install_compression(app):
+    """Сжатие ответов app.server; объем до сжатия остается в flask.g.response_bytes для метрик callback'ов"""
+    if not COMPRESSION_ENABLED:
+        return
+
+    import flask
+    from werkzeug.security import safe_join
+
+    server = app.server
+    assets_folder = app.config.assets_folder
+
+    @server.before_request
+    def serve_precompressed_asset():
+        if flask.request.endpoint != "_dash_assets.static":
+            return None
+        filename = (flask.request.view_args or {}).get("filename", "")
+        path = safe_join(assets_folder, filename)
+        if path is None or not filename.endswith(ASSET_EXTENSIONS) or not os.path.isfile(path):
+            return None
+        mtime = os.path.getmtime(path)
+        siblings = {encoding: path + suffix for encoding, suffix in SIBLING_SUFFIXES.items()
+                    if os.path.isfile(path + suffix) and os.path.getmtime(path + suffix) >= mtime}
+        if not siblings:
+            return None
+        encoding = flask.request.accept_encodings.best_match(list(siblings))
+        if encoding is None:
+            # Ответ без сжатия тоже зависит от Accept-Encoding: Vary добавит compress_response
+            flask.g.compression_vary = True
+            return None
+        sibling = siblings[encoding]
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        response = flask.send_file(sibling, mimetype=mimetype, conditional=True,
+                                   max_age=server.get_send_file_max_age(filename))
+        # Имя исходного файла, а не .gz: иначе браузер может сохранить его как архив
+        response.headers.pop("Content-Disposition", None)
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        compression_counts["precompressed"] += 1
+        return response
+
+    @server.after_request
+    def compress_response(response):
+        if flask.g.pop("compression_vary", False):
+            response.vary.add("Accept-Encoding")
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed \
+                or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            compression_counts["small"] += 1
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate(flask.request.accept_encodings)
+        if encoding is None:
+            compression_counts["identity"] += 1
+            return response
+        compressed = get_compressed(data, encoding)
+        flask.g.response_bytes = len(data)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        compression_counts[encoding] += 1
+        compression_bytes["original"] += len(data)
+        compression_bytes["compressed"] += len(compressed)
+        return response
@@ -0,0 +1,113 @@
+# Бинарный кэш разобранных Excel-файлов
+#
+# Перезапуск процесса (и каждый воркер gunicorn) не разбирает xlsx через openpyxl,
+# если исходники не менялись: массивы читаются из npz за миллисекунды.
+# Пересборка вручную: python build_cache.py data
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
+CACHE_FORMAT_VERSION = 1
+
+_MANIFEST_KEY = "__manifest__"
+
+
+def get_cache_path(cache_name: str) -> str:
+    return os.path.join(CACHE_DIR, f"{cache_name}.npz")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def describe_sources(paths: List[str]) -> List[Dict]:
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        sources.append({
+            "path": os.path.abspath(path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": _file_sha256(path)
+        })
+    return sources
+
+
+def sources_match(cached_sources: List[Dict], paths: List[str]) -> bool:
+    if sorted(s["path"] for s in cached_sources) != sorted(os.path.abspath(p) for p in paths):
+        return False
+
+    for source in cached_sources:
+        try:
+            stat = os.stat(source["path"])
+        except OSError:
+            return False
+        if stat.st_mtime_ns == source["mtime_ns"] and stat.st_size == source["size"]:
+            continue
+        # mtime меняется и без правки содержимого (git checkout, копирование) - сверяем хэш
+        if stat.st_size != source["size"] or _file_sha256(source["path"]) != source["sha256"]:
+            return False
+    return True
+
+
+def load_arrays(cache_name: str, source_paths: List[str]) -> Optional[Dict[str, np.ndarray]]:
+    """Массивы из кэша или None, если кэша нет либо исходные файлы изменились"""
+    cache_path = get_cache_path(cache_name)
+    if not os.path.exists(cache_path):
+        return None
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            manifest = json.loads(str(npz[_MANIFEST_KEY]))
+            if manifest.get("version") != CACHE_FORMAT_VERSION:
+                return None
+            if not sources_match(manifest.get("sources", []), source_paths):
+                return None
+            return {key: npz[key] for key in npz.files if key != _MANIFEST_KEY}
+    except Exception as e:
+        print(f"Ошибка чтения кэша {cache_path}: {e}")
+        return None
+
+
+def save_arrays(cache_name: str, source_paths: List[str], arrays: Dict[str, np.ndarray]) -> Optional[str]:
+    cache_path = get_cache_path(cache_name)
+    manifest = {
+        "version": CACHE_FORMAT_VERSION,
+        "sources": describe_sources(source_paths)
+    }
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=f".{cache_name}.", suffix=".npz")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **{_MANIFEST_KEY: np.array(json.dumps(manifest, ensure_ascii=False))}, **arrays)
+            os.chmod(tmp_path, 0o644)
+            # Атомарная подмена: параллельно стартующие воркеры не увидят недописанный файл
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return cache_path
+    except Exception as e:
+        print(f"Ошибка записи кэша {cache_path}: {e}")
+        return None
+
+
+def rebuild_data_cache():
+    from utils.data_loader import DataLoader
+    from utils.price_adjuster import PriceAdjuster
+
+    DataLoader(use_cache=False)
+    PriceAdjuster(use_cache=False)
@@ -1,133 +1,334 @@
-import pandas as pd
+import hashlib
+import json
+import numpy as np
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+from utils.data_cache import load_arrays, save_arrays
+from utils.indicators import INDICATOR_MAPPING, REVERSE_MAPPING, IndicatorMeta, build_registry
+from utils.metrics import timed
+from utils.mmap_store import get_store_path, open_store
+from utils.startup import lazy_module
+
+# pandas нужен только для разбора исходных таблиц и DataFrame по годам
+pd = lazy_module("pandas")
+
+DATA_CACHE_NAME = "indicators"
+
+
+class IndicatorStore:
+    """Колоночное хранилище показателей одного уровня (регионы или округа).
+
+    Значения лежат в массиве indicators × years × regions, рядом маска наличия данных.
+    Порядок регионов общий для всех показателей и лет (region_ids).
+    """
+
+    def __init__(self, region_ids: List[str], indicators: List[str], years: List[int],
+                 values: np.ndarray, mask: np.ndarray, columns_by_year: Dict[int, List[str]]):
+        self.region_ids = region_ids
+        self.region_index = {name: i for i, name in enumerate(region_ids)}
+        self.indicators = indicators
+        self.indicator_index = {name: i for i, name in enumerate(indicators)}
+        self.years = years
+        self.year_index = {year: i for i, year in enumerate(years)}
+        self.values = values
+        self.mask = mask
+        self.columns_by_year = columns_by_year
+
+        self.values.flags.writeable = False
+        self.mask.flags.writeable = False
+        self._empty_values = np.full(len(region_ids), np.nan)
+        self._empty_mask = np.zeros(len(region_ids), dtype=bool)
+        self._empty_values.flags.writeable = False
+        self._empty_mask.flags.writeable = False
+
+    @classmethod
+    def from_frames(cls, frames: Dict[int, "pd.DataFrame"], region_col: str, parse_value) -> "IndicatorStore":
+        region_ids = []
+        region_index = {}
+        indicators = []
+        indicator_index = {}
+        columns_by_year = {}
+
+        for year, df in frames.items():
+            columns = [col for col in df.columns if col != 'region' and col != 'federal_district']
+            columns_by_year[year] = columns
+            for col in columns:
+                if col not in indicator_index:
+                    indicator_index[col] = len(indicators)
+                    indicators.append(col)
+            if region_col in df.columns:
+                for name in df[region_col]:
+                    if name not in region_index:
+                        region_index[name] = len(region_ids)
+                        region_ids.append(name)
+
+        years = list(frames.keys())
+        values = np.full((len(indicators), len(years), len(region_ids)), np.nan)
+        mask = np.zeros(values.shape, dtype=bool)
+
+        for year_pos, (year, df) in enumerate(frames.items()):
+            if df.empty or region_col not in df.columns:
+                continue
+            rows = np.array([region_index[name] for name in df[region_col]], dtype=np.intp)
+
+            for col in columns_by_year[year]:
+                column = df[col]
+                if pd.api.types.is_numeric_dtype(column):
+                    col_values = column.to_numpy(dtype=float, na_value=np.nan)
+                    col_valid = ~np.isnan(col_values)
+                else:
+                    parsed = [parse_value(value) for value in column]
+                    col_valid = np.array([value is not None for value in parsed], dtype=bool)
+                    col_values = np.array([np.nan if value is None else value for value in parsed], dtype=float)
+
+                # Как и в построчном разборе, пропуск не затирает ранее найденное значение
+                target_values = values[indicator_index[col], year_pos]
+                target_mask = mask[indicator_index[col], year_pos]
+                target_values[rows[col_valid]] = col_values[col_valid]
+                target_mask[rows[col_valid]] = True
+
+        return cls(region_ids, indicators, years, values, mask, columns_by_year)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}region_ids": np.array(self.region_ids, dtype=str),
+            f"{prefix}indicators": np.array(self.indicators, dtype=str),
+            f"{prefix}years": np.array(self.years, dtype=np.int64),
+            f"{prefix}values": self.values,
+            f"{prefix}mask": self.mask,
+            f"{prefix}columns_by_year": np.array(json.dumps(
+                {str(year): columns for year, columns in self.columns_by_year.items()}, ensure_ascii=False))
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "IndicatorStore":
+        columns_by_year = json.loads(str(arrays[f"{prefix}columns_by_year"]))
+        return cls(
+            [str(name) for name in arrays[f"{prefix}region_ids"]],
+            [str(name) for name in arrays[f"{prefix}indicators"]],
+            [int(year) for year in arrays[f"{prefix}years"]],
+            arrays[f"{prefix}values"],
+            arrays[f"{prefix}mask"],
+            {int(year): columns for year, columns in columns_by_year.items()}
+        )
+
+    def to_frame(self, year: int, region_col: str) -> "pd.DataFrame":
+        """Таблица года в виде исходного DataFrame (пропуски - NaN)"""
+        data = {region_col: self.region_ids}
+        for column in self.columns_by_year.get(year, []):
+            values, mask = self.get(column, year)
+            data[column] = np.where(mask, values, np.nan)
+        return pd.DataFrame(data)
+
+    def get(self, column: str, year: int) -> Tuple[np.ndarray, np.ndarray]:
+        indicator_pos = self.indicator_index.get(column)
+        year_pos = self.year_index.get(year)
+        if indicator_pos is None or year_pos is None or column not in self.columns_by_year.get(year, []):
+            return self._empty_values, self._empty_mask
+        return self.values[indicator_pos, year_pos], self.mask[indicator_pos, year_pos]
+
+    def take(self, column: str, region_names: List[str], years: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Значения показателя для выбранных регионов по годам: матрицы регионы × годы (values, mask)"""
+        values = np.full((len(region_names), len(years)), np.nan)
+        mask = np.zeros((len(region_names), len(years)), dtype=bool)
+        indicator_pos = self.indicator_index.get(column)
+        if indicator_pos is None:
+            return values, mask
+
+        rows = np.array([self.region_index.get(name, -1) for name in region_names], dtype=np.intp)
+        year_pos = np.array([self.year_index.get(year, -1) if column in self.columns_by_year.get(year, []) else -1
+                             for year in years], dtype=np.intp)
+        known_rows = np.flatnonzero(rows >= 0)
+        known_years = np.flatnonzero(year_pos >= 0)
+        if known_rows.size and known_years.size:
+            block = np.ix_(known_rows, known_years)
+            source = (indicator_pos, year_pos[known_years][None, :], rows[known_rows][:, None])
+            values[block] = self.values[source]
+            mask[block] = self.mask[source]
+        return values, mask
+
 
 class DataLoader:
-    def __init__(self):
-        self.regions_data = {}
-        self.districts_data = {}
+    def __init__(self, use_cache: bool = True, store_path: Optional[str] = None,
+                 arrays: Optional[Dict[str, np.ndarray]] = None):
+        self._frames = {}
         self.available_years = [2000, 2005, 2010, 2015, 2020, 2023]
-        self._load_all_data()
+        self._stores = {}
+        self._indicator_dicts = {}
+        self._data_version = None
+
+        # arrays - готовые массивы в формате кэша (например, синтетические данные бенчмарков)
+        if arrays is not None:
+            self.available_years = sorted(int(year) for year in arrays["regions_years"])
+            self._set_stores(arrays)
+            return
+        # store_path - отображаемое в память хранилище (python build_cache.py store):
+        # массивы не читаются и не копируются, все процессы делят одну копию
+        if store_path and self._load_from_store(store_path):
+            return
+        if not (use_cache and self._load_from_cache()):
+            self._load_all_data()
+            self._build_stores()
+            save_arrays(DATA_CACHE_NAME, self._source_files(), self._store_arrays())
+
+    def _source_files(self) -> List[str]:
+        files = []
+        for year in self.available_years:
+            for path in (f"data/regions_data_{year}.xlsx", f"data/federal_districts_data_{year}.xlsx"):
+                if os.path.exists(path):
+                    files.append(path)
+        return files
+
+    def _store_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = self._stores[True].to_arrays("regions_")
+        arrays.update(self._stores[False].to_arrays("districts_"))
+        return arrays
+
+    def _load_from_store(self, store_path: str) -> bool:
+        store = open_store(store_path)
+        if store is None or not store.sources_match("data", self._source_files()):
+            print(f"Хранилище данных {store_path} отсутствует или устарело, данные загружаются из файлов")
+            return False
+        self._set_stores(store.arrays("data/"))
+        return True
+
+    def _load_from_cache(self) -> bool:
+        arrays = load_arrays(DATA_CACHE_NAME, self._source_files())
+        if arrays is None:
+            return False
+        self._set_stores(arrays)
+        return True
+
+    def _set_stores(self, arrays: Dict[str, np.ndarray]):
+        self._stores[True] = IndicatorStore.from_arrays(arrays, "regions_")
+        self._stores[False] = IndicatorStore.from_arrays(arrays, "districts_")
+        self._frames = {}
+        self._build_registry()
+
+    def _get_frames(self, is_regions: bool) -> Dict[int, "pd.DataFrame"]:
+        # Таблицы по годам строятся из хранилища при первом обращении: при запуске
+        # из кэша pandas не импортируется
+        frames = self._frames.get(is_regions)
+        if frames is None:
+            store = self._stores.get(is_regions)
+            region_col = 'region' if is_regions else 'federal_district'
+            frames = {year: store.to_frame(year, region_col) for year in store.years} if store else {}
+            self._frames[is_regions] = frames
+        return frames
+
+    @property
+    def regions_data(self) -> Dict[int, "pd.DataFrame"]:
+        return self._get_frames(True)
+
+    @property
+    def districts_data(self) -> Dict[int, "pd.DataFrame"]:
+        return self._get_frames(False)
 
     def _load_all_data(self):
+        self._frames = {True: {}, False: {}}
         for year in self.available_years:
             try:
                 regions_file = f"data/regions_data_{year}.xlsx"
                 if os.path.exists(regions_file):
-                    self.regions_data[year] = pd.read_excel(regions_file)
+                    self._frames[True][year] = pd.read_excel(regions_file)
 
                 districts_file = f"data/federal_districts_data_{year}.xlsx"
                 if os.path.exists(districts_file):
-                    self.districts_data[year] = pd.read_excel(districts_file)
+                    self._frames[False][year] = pd.read_excel(districts_file)
             except Exception as e:
                 print(f"Ошибка загрузки данных за {year} год: {e}")
 
+    def _build_stores(self):
+        self._stores[True] = IndicatorStore.from_frames(self.regions_data, 'region', self._parse_value)
+        self._stores[False] = IndicatorStore.from_frames(self.districts_data, 'federal_district', self._parse_value)
+        self._build_registry()
+        self._indicator_dicts = {}
+
+    def _build_registry(self):
+        # Реестр строится один раз по столбцам последнего года с данными
+        store = self._stores[True]
+        columns = next((store.columns_by_year[year] for year in reversed(self.available_years)
+                        if store.columns_by_year.get(year)), [])
+        self._registry = build_registry(columns)
+        self._available_indicators = [meta.to_dict() for meta in self._registry.values()]
+
     def get_available_indicators(self) -> List[Dict]:
-        for year in reversed(self.available_years):
-            if year in self.regions_data and not self.regions_data[year].empty:
-                return self._extract_indicators_from_data(self.regions_data[year])
-        return []
+        return list(self._available_indicators)
 
-    def _extract_indicators_from_data(self, data: pd.DataFrame) -> List[Dict]:
-        if data.empty:
-            return []
+    def get_indicator_registry(self) -> Dict[str, IndicatorMeta]:
+        return self._registry
 
-        indicators = []
-        columns = [col for col in data.columns if col != 'region' and col != 'federal_district']
-
-        indicator_mapping = {
-            'Население': 'population',
-            'Среднемесячная номинальная ЗП': 'salary',
-            'Валовой региональный продукт': 'gdp',
-            'ВРП на душу населения': 'gdp_per_capita',
-            'Добывающая промышленность': 'mining_industry',
-            'Обрабатывающая промышленность': 'manufacturing_industry',
-            'Сельское хозяйство': 'agriculture',
-            'Водоснабжение': 'water_supply',
-            'Электроснабжение': 'energy_supply',
-            'Суммарный объем': 'total_volume',
-            'Сфера услуг': 'services'
-        }
+    def get_indicator_meta(self, indicator_type: str) -> Optional[IndicatorMeta]:
+        return self._registry.get(indicator_type)
 
-        for rus_name in columns:
-            eng_name = indicator_mapping.get(rus_name)
-            if eng_name is None:
-                eng_name = rus_name.lower().replace(' ', '_')
-
-            indicators.append({
-                "type": eng_name,
-                "label": rus_name,
-                "description": rus_name,
-                "unit": self._get_unit(rus_name)
-            })
-
-        return indicators
-
-    def _get_unit(self, indicator_name: str) -> str:
-        units = {
-            'Население': 'тыс. чел.',
-            'Среднемесячная номинальная ЗП': 'руб.',
-            'Валовой региональный продукт': 'млн руб.',
-            'ВРП на душу населения': 'тыс. руб.',
-            'Добывающая промышленность': 'ед.',
-            'Обрабатывающая промышленность': 'ед.',
-            'Сельское хозяйство': 'ед.',
-            'Водоснабжение': 'ед.',
-            'Электроснабжение': 'ед.',
-            'Суммарный объем': 'ед.',
-            'Сфера услуг': 'ед.'
-        }
-        return units.get(indicator_name, 'ед.')
+    def get_region_ids(self, is_regions: bool = True) -> List[str]:
+        """Общий для всех массивов порядок регионов (округов)"""
+        return self._stores[is_regions].region_ids
 
-    def get_indicator_data(self, indicator_type: str, year: int, is_regions: bool = True) -> Dict[str, float]:
-        if year not in self.available_years:
-            return {}
-
-        data_source = self.regions_data if is_regions else self.districts_data
-        region_col = 'region' if is_regions else 'federal_district'
-
-        if year not in data_source or data_source[year].empty:
-            return {}
-
-        reverse_mapping = {
-            'population': 'Население',
-            'salary': 'Среднемесячная номинальная ЗП',
-            'gdp': 'Валовой региональный продукт',
-            'gdp_per_capita': 'ВРП на душу населения',
-            'mining_industry': 'Добывающая промышленность',
-            'manufacturing_industry': 'Обрабатывающая промышленность',
-            'agriculture': 'Сельское хозяйство',
-            'water_supply': 'Водоснабжение',
-            'energy_supply': 'Электроснабжение',
-            'services': 'Сфера услуг',
-            'total_volume': 'Суммарный объем'
-        }
+    def get_region_index(self, is_regions: bool = True) -> Dict[str, int]:
+        return self._stores[is_regions].region_index
 
-        column_name = reverse_mapping.get(indicator_type, indicator_type)
+    def get_data_version(self) -> str:
+        """Хеш содержимого массивов показателей: меняется вместе с данными"""
+        if self._data_version is None:
+            digest = hashlib.sha1()
+            for is_regions in (True, False):
+                store = self._stores[is_regions]
+                digest.update(json.dumps([store.region_ids, store.indicators, store.years]).encode("utf-8"))
+                digest.update(store.values.tobytes())
+                digest.update(store.mask.tobytes())
+            self._data_version = digest.hexdigest()[:16]
+        return self._data_version
 
-        if column_name not in data_source[year].columns:
-            return {}
+    def get_indicator_array(self, indicator_type: str, year: int,
+                            is_regions: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Значения показателя и маска наличия данных, выровненные по get_region_ids().
 
-        result = {}
-        for _, row in data_source[year].iterrows():
-            region_name = row[region_col]
-            value = row[column_name]
+        Массивы только для чтения и не копируются при каждом вызове.
+        """
+        column_name = REVERSE_MAPPING.get(indicator_type, indicator_type)
+        return self._stores[is_regions].get(column_name, year)
 
-            if self._is_missing_value(value):
-                continue
+    def get_indicator_matrix(self, indicator_type: str, region_names: List[str], years: List[int],
+                             is_regions: bool = True, base_year: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Значения показателя для списка регионов по годам одним запросом: матрицы регионы × годы.
 
+        Если задан base_year, значения пересчитываются в цены этого года по ИПЦ.
+        """
+        column_name = REVERSE_MAPPING.get(indicator_type, indicator_type)
+        values, mask = self._stores[is_regions].take(column_name, region_names, years)
+        if base_year is not None:
             try:
-                if isinstance(value, str):
-                    cleaned_value = value.replace(' ', '').replace(',', '.')
-                    numeric_value = float(cleaned_value)
-                else:
-                    numeric_value = float(value)
+                from utils.price_adjuster import price_adjuster
+                values *= price_adjuster.get_inflation_matrix(region_names, years, base_year, is_regions)
+            except Exception as e:
+                print(f"Ошибка корректировки цен: {e}")
+        return values, mask
 
-                result[region_name] = numeric_value
-            except (ValueError, TypeError):
-                continue
+    @timed("get_indicator_data")
+    def get_indicator_data(self, indicator_type: str, year: int, is_regions: bool = True) -> Dict[str, float]:
+        """Словарь регион -> значение; каждый вызов получает свою копию, кэш вызывающий не меняет"""
+        key = (indicator_type, year, is_regions)
+        result = self._indicator_dicts.get(key)
+        if result is None:
+            values, mask = self.get_indicator_array(indicator_type, year, is_regions)
+            region_ids = self.get_region_ids(is_regions)
+            result = {region_ids[i]: float(values[i]) for i in np.flatnonzero(mask)}
+            self._indicator_dicts[key] = result
+        return dict(result)
+
+    def _parse_value(self, value) -> Optional[float]:
+        if self._is_missing_value(value):
+            return None
 
-        return result
+        try:
+            if isinstance(value, str):
+                cleaned_value = value.replace(' ', '').replace(',', '.')
+                return float(cleaned_value)
+            return float(value)
+        except (ValueError, TypeError):
+            return None
 
     def _is_missing_value(self, value) -> bool:
         if value is None or pd.isna(value):
@@ -148,4 +349,4 @@ class DataLoader:
     def get_available_years(self) -> List[int]:
         return self.available_years
 
-data_loader = DataLoader()
\ No newline at end of file
+data_loader = DataLoader(store_path=get_store_path())
@@ -1,12 +1,37 @@
+import bisect
 import json
 import os
+import threading
 from typing import Dict, List, Optional, Union
 
-# Кэш для геометрии
+import numpy as np
+
+from utils.classification import (
+    DEFAULT_DELTA_SCHEME, DELTA_STEPS, SEQUENTIAL_COLORSCALE,
+    classify, diverging_colorscale, quantile_breaks, scheme_colorscale, symmetric_breaks
+)
+from utils.comparison import compute_deltas, take_aligned
+from utils.geometry_build import GEOJSON_FILES, load_lod_artifact, simplify_features
+from utils.indicators import ABSOLUTE_INDICATORS, MONETARY_INDICATORS
+from utils.metrics import timed
+from utils.mmap_store import decode_geometry, get_geometry_payload, get_store_path, open_store
+from utils.result_cache import ResultCache
+from utils.sector_structure import get_sector_structure, get_share_vector
+from utils.shared_cache import shared_cache
+
+# Кэш для геометрии: (файл, уровень детализации) -> разобранный и упрощенный шаблон
 _geojson_cache = {}
+_geojson_cache_lock = threading.Lock()
+# Кэш легенд изменений: ключ включает показатель, годы, режим, уровень, корректировку цен
+# и версию данных; объем - LEGEND_CACHE_MAX_BYTES (по умолчанию 4 МБ)
+LEGEND_CACHE_MAX_BYTES = int(os.environ.get("LEGEND_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+legend_cache = ResultCache(LEGEND_CACHE_MAX_BYTES, version_fn=lambda: get_data_version())
 _data_loader = None
+# Хранилище с квантованной геометрией (DATA_STORE_PATH); False - не используется
+_geometry_store = None
 
-# Уровни детализации (упрощено до 2 вариантов)
+# Уровни детализации: value < 1.0 - допуск упрощения геометрии,
+# готовые артефакты собираются командой python build_cache.py geometry
 DETAIL_LEVELS = {
     "high": {"label": "Высокий", "value": 1.0},
     "low": {"label": "Низкий", "value": 0.7}
@@ -80,6 +105,10 @@ def get_default_year():
     return 2023 if 2023 in years else years[-1] if years else 2023
 
 
+def get_data_version() -> str:
+    return _get_data_loader().get_data_version()
+
+
 def _get_data_loader():
     global _data_loader
     if _data_loader is None:
@@ -225,76 +254,237 @@ def _simplify_multipolygon(multipolygon_coords: List, step: int) -> List:
     return simplified_multipolygon if simplified_multipolygon else multipolygon_coords
 
 
-def load_geojson_with_detail(file_path, detail_level, year, data_type="none",
-                             compare_year=None, comparison_mode="absolute",
-                             display_mode="absolute", adjustment_year="none"):
-    is_regions = "regions" in file_path
+def _freeze_coordinates(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_coordinates(item) for item in value)
+    return value
+
+
+def _get_geometry_store():
+    global _geometry_store
+    if _geometry_store is None:
+        store = None
+        store_path = get_store_path()
+        if store_path:
+            store = open_store(store_path)
+            if store is not None and not store.sources_match(
+                    "geometry", [path for path in GEOJSON_FILES if os.path.exists(path)]):
+                print(f"Геометрия в хранилище {store_path} устарела, используются исходные файлы")
+                store = None
+        _geometry_store = store or False
+    return _geometry_store or None
+
+
+def _build_geometry_template(file_path: str, detail_level: float, use_store: bool = True) -> Dict:
+    store = _get_geometry_store() if use_store else None
+    if store is not None:
+        geojson_data = decode_geometry(store, file_path, detail_level)
+        if geojson_data is not None:
+            geojson_data['features'] = tuple(geojson_data['features'])
+            return geojson_data
+
+    geojson_data = load_lod_artifact(file_path, detail_level) if detail_level < 1.0 else None
+
+    if geojson_data is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            geojson_data = json.load(f)
+
+        if detail_level < 1.0:
+            try:
+                geojson_data['features'] = simplify_features(geojson_data['features'], detail_level)
+            except ImportError:
+                for feature in geojson_data['features']:
+                    if 'geometry' in feature and feature['geometry']['type'] in ['Polygon', 'MultiPolygon']:
+                        feature['geometry'] = simplify_geometry(feature['geometry'], detail_level)
+
+    # Координаты в кортежах: шаблон общий для всех запросов и не должен меняться
+    for feature in geojson_data['features']:
+        geometry = feature.get('geometry')
+        if geometry and 'coordinates' in geometry:
+            geometry['coordinates'] = _freeze_coordinates(geometry['coordinates'])
+    geojson_data['features'] = tuple(geojson_data['features'])
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        geojson_data = json.load(f)
+    return geojson_data
 
-    if detail_level < 1.0:
-        for feature in geojson_data['features']:
-            if 'geometry' in feature and feature['geometry']['type'] in ['Polygon', 'MultiPolygon']:
-                feature['geometry'] = simplify_geometry(feature['geometry'], detail_level)
 
+def get_geometry_template(file_path: str, detail_level: float) -> Dict:
+    """Разобранная и упрощенная геометрия; читается с диска один раз на процесс"""
+    key = (os.path.abspath(file_path), detail_level)
+    template = _geojson_cache.get(key)
+    if template is None:
+        with _geojson_cache_lock:
+            template = _geojson_cache.get(key)
+            if template is None:
+                template = _build_geometry_template(file_path, detail_level)
+                _geojson_cache[key] = template
+    return template
+
+
+def _copy_geometry_template(template: Dict) -> Dict:
+    # Копируются только словари объектов и свойств, геометрия остается общей
+    geojson_data = dict(template)
+    geojson_data['features'] = [
+        {**feature, 'properties': dict(feature.get('properties') or {})}
+        for feature in template['features']
+    ]
+    return geojson_data
+
+
+def get_feature_names(file_path: str, detail_level: float) -> List[str]:
+    """Названия регионов в порядке объектов геометрии (индекс объекта = properties.idx)"""
+    template = get_geometry_template(file_path, detail_level)
+    return [(feature.get('properties') or {}).get('name', 'Unknown') for feature in template['features']]
+
+
+def get_geometry_json(file_path: str, detail_level: float) -> bytes:
+    """Геометрия без данных для передачи в браузер один раз на (слой, детализацию)"""
+    key = ("json", os.path.abspath(file_path), detail_level)
+    payload = _geojson_cache.get(key)
+    if payload is None:
+        store = _get_geometry_store()
+        if store is not None:
+            payload = get_geometry_payload(store, file_path, detail_level)
+        if payload is None:
+            payload = encode_geometry_json(get_geometry_template(file_path, detail_level))
+        _geojson_cache[key] = payload
+    return payload
+
+
+def encode_geometry_json(template: Dict) -> bytes:
+    geojson_data = dict(template)
+    geojson_data['features'] = [
+        {**feature, 'properties': {'name': (feature.get('properties') or {}).get('name', 'Unknown'), 'idx': idx}}
+        for idx, feature in enumerate(template['features'])
+    ]
+    return json.dumps(geojson_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def compute_feature_values(region_names: List[str], year, data_type, compare_year=None,
+                           comparison_mode="absolute", display_mode="absolute", adjustment_year="none",
+                           is_regions: bool = True) -> Dict:
+    """Значения показателя и изменения в порядке region_names.
+
+    deltas равен None, если режим сравнения не выбран.
+    """
     if data_type == "none":
-        for feature in geojson_data['features']:
-            feature['properties'] = {'name': feature['properties'].get('name', 'Unknown')}
-        return geojson_data
+        return {"values": [None] * len(region_names), "deltas": None}
 
     data_loader = _get_data_loader()
 
     # Обработка преобладающего сектора
     if data_type == "dominant_sector":
         dominant_sectors = calculate_dominant_sector(year, is_regions)
-        for feature in geojson_data['features']:
-            region_name = feature['properties']['name']
-            feature['properties']["dominant_sector"] = dominant_sectors.get(region_name, "Не определен")
-        return geojson_data
+        return {"values": [dominant_sectors.get(name, "Не определен") for name in region_names], "deltas": None}
 
     # Загрузка данных для текущего года
-    current_data = data_loader.get_indicator_data(data_type, year, is_regions)
-
     if display_mode == "relative" and data_type != "total_volume":
-        shares_data = calculate_relative_shares(data_type, year, is_regions)
-        for feature in geojson_data['features']:
-            region_name = feature['properties']['name']
-            feature['properties'][data_type] = shares_data.get(region_name)
+        source_data = calculate_relative_shares(data_type, year, is_regions)
     else:
-        for feature in geojson_data['features']:
-            region_name = feature['properties']['name']
-            feature['properties'][data_type] = current_data.get(region_name)
+        source_data = data_loader.get_indicator_data(data_type, year, is_regions)
+    values = [source_data.get(name) for name in region_names]
 
     # Корректировка цен для денежных показателей
-    monetary_indicators = ["salary", "gdp", "gdp_per_capita", "mining_industry",
-                           "manufacturing_industry", "agriculture", "water_supply",
-                           "energy_supply", "services", "total_volume"]
-
-    if (adjustment_year != "none" and
-            data_type != "none" and
-            data_type in monetary_indicators):
+    if adjustment_year != "none" and data_type in MONETARY_INDICATORS:
         try:
             from utils.price_adjuster import price_adjuster
-            for feature in geojson_data['features']:
-                region_name = feature['properties']['name']
-                if data_type in feature['properties'] and feature['properties'][data_type] is not None:
-                    original_value = feature['properties'][data_type]
-                    adjusted_value = price_adjuster.adjust_value(
-                        original_value, region_name, year, int(adjustment_year), is_regions
-                    )
-                    feature['properties'][data_type] = adjusted_value
+            original_values = np.array([np.nan if value is None else value for value in values], dtype=float)
+            adjusted_values = price_adjuster.adjust_array(
+                original_values, region_names, year, int(adjustment_year), is_regions
+            )
+            values = [None if np.isnan(value) else float(value) for value in adjusted_values]
         except Exception:
             pass
 
+    deltas = None
     # Режим сравнения
     if compare_year and compare_year != "none":
-        _calculate_deltas_for_geojson(geojson_data, data_type, year, compare_year,
-                                      comparison_mode, display_mode, is_regions)
+        deltas = _calculate_deltas(region_names, data_type, year, compare_year,
+                                   comparison_mode, display_mode, is_regions, adjustment_year)
+
+    return {"values": values, "deltas": deltas}
+
+
+def compute_color_bins(values: List, legend_info: Dict) -> List[Optional[int]]:
+    """Номер цвета легенды для каждого значения, как в style_handle.
+
+    None - нет данных, -1 - категория вне легенды.
+    """
+    classes = legend_info.get("classes") or []
+    colorscale = legend_info.get("colorscale") or []
+    color_prop = legend_info.get("colorProp")
+
+    if color_prop == "none" or not classes:
+        return [None] * len(values)
+
+    if legend_info.get("categorical") and legend_info.get("labels"):
+        positions = {label: i for i, label in enumerate(legend_info["labels"]) if i < len(colorscale)}
+        return [None if value is None else positions.get(value, -1) for value in values]
+
+    bins = []
+    for value in values:
+        if value is None:
+            bins.append(None)
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = float('nan')
+        if np.isnan(number):
+            bins.append(None)
+            continue
+
+        if number < classes[0]:
+            color_index = 0
+        elif number >= classes[-1]:
+            color_index = len(colorscale) - 1
+        else:
+            color_index = bisect.bisect_right(classes, number) - 1
+
+        if color_prop != "delta" and not 0 <= color_index < len(colorscale):
+            color_index = None
+        bins.append(color_index)
+    return bins
+
+
+@timed("load_geojson_with_detail")
+def load_geojson_with_detail(file_path, detail_level, year, data_type="none",
+                             compare_year=None, comparison_mode="absolute",
+                             display_mode="absolute", adjustment_year="none"):
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path), detail_level, year, data_type, compare_year,
+           comparison_mode, display_mode, str(adjustment_year), get_data_version())
+    return shared_cache.get_or_compute(
+        "geojson", key,
+        lambda: _build_geojson_with_detail(file_path, detail_level, year, data_type, compare_year,
+                                           comparison_mode, display_mode, adjustment_year)
+    )
+
+
+def _build_geojson_with_detail(file_path, detail_level, year, data_type, compare_year,
+                               comparison_mode, display_mode, adjustment_year):
+    is_regions = "regions" in file_path
+
+    geojson_data = _copy_geometry_template(get_geometry_template(file_path, detail_level))
+
+    if data_type == "none":
+        for feature in geojson_data['features']:
+            feature['properties'] = {'name': feature['properties'].get('name', 'Unknown')}
+        return geojson_data
+
+    region_names = [feature['properties']['name'] for feature in geojson_data['features']]
+    vectors = compute_feature_values(region_names, year, data_type, compare_year, comparison_mode,
+                                     display_mode, adjustment_year, is_regions)
+
+    for feature, value in zip(geojson_data['features'], vectors["values"]):
+        feature['properties'][data_type] = value
+
+    if vectors["deltas"] is not None:
+        for feature, delta in zip(geojson_data['features'], vectors["deltas"]):
+            feature['properties']['delta'] = delta
 
     return geojson_data
 
 
+@timed("get_legend_info_with_adjustment")
 def get_legend_info_with_adjustment(data_type: str, display_mode: str, is_regions: bool = True, adjustment_year="none",
                                     target_year=None) -> Dict:
     if data_type == "none":
@@ -331,28 +521,21 @@ def _generate_classes_with_adjustment(data_type: str, is_regions: bool = True, a
     if target_year is None:
         target_year = get_default_year()
 
-    regions_data = data_loader.get_indicator_data(data_type, target_year, is_regions)
-    if not regions_data:
+    indicator_values, mask = data_loader.get_indicator_array(data_type, target_year, is_regions)
+    if not mask.any():
         return [0, 100, 500, 1000, 2000, 5000]
 
-    values = []
-    monetary_indicators = ["salary", "gdp", "gdp_per_capita", "mining_industry",
-                           "manufacturing_industry", "agriculture", "water_supply",
-                           "energy_supply", "services", "total_volume"]
+    positive = mask & (np.nan_to_num(indicator_values) > 0)
 
-    if adjustment_year != "none" and data_type in monetary_indicators:
+    if adjustment_year != "none" and data_type in MONETARY_INDICATORS:
         from .price_adjuster import price_adjuster
-        for region_name, value in regions_data.items():
-            if value is not None and value > 0:
-                try:
-                    adjusted_value = price_adjuster.adjust_value(
-                        value, region_name, target_year, int(adjustment_year), is_regions
-                    )
-                    values.append(adjusted_value)
-                except:
-                    values.append(value)
-    else:
-        values = [v for v in regions_data.values() if v is not None and v > 0]
+        try:
+            indicator_values = price_adjuster.adjust_array(
+                indicator_values, data_loader.get_region_ids(is_regions), target_year, int(adjustment_year), is_regions
+            )
+        except Exception:
+            pass
+    values = indicator_values[positive].tolist()
 
     if not values:
         return [0, 100, 500, 1000, 2000, 5000]
@@ -367,130 +550,51 @@ def _generate_classes_with_adjustment(data_type: str, is_regions: bool = True, a
             base = min_val
             return [0, base * 0.5, base, base * 1.5, base * 2, base * 2.5]
 
-    try:
-        import numpy as np
-        quantiles = np.quantile(values, [0, 0.2, 0.4, 0.6, 0.8, 1.0])
-        classes = [float(q) for q in quantiles]
+    classes = quantile_breaks(values, 5)
 
-        for i in range(len(classes)):
-            if classes[i] > 100:
-                classes[i] = round(classes[i])
-            elif classes[i] > 10:
-                classes[i] = round(classes[i], 1)
+    for i in range(len(classes)):
+        if classes[i] > 100:
+            classes[i] = round(classes[i])
+        elif classes[i] > 10:
+            classes[i] = round(classes[i], 1)
 
-        return classes
-    except ImportError:
-        step = (max_val - min_val) / 5
-        classes = [min_val + i * step for i in range(6)]
-        for i in range(len(classes)):
-            if classes[i] > 100:
-                classes[i] = round(classes[i])
-            elif classes[i] > 10:
-                classes[i] = round(classes[i], 1)
-        return classes
-
-
-def _calculate_deltas_for_geojson(geojson_data: Dict, data_type: str, current_year: int,
-                                  compare_year: int, comparison_mode: str, display_mode: str,
-                                  is_regions: bool):
-    data_loader = _get_data_loader()
-    absolute_indicators = ["salary", "gdp", "gdp_per_capita", "population"]
+    return classes
 
-    if display_mode == "relative" and data_type != "total_volume" and data_type not in absolute_indicators:
-        current_shares = calculate_relative_shares(data_type, current_year, is_regions)
-        compare_shares = calculate_relative_shares(data_type, compare_year, is_regions)
 
-        for feature in geojson_data['features']:
-            region_name = feature['properties']['name']
-            current_share = current_shares.get(region_name)
-            compare_share = compare_shares.get(region_name)
-
-            if current_share is not None and compare_share is not None:
-                feature['properties']['delta'] = current_share - compare_share
-            else:
-                feature['properties']['delta'] = None
+def _calculate_deltas(region_names: List[str], data_type: str, current_year: int,
+                      compare_year: int, comparison_mode: str, display_mode: str,
+                      is_regions: bool, adjustment_year="none") -> List[Optional[float]]:
+    deltas = compute_deltas(data_type, current_year, compare_year, is_regions, adjustment_year)
+
+    if display_mode == "relative" and data_type != "total_volume" and data_type not in ABSOLUTE_INDICATORS:
+        delta_values = deltas["share_pp"]
+    elif comparison_mode == "absolute":
+        delta_values = deltas["absolute"]
     else:
-        compare_data = data_loader.get_indicator_data(data_type, compare_year, is_regions)
+        delta_values = deltas["relative"]
 
-        for feature in geojson_data['features']:
-            region_name = feature['properties']['name']
-            current_value = feature['properties'].get(data_type)
-            compare_value = compare_data.get(region_name)
-
-            if current_value is not None and compare_value is not None:
-                if comparison_mode == "absolute":
-                    feature['properties']['delta'] = current_value - compare_value
-                else:
-                    if compare_value != 0:
-                        feature['properties']['delta'] = ((current_value - compare_value) / compare_value) * 100
-                    else:
-                        feature['properties']['delta'] = 0
-            else:
-                feature['properties']['delta'] = None
+    return take_aligned(delta_values, region_names, is_regions)
 
 
 def calculate_relative_shares(data_type: str, year: int, is_regions: bool = True) -> Dict[str, float]:
-    data_loader = _get_data_loader()
-    indicator_data = data_loader.get_indicator_data(data_type, year, is_regions)
-    total_volume_data = data_loader.get_indicator_data("total_volume", year, is_regions)
-
-    if not indicator_data or not total_volume_data:
-        return {}
-
-    relative_shares = {}
-    for region_name, value in indicator_data.items():
-        if region_name in total_volume_data and total_volume_data[region_name] != 0:
-            share = (value / total_volume_data[region_name]) * 100
-            relative_shares[region_name] = share
-        else:
-            relative_shares[region_name] = 0
-
-    return relative_shares
+    shares = get_share_vector(data_type, year, is_regions)
+    region_ids = _get_data_loader().get_region_ids(is_regions)
+    return {region_ids[i]: float(shares[i]) for i in np.flatnonzero(~np.isnan(shares))}
 
 
 def calculate_dominant_sector(year: int, is_regions: bool = True) -> Dict[str, str]:
-    data_loader = _get_data_loader()
-    sectors = {
-        "mining_industry": "Добывающая",
-        "manufacturing_industry": "Обрабатывающая",
-        "agriculture": "Сельское хозяйство",
-        "services": "Сфера услуг"
-    }
-
-    dominant_sectors = {}
-    sector_data = {}
-
-    for sector_type, sector_name in sectors.items():
-        sector_data[sector_type] = data_loader.get_indicator_data(sector_type, year, is_regions)
-
-    all_regions = set()
-    for sector in sector_data.values():
-        all_regions.update(sector.keys())
-
-    for region in all_regions:
-        max_share = 0
-        dominant_sector = "Не определен"
-        total_volume_data = data_loader.get_indicator_data("total_volume", year, is_regions)
-        region_total = total_volume_data.get(region, 0)
+    return get_sector_structure(year, is_regions).dominant_sectors()
 
-        if region_total > 0:
-            for sector_type, sector_name in sectors.items():
-                sector_value = sector_data[sector_type].get(region, 0)
-                share = (sector_value / region_total) * 100
 
-                if share > max_share:
-                    max_share = share
-                    dominant_sector = sector_name
-
-        if max_share < 25:
-            dominant_sector = "Диверсифицированная"
-
-        dominant_sectors[region] = dominant_sector
-
-    return dominant_sectors
+@timed("get_legend_info")
+def get_legend_info(data_type: str, is_regions: bool = True, adjustment_year="none", target_year=None) -> Dict:
+    key = (data_type, is_regions, str(adjustment_year), target_year, get_data_version())
+    return shared_cache.get_or_compute(
+        "legend", key, lambda: _build_legend_info(data_type, is_regions, adjustment_year, target_year)
+    )
 
 
-def get_legend_info(data_type: str, is_regions: bool = True, adjustment_year="none", target_year=None) -> Dict:
+def _build_legend_info(data_type: str, is_regions: bool, adjustment_year, target_year) -> Dict:
     if data_type == "none":
         return {
             "classes": [0, 1],
@@ -512,13 +616,11 @@ def get_legend_info(data_type: str, is_regions: bool = True, adjustment_year="no
             "labels": sectors
         }
 
-    data_loader = _get_data_loader()
-    available_indicators = data_loader.get_available_indicators()
-    indicator_meta = next((ind for ind in available_indicators if ind["type"] == data_type), None)
+    indicator_meta = _get_data_loader().get_indicator_meta(data_type)
 
     if indicator_meta:
         classes = _generate_classes_with_adjustment(data_type, is_regions, adjustment_year, target_year)
-        colorscale = _get_colorscale(data_type)
+        colorscale = list(indicator_meta.colorscale)
 
         if len(classes) < 2:
             classes = [0, 100, 500, 1000, 2000, 5000]
@@ -526,7 +628,7 @@ def get_legend_info(data_type: str, is_regions: bool = True, adjustment_year="no
             colorscale = colorscale * (len(classes) // len(colorscale) + 1)
             colorscale = colorscale[:len(classes) - 1]
 
-        title = f"{indicator_meta['label']}, {indicator_meta['unit']}"
+        title = f"{indicator_meta.label}, {indicator_meta.unit}"
         if adjustment_year != "none":
             title += f" (в ценах {adjustment_year} г.)"
         if target_year:
@@ -553,61 +655,79 @@ def get_legend_info(data_type: str, is_regions: bool = True, adjustment_year="no
         }
 
 
-def get_delta_legend_info(data_type: str, compare_year: int, comparison_mode: str, is_regions: bool = True) -> Dict:
-    if compare_year == "none":
-        return get_legend_info(data_type, is_regions)
+def _delta_values(deltas, mode: str) -> np.ndarray:
+    values = deltas[mode]
+    return values[~np.isnan(values)]
 
-    data_loader = _get_data_loader()
-    current_year = get_default_year()
 
-    deltas = []
-    for region in data_loader.get_indicator_data(data_type, current_year, is_regions):
-        compare_data = data_loader.get_indicator_data(data_type, compare_year, is_regions)
-        if region in compare_data:
-            current_val = data_loader.get_indicator_data(data_type, current_year, is_regions)[region]
-            compare_val = compare_data[region]
+def _delta_legend_from_values(values: np.ndarray, comparison_mode: str, data_type: str, scheme: str) -> Dict:
+    if scheme == "symmetric":
+        return create_delta_legend_info(float(values.min()), float(values.max()), comparison_mode, data_type)
 
-            if current_val is not None and compare_val is not None:
-                if comparison_mode == "absolute":
-                    delta = current_val - compare_val
-                else:
-                    delta = ((current_val - compare_val) / compare_val) * 100 if compare_val != 0 else 0
-                deltas.append(delta)
+    classes = classify(values, scheme, k=len(SEQUENTIAL_COLORSCALE))
+    return {
+        "colorscale": scheme_colorscale(scheme, len(classes) - 1),
+        "classes": classes,
+        "colorProp": "delta",
+        "title": "Абсолютное изменение" if comparison_mode == "absolute" else "Относительное изменение (%)"
+    }
 
-    if not deltas:
-        return get_default_delta_legend_info(comparison_mode)
 
-    min_delta = min(deltas)
-    max_delta = max(deltas)
+@timed("get_delta_legend_info")
+def get_delta_legend_info(data_type: str, compare_year: int, comparison_mode: str, is_regions: bool = True,
+                          current_year=None, adjustment_year="none", scheme: str = DEFAULT_DELTA_SCHEME) -> Dict:
+    if compare_year == "none":
+        return get_legend_info(data_type, is_regions)
 
-    if comparison_mode == "relative":
-        min_delta = max(min_delta, -100)
-        max_delta = min(max_delta, 100)
+    if current_year is None:
+        current_year = get_default_year()
 
-    return create_delta_legend_info(min_delta, max_delta, comparison_mode, data_type)
+    key = ("delta", data_type, current_year, compare_year, comparison_mode, is_regions, str(adjustment_year), scheme,
+           get_data_version())
+    legend_info = legend_cache.get(key)
+    if legend_info is None:
+        def build():
+            mode = "absolute" if comparison_mode == "absolute" else "relative"
+            deltas = _delta_values(compute_deltas(data_type, current_year, compare_year, is_regions, adjustment_year), mode)
 
+            if not len(deltas):
+                return get_default_delta_legend_info(comparison_mode)
+            if comparison_mode == "relative":
+                deltas = np.clip(deltas, -100, 100)
+            return _delta_legend_from_values(deltas, comparison_mode, data_type, scheme)
 
-def get_delta_legend_info_for_shares(data_type: str, compare_year: int, comparison_mode: str,
-                                     is_regions: bool = True) -> Dict:
-    current_shares = calculate_relative_shares(data_type, get_default_year(), is_regions)
-    compare_shares = calculate_relative_shares(data_type, compare_year, is_regions)
+        legend_info = shared_cache.get_or_compute("legend", key, build)
+        legend_cache.set(key, legend_info)
 
-    share_deltas = []
-    for region in current_shares:
-        if region in compare_shares and current_shares[region] is not None and compare_shares[region] is not None:
-            delta_pp = current_shares[region] - compare_shares[region]
-            share_deltas.append(delta_pp)
+    return dict(legend_info)
 
-    if not share_deltas:
-        return get_default_share_delta_legend_info()
 
-    min_delta = min(share_deltas)
-    max_delta = max(share_deltas)
+@timed("get_delta_legend_info_for_shares")
+def get_delta_legend_info_for_shares(data_type: str, compare_year: int, comparison_mode: str,
+                                     is_regions: bool = True, current_year=None,
+                                     scheme: str = DEFAULT_DELTA_SCHEME) -> Dict:
+    if current_year is None:
+        current_year = get_default_year()
+
+    key = ("share_delta", data_type, current_year, compare_year, is_regions, scheme, get_data_version())
+    legend_info = legend_cache.get(key)
+    if legend_info is None:
+        def build():
+            share_deltas = _delta_values(compute_deltas(data_type, current_year, compare_year, is_regions), "share_pp")
 
-    min_delta = max(min_delta, -70)
-    max_delta = min(max_delta, 70)
+            if not len(share_deltas):
+                return get_default_share_delta_legend_info()
+            if scheme == "symmetric":
+                share_deltas = np.clip(share_deltas, -70, 70)
+                return create_share_delta_legend_info(float(share_deltas.min()), float(share_deltas.max()), data_type)
+            result = _delta_legend_from_values(share_deltas, "share", data_type, scheme)
+            result["title"] = "Изменение доли (п.п.)"
+            return result
 
-    return create_share_delta_legend_info(min_delta, max_delta, data_type)
+        legend_info = shared_cache.get_or_compute("legend", key, build)
+        legend_cache.set(key, legend_info)
+
+    return dict(legend_info)
 
 
 def get_default_delta_legend_info(comparison_mode: str) -> Dict:
@@ -639,46 +759,9 @@ def get_default_share_delta_legend_info() -> Dict:
 
 
 def create_delta_legend_info(min_val: float, max_val: float, comparison_mode: str, data_type: str) -> Dict:
-    if comparison_mode == "absolute":
-        max_abs = max(abs(min_val), abs(max_val))
-        if max_abs < 10:
-            step = 1
-        elif max_abs < 50:
-            step = 5
-        elif max_abs < 200:
-            step = 20
-        elif max_abs < 1000:
-            step = 100
-        else:
-            step = 500
-
-        negative_classes = [-step * i for i in range(4, 0, -1)]
-        positive_classes = [step * i for i in range(1, 5)]
-        classes = negative_classes + [0] + positive_classes
-    else:
-        max_abs = max(abs(min_val), abs(max_val))
-        if max_abs < 10:
-            step = 2
-        elif max_abs < 30:
-            step = 5
-        elif max_abs < 70:
-            step = 10
-        else:
-            step = 20
-
-        negative_classes = [-step * i for i in range(4, 0, -1)]
-        positive_classes = [step * i for i in range(1, 5)]
-        classes = negative_classes + [0] + positive_classes
-
-    colorscale = [
-        '#8b0000', '#ff0000', '#ff6666', '#ffcccc', '#f0f0f0',
-        '#ccffcc', '#66ff66', '#00ff00', '#008000'
-    ]
-
-    num_colors_needed = len(classes) - 1
-    if num_colors_needed < len(colorscale):
-        start_idx = (len(colorscale) - num_colors_needed) // 2
-        colorscale = colorscale[start_idx:start_idx + num_colors_needed]
+    steps = DELTA_STEPS["absolute"] if comparison_mode == "absolute" else DELTA_STEPS["relative"]
+    classes = symmetric_breaks(min_val, max_val, steps)
+    colorscale = diverging_colorscale(len(classes) - 1)
 
     title = "Абсолютное изменение" if comparison_mode == "absolute" else "Относительное изменение (%)"
 
@@ -691,32 +774,8 @@ def create_delta_legend_info(min_val: float, max_val: float, comparison_mode: st
 
 
 def create_share_delta_legend_info(min_val: float, max_val: float, data_type: str) -> Dict:
-    max_abs = max(abs(min_val), abs(max_val))
-
-    if max_abs < 5:
-        step = 1
-    elif max_abs < 15:
-        step = 3
-    elif max_abs < 30:
-        step = 5
-    elif max_abs < 50:
-        step = 10
-    else:
-        step = 15
-
-    negative_classes = [-step * i for i in range(4, 0, -1)]
-    positive_classes = [step * i for i in range(1, 5)]
-    classes = negative_classes + [0] + positive_classes
-
-    colorscale = [
-        '#8b0000', '#ff0000', '#ff6666', '#ffcccc', '#f0f0f0',
-        '#ccffcc', '#66ff66', '#00ff00', '#008000'
-    ]
-
-    num_colors_needed = len(classes) - 1
-    if num_colors_needed < len(colorscale):
-        start_idx = (len(colorscale) - num_colors_needed) // 2
-        colorscale = colorscale[start_idx:start_idx + num_colors_needed]
+    classes = symmetric_breaks(min_val, max_val, DELTA_STEPS["share"])
+    colorscale = diverging_colorscale(len(classes) - 1)
 
     return {
         "colorscale": colorscale,
@@ -726,25 +785,6 @@ def create_share_delta_legend_info(min_val: float, max_val: float, data_type: st
     }
 
 
-def _get_colorscale(data_type: str) -> List[str]:
-    color_schemes = {
-        "population": ["#c6e48b", "#7bc96f", "#239a3b", "#196127", "#0d3b1e"],
-        "gdp": ["#c6dbef", "#6baed6", "#3182bd", "#08519c", "#08306b"],
-        "salary": ["#fcbba1", "#fb6a4a", "#de2d26", "#a50f15", "#67000d"],
-        "gdp_per_capita": ["#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#41ab5d"],
-        "mining_industry": ["#ffffcc", "#ffeda0", "#fed976", "#feb24c", "#fd8d3c"],
-        "manufacturing_industry": ["#fddbc7", "#f4a582", "#d6604d", "#b2182b", "#67001f"],
-        "agriculture": ["#dadaeb", "#bcbddc", "#9e9ac8", "#756bb1", "#54278f"],
-        "water_supply": ["#c6dbef", "#6baed6", "#3182bd", "#08519c", "#08306b"],
-        "energy_supply": ["#fcbba1", "#fb6a4a", "#de2d26", "#a50f15", "#67000d"],
-        "total_volume": ["#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#41ab5d"],
-        "services": ["#e6f3ff", "#b3d9ff", "#80bfff", "#4da6ff", "#1a8cff"],
-        "dominant_sector": [
-            "#ff6b6b", "#4ecdc4", "#ffe66d", "#96ceb4", "#feca57"
-        ]
-    }
-    return color_schemes.get(data_type, ["#c6e48b", "#7bc96f", "#239a3b", "#196127", "#0d3b1e"])
-
 def get_legend_info_with_mode(data_type: str, display_mode: str, is_regions: bool = True, target_year=None) -> Dict:
     """Получение информации для легенды с учетом режима отображения и года"""
     if data_type == "none":
@@ -0,0 +1,104 @@
+# Предварительное упрощение геометрии для уровней детализации
+#
+# Упрощение выполняется один раз для всего набора объектов векторизованными
+# функциями shapely 2 и сохраняется в cache/geometry/. load_geojson_with_detail
+# читает готовый артефакт вместо упрощения во время запроса.
+# Сборка: python build_cache.py geometry [--tolerances 0.7 0.3]
+
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+from utils.data_cache import CACHE_DIR, describe_sources, sources_match
+
+GEOMETRY_DIR = os.path.join(CACHE_DIR, "geometry")
+GEOMETRY_FORMAT_VERSION = 1
+
+GEOJSON_FILES = [
+    "assets/russia_regions_pf.geojson",
+    "assets/russia_districts_pf.geojson"
+]
+
+SIMPLIFIABLE_TYPES = ('Polygon', 'MultiPolygon')
+
+
+def get_artifact_path(file_path: str, tolerance: float) -> str:
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(GEOMETRY_DIR, f"{stem}.lod-{tolerance:g}.v{GEOMETRY_FORMAT_VERSION}.json")
+
+
+def simplify_features(features: List[Dict], tolerance: float) -> List[Dict]:
+    """Упрощение геометрии всех объектов одним вызовом shapely.simplify"""
+    import numpy as np
+    import shapely
+
+    positions = [i for i, feature in enumerate(features)
+                 if feature.get('geometry') and feature['geometry'].get('type') in SIMPLIFIABLE_TYPES]
+    if not positions:
+        return list(features)
+
+    geometries = shapely.from_geojson(np.array([json.dumps(features[i]['geometry']) for i in positions], dtype=object))
+    simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    simplified_json = shapely.to_geojson(simplified)
+
+    result = list(features)
+    for position, geometry_json in zip(positions, simplified_json):
+        result[position] = {**features[position], 'geometry': json.loads(geometry_json)}
+    return result
+
+
+def build_lod_artifact(file_path: str, tolerance: float) -> str:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        geojson_data = json.load(f)
+
+    geojson_data['features'] = simplify_features(geojson_data['features'], tolerance)
+    artifact = {
+        "version": GEOMETRY_FORMAT_VERSION,
+        "tolerance": tolerance,
+        "sources": describe_sources([file_path]),
+        "geojson": geojson_data
+    }
+
+    artifact_path = get_artifact_path(file_path, tolerance)
+    os.makedirs(GEOMETRY_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=GEOMETRY_DIR, prefix=".lod.", suffix=".json")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(artifact, f, ensure_ascii=False, separators=(',', ':'))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, artifact_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return artifact_path
+
+
+def build_lod_artifacts(tolerances: Iterable[float], file_paths: Optional[List[str]] = None) -> List[str]:
+    built = []
+    for file_path in file_paths or GEOJSON_FILES:
+        if not os.path.exists(file_path):
+            print(f"Файл геометрии не найден: {file_path}")
+            continue
+        for tolerance in tolerances:
+            built.append(build_lod_artifact(file_path, tolerance))
+    return built
+
+
+def load_lod_artifact(file_path: str, tolerance: float) -> Optional[Dict]:
+    """Готовая упрощенная геометрия или None, если артефакта нет или он устарел"""
+    artifact_path = get_artifact_path(file_path, tolerance)
+    if not os.path.exists(artifact_path):
+        return None
+
+    try:
+        with open(artifact_path, 'r', encoding='utf-8') as f:
+            artifact = json.load(f)
+        if artifact.get("version") != GEOMETRY_FORMAT_VERSION or artifact.get("tolerance") != tolerance:
+            return None
+        if not sources_match(artifact.get("sources", []), [file_path]):
+            return None
+        return artifact["geojson"]
+    except Exception as e:
+        print(f"Ошибка чтения геометрии {artifact_path}: {e}")
+        return None
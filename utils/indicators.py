@@ -0,0 +1,87 @@
+# Реестр показателей: единый источник подписей, единиц измерения, признаков и цветовых схем
+#
+# Метаданные описаны один раз здесь; DataLoader при загрузке строит по ним реестр
+# показателей, которые реально есть в данных (get_indicator_registry).
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_UNIT = "ед."
+DEFAULT_COLORSCALE = ("#c6e48b", "#7bc96f", "#239a3b", "#196127", "#0d3b1e")
+
+
+@dataclass(frozen=True)
+class IndicatorMeta:
+    type: str
+    label: str
+    unit: str = DEFAULT_UNIT
+    # Денежный показатель: пересчитывается в цены выбранного года
+    monetary: bool = False
+    # Отрасль производства: составляющая суммарного объема, для нее есть доля в регионе
+    production: bool = False
+    # Показатель не имеет доли в суммарном объеме (изменения - только в ед. или %)
+    absolute: bool = False
+    colorscale: Tuple[str, ...] = DEFAULT_COLORSCALE
+
+    @property
+    def description(self) -> str:
+        return self.label
+
+    def to_dict(self) -> Dict:
+        return {"type": self.type, "label": self.label, "description": self.description, "unit": self.unit}
+
+
+INDICATORS: Dict[str, IndicatorMeta] = {meta.type: meta for meta in (
+    IndicatorMeta("population", "Население", "тыс. чел.", absolute=True,
+                  colorscale=("#c6e48b", "#7bc96f", "#239a3b", "#196127", "#0d3b1e")),
+    IndicatorMeta("salary", "Среднемесячная номинальная ЗП", "руб.", monetary=True, absolute=True,
+                  colorscale=("#fcbba1", "#fb6a4a", "#de2d26", "#a50f15", "#67000d")),
+    IndicatorMeta("gdp", "Валовой региональный продукт", "млн руб.", monetary=True, absolute=True,
+                  colorscale=("#c6dbef", "#6baed6", "#3182bd", "#08519c", "#08306b")),
+    IndicatorMeta("gdp_per_capita", "ВРП на душу населения", "тыс. руб.", monetary=True, absolute=True,
+                  colorscale=("#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#41ab5d")),
+    IndicatorMeta("mining_industry", "Добывающая промышленность", monetary=True, production=True,
+                  colorscale=("#ffffcc", "#ffeda0", "#fed976", "#feb24c", "#fd8d3c")),
+    IndicatorMeta("manufacturing_industry", "Обрабатывающая промышленность", monetary=True, production=True,
+                  colorscale=("#fddbc7", "#f4a582", "#d6604d", "#b2182b", "#67001f")),
+    IndicatorMeta("agriculture", "Сельское хозяйство", monetary=True, production=True,
+                  colorscale=("#dadaeb", "#bcbddc", "#9e9ac8", "#756bb1", "#54278f")),
+    IndicatorMeta("water_supply", "Водоснабжение", monetary=True, production=True,
+                  colorscale=("#c6dbef", "#6baed6", "#3182bd", "#08519c", "#08306b")),
+    IndicatorMeta("energy_supply", "Электроснабжение", monetary=True, production=True,
+                  colorscale=("#fcbba1", "#fb6a4a", "#de2d26", "#a50f15", "#67000d")),
+    IndicatorMeta("total_volume", "Суммарный объем", monetary=True,
+                  colorscale=("#e5f5e0", "#c7e9c0", "#a1d99b", "#74c476", "#41ab5d")),
+    IndicatorMeta("services", "Сфера услуг", monetary=True, production=True,
+                  colorscale=("#e6f3ff", "#b3d9ff", "#80bfff", "#4da6ff", "#1a8cff")),
+)}
+
+# Русское название столбца в исходных таблицах -> тип показателя
+INDICATOR_MAPPING = {meta.label: meta.type for meta in INDICATORS.values()}
+REVERSE_MAPPING = {meta.type: meta.label for meta in INDICATORS.values()}
+
+MONETARY_INDICATORS = [meta.type for meta in INDICATORS.values() if meta.monetary]
+PRODUCTION_INDICATORS = [meta.type for meta in INDICATORS.values() if meta.production]
+ABSOLUTE_INDICATORS = [meta.type for meta in INDICATORS.values() if meta.absolute]
+
+
+def indicator_for_column(column: str) -> IndicatorMeta:
+    """Метаданные столбца исходной таблицы; для неизвестного столбца - по умолчанию"""
+    indicator_type = INDICATOR_MAPPING.get(column)
+    if indicator_type is not None:
+        return INDICATORS[indicator_type]
+    return IndicatorMeta(column.lower().replace(' ', '_'), column)
+
+
+def build_registry(columns: List[str]) -> Dict[str, IndicatorMeta]:
+    """Реестр показателей, присутствующих в данных, в порядке столбцов"""
+    registry = {}
+    for column in columns:
+        meta = indicator_for_column(column)
+        registry[meta.type] = meta
+    return registry
+
+
+def get_colorscale(data_type: str) -> List[str]:
+    meta = INDICATORS.get(data_type)
+    return list(meta.colorscale if meta else DEFAULT_COLORSCALE)
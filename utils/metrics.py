@@ -0,0 +1,213 @@
+# Метрики приложения в текстовом формате Prometheus
+#
+# Собираются без внешних зависимостей и с небольшими накладными расходами (два вызова
+# perf_counter и запись в гистограмму под блокировкой), поэтому включены и в продакшене:
+#   dash_callback_*  - каждый callback Dash: число вызовов, ошибки, время и объем ответа
+#                      (response_bytes - сериализованный ответ, wire_bytes - переданный, после сжатия);
+#   function_*       - основные функции utils, отмеченные декоратором timed;
+#   cache_*          - попадания и промахи зарегистрированных кэшей (register_cache);
+#   counter_*        - произвольные счетчики (register_counter);
+#   прочие           - произвольные значения (register_gauge), например фазы запуска.
+#
+# Метрики ведутся в каждом процессе (воркере gunicorn) отдельно и помечаются меткой pid.
+# Настройки: METRICS_ENABLED=0 отключает сбор, METRICS_PATH - адрес страницы (по умолчанию /metrics).
+
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+DASH_UPDATE_PATH = "/_dash-update-component"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def lines(self, name: str, labels: str) -> List[str]:
+        result = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            result.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        cumulative += self.counts[-1]
+        result.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        result.append(f"{name}_sum{{{labels}}} {self.total:.6f}")
+        result.append(f"{name}_count{{{labels}}} {cumulative}")
+        return result
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self._sizes = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self._wire_sizes = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self._errors = defaultdict(int)
+        self._caches = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, kind: str, name: str, seconds: float, size: Optional[int] = None, error: bool = False,
+                wire_size: Optional[int] = None):
+        key = (kind, name)
+        with self._lock:
+            self._latency[key].observe(seconds)
+            if size is not None:
+                self._sizes[key].observe(size)
+            if wire_size is not None:
+                self._wire_sizes[key].observe(wire_size)
+            if error:
+                self._errors[key] += 1
+
+    def register_cache(self, name: str, stats_fn: Callable[[], Dict]):
+        """Кэш с методом stats(), возвращающим hits / misses (и при наличии entries / bytes)"""
+        self._caches[name] = stats_fn
+
+    def register_counter(self, name: str, counter: Dict, label: str):
+        """Словарь счетчиков (например, collections.Counter) - метрика counter_<name>_total"""
+        self._counters[name] = (counter, label)
+
+    def register_gauge(self, name: str, values: Dict, label: str):
+        """Словарь текущих значений - метрика <name> с меткой label"""
+        self._gauges[name] = (values, label)
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._sizes.clear()
+            self._wire_sizes.clear()
+            self._errors.clear()
+
+    def render(self) -> str:
+        base_labels = f'pid="{os.getpid()}"'
+        lines = []
+        with self._lock:
+            for kind, title in (("dash_callback", "Callback Dash"), ("function", "Функция utils")):
+                keys = sorted(key for key in self._latency if key[0] == kind)
+                lines.append(f"# HELP {kind}_seconds {title}: время выполнения")
+                lines.append(f"# TYPE {kind}_seconds histogram")
+                for key in keys:
+                    lines.extend(self._latency[key].lines(f"{kind}_seconds", f'{base_labels},name="{_escape(key[1])}"'))
+                lines.append(f"# TYPE {kind}_errors_total counter")
+                for key in keys:
+                    lines.append(f'{kind}_errors_total{{{base_labels},name="{_escape(key[1])}"}} {self._errors.get(key, 0)}')
+
+            for metric, title, sizes in (("dash_callback_response_bytes", "объем ответа", self._sizes),
+                                         ("dash_callback_wire_bytes", "объем ответа после сжатия", self._wire_sizes)):
+                lines.append(f"# HELP {metric} Callback Dash: {title}")
+                lines.append(f"# TYPE {metric} histogram")
+                for key in sorted(sizes):
+                    lines.extend(sizes[key].lines(metric, f'{base_labels},name="{_escape(key[1])}"'))
+
+        lines.extend(self._render_caches(base_labels))
+        for name, (counter, label) in sorted(self._counters.items()):
+            lines.append(f"# TYPE counter_{name}_total counter")
+            for key, value in sorted(dict(counter).items()):
+                lines.append(f'counter_{name}_total{{{base_labels},{label}="{_escape(key)}"}} {value}')
+        for name, (values, label) in sorted(self._gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in list(dict(values).items()):
+                lines.append(f'{name}{{{base_labels},{label}="{_escape(key)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def _render_caches(self, base_labels: str) -> List[str]:
+        lines = ["# TYPE cache_hits_total counter", "# TYPE cache_misses_total counter",
+                 "# TYPE cache_hit_ratio gauge", "# TYPE cache_entries gauge", "# TYPE cache_bytes gauge"]
+        for name, stats_fn in sorted(self._caches.items()):
+            try:
+                stats = stats_fn()
+            except Exception:
+                continue
+            labels = f'{base_labels},cache="{_escape(name)}"'
+            hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+            lines.append(f"cache_hits_total{{{labels}}} {hits}")
+            lines.append(f"cache_misses_total{{{labels}}} {misses}")
+            lines.append(f"cache_hit_ratio{{{labels}}} {hits / (hits + misses) if hits + misses else 0:.4f}")
+            for field in ("entries", "bytes"):
+                if field in stats:
+                    lines.append(f"cache_{field}{{{labels}}} {stats[field]}")
+        return lines
+
+
+metrics = Metrics()
+
+
+def timed(name: str):
+    """Декоратор: время и число вызовов функции (метрика function_seconds)"""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                metrics.observe("function", name, time.perf_counter() - start, error=error)
+        return wrapper
+    return decorator
+
+
+def install_metrics(app):
+    """Учет всех callback'ов Dash-приложения и страница метрик на app.server"""
+    import flask
+
+    server = app.server
+    callback_names = {}
+
+    def callback_name(output: str) -> str:
+        name = callback_names.get(output)
+        if name is None:
+            callback = app.callback_map.get(output, {}).get("callback")
+            if callback is None:
+                return "unknown"
+            name = getattr(callback, "__name__", output)
+            callback_names[output] = name
+        return name
+
+    @server.route(METRICS_PATH)
+    def serve_metrics():
+        return flask.Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    if not METRICS_ENABLED:
+        return
+
+    @server.before_request
+    def start_timer():
+        if flask.request.path.endswith(DASH_UPDATE_PATH):
+            flask.g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        start = flask.g.pop("metrics_start", None)
+        if start is not None:
+            body = flask.request.get_json(silent=True) or {}
+            # Сжатие ответа (utils/compression.py) сохраняет объем до сжатия в flask.g.response_bytes
+            metrics.observe("dash_callback", callback_name(body.get("output", "")), time.perf_counter() - start,
+                            size=flask.g.pop("response_bytes", response.content_length),
+                            error=response.status_code >= 500, wire_size=response.content_length)
+        return response
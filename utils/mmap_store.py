@@ -0,0 +1,248 @@
+# Хранилище данных в отображаемых в память массивах (mmap)
+#
+# Каталог с файлами .npy и manifest.json: куб показателей (показатель × год × регион),
+# префиксные матрицы ИПЦ и квантованная геометрия для всех уровней детализации.
+# Любой процесс (воркер, CLI, пакетная задача) открывает его только для чтения без разбора:
+# страницы читаются с диска по требованию, и на хосте остается одна физическая копия.
+#
+# Сборка: python build_cache.py store
+# Использование: DATA_STORE_PATH=<каталог> (DataLoader, PriceAdjuster и геометрия карты)
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.data_cache import CACHE_DIR, describe_sources, sources_match
+
+STORE_DIR = os.path.join(CACHE_DIR, "store")
+STORE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# Координаты хранятся целыми числами в миллионных долях градуса (~0.1 м)
+GEOMETRY_SCALE = 10 ** 6
+
+# Виды геометрии объекта в массиве feature_kind
+_POLYGON, _MULTIPOLYGON, _RAW = 0, 1, 2
+
+_open_stores = {}
+_open_lock = threading.Lock()
+
+
+def get_store_path() -> Optional[str]:
+    """Каталог хранилища из DATA_STORE_PATH (None - хранилище не используется)"""
+    return os.environ.get("DATA_STORE_PATH") or None
+
+
+def geometry_prefix(file_path: str, detail_level: float) -> str:
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return f"geometry/{stem}/{detail_level:g}/"
+
+
+class MappedStore:
+    def __init__(self, path: str, manifest: Dict):
+        self.path = path
+        self.manifest = manifest
+        self._arrays = {}
+
+    def has(self, name: str) -> bool:
+        return name in self.manifest["arrays"]
+
+    def array(self, name: str) -> np.ndarray:
+        """Массив только для чтения, отображенный в память"""
+        array = self._arrays.get(name)
+        if array is None:
+            info = self.manifest["arrays"][name]
+            array = np.load(os.path.join(self.path, info["file"]), mmap_mode="r", allow_pickle=False)
+            self._arrays[name] = array
+        return array
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        """Все массивы с общим префиксом имени, ключи - без префикса"""
+        return {name[len(prefix):]: self.array(name) for name in self.manifest["arrays"] if name.startswith(prefix)}
+
+    def meta(self, key: str, default=None):
+        return self.manifest["meta"].get(key, default)
+
+    def sources_match(self, section: str, paths: List[str]) -> bool:
+        return sources_match(self.manifest["sources"].get(section, []), paths)
+
+
+def open_store(path: Optional[str] = None) -> Optional[MappedStore]:
+    """Открыть хранилище (один раз на процесс); None, если его нет или формат устарел"""
+    path = os.path.abspath(path or get_store_path() or STORE_DIR)
+    store = _open_stores.get(path)
+    if store is not None:
+        return store
+
+    with _open_lock:
+        store = _open_stores.get(path)
+        if store is None:
+            try:
+                with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if manifest.get("version") != STORE_FORMAT_VERSION:
+                print(f"Хранилище {path} собрано в старом формате, пересоберите: python build_cache.py store")
+                return None
+            store = MappedStore(path, manifest)
+            _open_stores[path] = store
+    return store
+
+
+def _encode_geometry(geojson_data: Dict) -> Tuple[Dict[str, np.ndarray], Dict]:
+    coords, ring_offsets, polygon_offsets, feature_offsets, kinds = [], [0], [0], [0], []
+    features_meta, raw = [], {}
+
+    for idx, feature in enumerate(geojson_data["features"]):
+        features_meta.append({key: value for key, value in feature.items() if key != "geometry"})
+        geometry = feature.get("geometry")
+        geometry_type = geometry.get("type") if geometry else None
+
+        if geometry_type == "Polygon":
+            polygons = [geometry["coordinates"]]
+            kinds.append(_POLYGON)
+        elif geometry_type == "MultiPolygon":
+            polygons = geometry["coordinates"]
+            kinds.append(_MULTIPOLYGON)
+        else:
+            polygons = []
+            kinds.append(_RAW)
+            raw[str(idx)] = geometry
+
+        for polygon in polygons:
+            for ring in polygon:
+                coords.extend(point[:2] for point in ring)
+                ring_offsets.append(len(coords))
+            polygon_offsets.append(len(ring_offsets) - 1)
+        feature_offsets.append(len(polygon_offsets) - 1)
+
+    arrays = {
+        "coords": np.rint(np.array(coords, dtype=float).reshape(-1, 2) * GEOMETRY_SCALE).astype(np.int32),
+        "ring_offsets": np.array(ring_offsets, dtype=np.int64),
+        "polygon_offsets": np.array(polygon_offsets, dtype=np.int64),
+        "feature_offsets": np.array(feature_offsets, dtype=np.int64),
+        "feature_kind": np.array(kinds, dtype=np.int8)
+    }
+    meta = {
+        "scale": GEOMETRY_SCALE,
+        "collection": {key: value for key, value in geojson_data.items() if key != "features"},
+        "features": features_meta,
+        "raw": raw
+    }
+    return arrays, meta
+
+
+def decode_geometry(store: MappedStore, file_path: str, detail_level: float) -> Optional[Dict]:
+    """GeoJSON из квантованных координат хранилища (координаты - кортежи) или None"""
+    prefix = geometry_prefix(file_path, detail_level)
+    meta = store.meta(prefix)
+    if meta is None:
+        return None
+    return _decode_geometry(store.arrays(prefix), meta)
+
+
+def _decode_geometry(arrays: Dict[str, np.ndarray], meta: Dict) -> Dict:
+    points = [tuple(point) for point in (arrays["coords"] / meta["scale"]).tolist()]
+    ring_offsets = arrays["ring_offsets"].tolist()
+    polygon_offsets = arrays["polygon_offsets"].tolist()
+    feature_offsets = arrays["feature_offsets"].tolist()
+
+    rings = [tuple(points[start:end]) for start, end in zip(ring_offsets[:-1], ring_offsets[1:])]
+    polygons = [tuple(rings[start:end]) for start, end in zip(polygon_offsets[:-1], polygon_offsets[1:])]
+
+    features = []
+    for idx, (kind, feature_meta) in enumerate(zip(arrays["feature_kind"].tolist(), meta["features"])):
+        start, end = feature_offsets[idx], feature_offsets[idx + 1]
+        if kind == _POLYGON:
+            geometry = {"type": "Polygon", "coordinates": polygons[start]}
+        elif kind == _MULTIPOLYGON:
+            geometry = {"type": "MultiPolygon", "coordinates": tuple(polygons[start:end])}
+        else:
+            geometry = meta["raw"].get(str(idx))
+        features.append({**feature_meta, "geometry": geometry})
+
+    geojson_data = dict(meta["collection"])
+    geojson_data["features"] = features
+    return geojson_data
+
+
+def get_geometry_payload(store: MappedStore, file_path: str, detail_level: float) -> Optional[bytes]:
+    """Готовая геометрия для браузера (как get_geometry_json) или None"""
+    name = geometry_prefix(file_path, detail_level) + "payload"
+    if not store.has(name):
+        return None
+    return store.array(name).tobytes()
+
+
+def _write_store(path: str, arrays: Dict[str, np.ndarray], sources: Dict, meta: Dict) -> str:
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(path)}.")
+    try:
+        index = {}
+        for i, (name, array) in enumerate(sorted(arrays.items())):
+            file_name = f"{i:03d}.npy"
+            np.save(os.path.join(tmp_dir, file_name), array, allow_pickle=False)
+            index[name] = {"file": file_name, "dtype": str(array.dtype), "shape": list(array.shape)}
+
+        manifest = {"version": STORE_FORMAT_VERSION, "sources": sources, "arrays": index, "meta": meta}
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.chmod(tmp_dir, 0o755)
+        for name in os.listdir(tmp_dir):
+            os.chmod(os.path.join(tmp_dir, name), 0o644)
+
+        # Подмена каталога целиком: уже открытые процессами файлы остаются доступными до закрытия
+        old_dir = None
+        if os.path.exists(path):
+            old_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(path)}.old.")
+            os.rmdir(old_dir)
+            os.replace(path, old_dir)
+        os.replace(tmp_dir, path)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return path
+
+
+def build_store(path: Optional[str] = None, file_paths: Optional[List[str]] = None) -> str:
+    from utils.data_loader import DataLoader
+    from utils.price_adjuster import PriceAdjuster
+    from utils.geometry_build import GEOJSON_FILES
+    from utils.geo_utils import DETAIL_LEVELS, _build_geometry_template, encode_geometry_json
+
+    data_loader = DataLoader()
+    price_adjuster = PriceAdjuster()
+
+    arrays = {f"data/{name}": array for name, array in data_loader._store_arrays().items()}
+    arrays.update({f"cpi/{name}": array for name, array in price_adjuster._store_arrays().items()})
+    geometry_files = [file_path for file_path in file_paths or GEOJSON_FILES if os.path.exists(file_path)]
+    sources = {
+        "data": describe_sources(data_loader._source_files()),
+        "cpi": describe_sources(price_adjuster._cpi_source_files()),
+        "geometry": describe_sources(geometry_files)
+    }
+    meta = {}
+
+    for file_path in geometry_files:
+        for level in DETAIL_LEVELS.values():
+            detail_level = level["value"]
+            prefix = geometry_prefix(file_path, detail_level)
+            geometry_arrays, geometry_meta = _encode_geometry(
+                _build_geometry_template(file_path, detail_level, use_store=False))
+            arrays.update({prefix + name: array for name, array in geometry_arrays.items()})
+            meta[prefix] = geometry_meta
+
+            # Геометрия для браузера собирается из тех же квантованных координат
+            payload = encode_geometry_json(_decode_geometry(geometry_arrays, geometry_meta))
+            arrays[prefix + "payload"] = np.frombuffer(payload, dtype=np.uint8)
+
+    return _write_store(path or get_store_path() or STORE_DIR, arrays, sources, meta)
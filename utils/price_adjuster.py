@@ -1,13 +1,41 @@
 import os
-import pandas as pd
-from typing import Dict, Optional
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.data_cache import load_arrays, save_arrays
+from utils.metrics import timed
+from utils.mmap_store import get_store_path, open_store
+from utils.result_cache import ResultCache
+from utils.startup import lazy_module
+
+# pandas нужен только для чтения исходных таблиц ИПЦ и DataFrame regions_cpi / districts_cpi
+pd = lazy_module("pandas")
+
+CPI_CACHE_NAME = "cpi"
+# Позиции строк ИПЦ для списков регионов: полный список карты и последние выборки аналитики
+ROW_ALIGNMENT_ENTRIES = 64
 
 class PriceAdjuster:
-    def __init__(self):
-        self.regions_cpi = None
-        self.districts_cpi = None
+    def __init__(self, use_cache: bool = True, store_path: Optional[str] = None, arrays: Optional[dict] = None):
+        # Таблицы ИПЦ по уровню (регионы / округа): (названия, годы, индексы регионы × годы)
+        self._cpi_tables: Dict[bool, Tuple[List[str], List[int], np.ndarray]] = {}
+        self._cpi_frames = {}
         self.base_year = 2023
-        self._load_cpi_data()
+        self._cpi_matrices = {}
+        self._row_alignments = ResultCache(1024 * 1024, max_entries=ROW_ALIGNMENT_ENTRIES,
+                                           size_fn=lambda rows: rows.nbytes)
+        # arrays - готовые таблицы ИПЦ в формате кэша (например, синтетические данные бенчмарков)
+        if arrays is not None:
+            self._set_cpi_arrays(arrays)
+            self._build_cpi_matrices()
+            return
+        # В хранилище (python build_cache.py store) префиксные матрицы уже посчитаны
+        if store_path and self._load_cpi_from_store(store_path):
+            return
+        if not (use_cache and self._load_cpi_from_cache()):
+            self._load_cpi_data()
+            self._save_cpi_cache()
+        self._build_cpi_matrices()
 
     def _get_data_path(self, filename):
         current_dir = os.path.dirname(__file__)
@@ -15,55 +43,235 @@ class PriceAdjuster:
         data_path = os.path.join(project_root, "data", filename)
         return data_path
 
+    def _cpi_source_files(self) -> list:
+        paths = [self._get_data_path("regional_cpi.xlsx"), self._get_data_path("federal_cpi.xlsx")]
+        return [path for path in paths if os.path.exists(path)]
+
+    def _load_cpi_from_store(self, store_path: str) -> bool:
+        store = open_store(store_path)
+        if store is None or not store.sources_match("cpi", self._cpi_source_files()):
+            print(f"Хранилище ИПЦ {store_path} отсутствует или устарело, ИПЦ загружается из файлов")
+            return False
+
+        arrays = store.arrays("cpi/")
+        self._set_cpi_arrays(arrays)
+        self._build_cpi_matrices({is_regions: arrays[f"{prefix}prefix"]
+                                  for is_regions, prefix in ((True, "regions_"), (False, "districts_"))
+                                  if f"{prefix}prefix" in arrays})
+        return True
+
+    def _load_cpi_from_cache(self) -> bool:
+        arrays = load_arrays(CPI_CACHE_NAME, self._cpi_source_files())
+        if arrays is None:
+            return False
+        self._set_cpi_arrays(arrays)
+        return True
+
+    def _set_cpi_arrays(self, arrays):
+        for is_regions, prefix in ((True, "regions_"), (False, "districts_")):
+            if f"{prefix}values" in arrays:
+                self._cpi_tables[is_regions] = ([str(name) for name in arrays[f"{prefix}index"]],
+                                                [int(year) for year in arrays[f"{prefix}years"]],
+                                                np.asarray(arrays[f"{prefix}values"], dtype=float))
+        self._cpi_frames = {}
+
+    def _get_cpi_frame(self, is_regions: bool):
+        # DataFrame строится только по запросу: при загрузке из кэша pandas не нужен
+        table = self._cpi_tables.get(is_regions)
+        if table is None:
+            return None
+        if is_regions not in self._cpi_frames:
+            index, years, values = table
+            index_name = "region" if is_regions else "federal_district"
+            self._cpi_frames[is_regions] = pd.DataFrame(values, index=pd.Index(index, name=index_name), columns=years)
+        return self._cpi_frames[is_regions]
+
+    @property
+    def regions_cpi(self):
+        return self._get_cpi_frame(True)
+
+    @property
+    def districts_cpi(self):
+        return self._get_cpi_frame(False)
+
+    def _cpi_arrays(self) -> dict:
+        arrays = {}
+        for is_regions, prefix in ((True, "regions_"), (False, "districts_")):
+            if is_regions in self._cpi_tables:
+                index, years, values = self._cpi_tables[is_regions]
+                arrays[f"{prefix}index"] = np.array(index, dtype=str)
+                arrays[f"{prefix}years"] = np.array(years, dtype=np.int64)
+                arrays[f"{prefix}values"] = values
+        return arrays
+
+    def _store_arrays(self) -> dict:
+        """Исходные таблицы ИПЦ и префиксные матрицы для хранилища"""
+        arrays = self._cpi_arrays()
+        for is_regions, prefix in ((True, "regions_"), (False, "districts_")):
+            if is_regions in self._cpi_matrices:
+                arrays[f"{prefix}prefix"] = self._cpi_matrices[is_regions]["prefix"]
+        return arrays
+
+    def _save_cpi_cache(self):
+        arrays = self._cpi_arrays()
+        if arrays:
+            save_arrays(CPI_CACHE_NAME, self._cpi_source_files(), arrays)
+
     def _load_cpi_data(self):
         try:
             regions_path = self._get_data_path("regional_cpi.xlsx")
             if os.path.exists(regions_path):
                 df = pd.read_excel(regions_path)
                 df.set_index('region', inplace=True)
-                self.regions_cpi = df / 100
+                self._set_cpi_table(True, df / 100)
 
             districts_path = self._get_data_path("federal_cpi.xlsx")
             if os.path.exists(districts_path):
                 df = pd.read_excel(districts_path)
                 df.set_index('federal_district', inplace=True)
-                self.districts_cpi = df / 100
+                self._set_cpi_table(False, df / 100)
         except Exception as e:
             print(f"Ошибка загрузки данных ИПЦ: {e}")
 
+    def _set_cpi_table(self, is_regions: bool, df):
+        self._cpi_tables[is_regions] = ([str(name) for name in df.index], [int(year) for year in df.columns],
+                                        df.to_numpy(dtype=float))
+        self._cpi_frames.pop(is_regions, None)
+
+    def _build_cpi_matrices(self, prefixes: Optional[Dict[bool, np.ndarray]] = None):
+        # Накопленный ИПЦ (префиксное произведение) по регионам × календарным годам:
+        # prefix[:, k] - произведение индексов всех лет до k-го, поэтому
+        # коэффициент между любыми двумя годами - одно деление.
+        # Как при прямом перемножении по годам: пропущенный в таблице год внутри диапазона дает
+        # коэффициент 1.0, а пустые и неположительные индексы (NaN, 0) не входят в префикс -
+        # диапазоны с ними перемножаются напрямую (_range_factors), чтобы не испортить остальные годы.
+        # prefixes - готовые матрицы из хранилища (для таблиц без пропусков).
+        self._row_alignments.clear()
+        for is_regions, (index, years, values) in self._cpi_tables.items():
+            first_year = min(years) if years else 0
+            calendar = len(range(first_year, max(years) + 1)) if years else 0
+            positions = np.array([year - first_year for year in years], dtype=np.intp)
+
+            cpi = np.full((values.shape[0], calendar), np.nan)
+            cpi[:, positions] = values
+            missing = np.ones(calendar, dtype=bool)
+            missing[positions] = False
+            gap_prefix = np.concatenate(([0], np.cumsum(missing)))
+            with np.errstate(invalid="ignore"):
+                invalid = ~(np.isfinite(cpi) & (cpi > 0))
+
+            if prefixes and is_regions in prefixes and not invalid.any() and list(years) == sorted(years):
+                prefix = prefixes[is_regions]
+            else:
+                log_cpi = np.log(np.where(invalid, 1.0, cpi))
+                log_prefix = np.zeros((log_cpi.shape[0], log_cpi.shape[1] + 1))
+                np.cumsum(log_cpi, axis=1, out=log_prefix[:, 1:])
+                prefix = np.exp(log_prefix)
+                prefix.flags.writeable = False
+
+            invalid_prefix = None
+            if invalid.any():
+                invalid_prefix = np.zeros((invalid.shape[0], invalid.shape[1] + 1), dtype=np.int64)
+                np.cumsum(invalid, axis=1, out=invalid_prefix[:, 1:])
+
+            self._cpi_matrices[is_regions] = {
+                "prefix": prefix,
+                "cpi": cpi,
+                "invalid_prefix": invalid_prefix,
+                "gap_prefix": gap_prefix,
+                "region_index": {region: i for i, region in enumerate(index)},
+                "year_index": {year: year - first_year for year in years}
+            }
+
+    @staticmethod
+    def _range_factors(matrix: dict, rows: np.ndarray, from_pos: np.ndarray, to_pos: int) -> np.ndarray:
+        """Коэффициенты пересчета с позиций from_pos на to_pos для строк rows: матрица строки × позиции"""
+        prefix = matrix["prefix"][rows]
+        factors = prefix[:, [to_pos]] / prefix[:, from_pos]
+        low = np.minimum(from_pos, to_pos)
+        high = np.maximum(from_pos, to_pos)
+
+        invalid_prefix = matrix["invalid_prefix"]
+        if invalid_prefix is not None:
+            invalid = invalid_prefix[rows][:, high] - invalid_prefix[rows][:, low] > 0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                for i, j in zip(*np.nonzero(invalid)):
+                    product = np.prod(matrix["cpi"][rows[i], low[j]:high[j]])
+                    factors[i, j] = product if from_pos[j] < to_pos else 1.0 / product
+
+        gap_prefix = matrix["gap_prefix"]
+        factors[:, gap_prefix[high] - gap_prefix[low] > 0] = 1.0
+        return factors
+
     def calculate_cumulative_inflation(self, region: str, from_year: int, to_year: int,
                                        is_regions: bool = True) -> float:
-        cpi_data = self.regions_cpi if is_regions else self.districts_cpi
-
-        if cpi_data is None:
+        matrix = self._cpi_matrices.get(is_regions)
+        if matrix is None:
             return 1.0
 
-        if region not in cpi_data.index:
+        row = matrix["region_index"].get(region)
+        from_pos = matrix["year_index"].get(from_year)
+        to_pos = matrix["year_index"].get(to_year)
+        if row is None or from_pos is None or to_pos is None or from_year == to_year:
             return 1.0
 
-        try:
-            if from_year not in cpi_data.columns or to_year not in cpi_data.columns:
-                return 1.0
+        return float(self._range_factors(matrix, np.array([row]), np.array([from_pos]), to_pos)[0, 0])
 
-            if from_year == to_year:
-                return 1.0
+    def _align_rows(self, region_ids: Sequence[str], is_regions: bool) -> np.ndarray:
+        key = (is_regions, tuple(region_ids))
+        rows = self._row_alignments.get(key)
+        if rows is None:
+            region_index = self._cpi_matrices[is_regions]["region_index"]
+            rows = np.array([region_index.get(region, -1) for region in region_ids], dtype=np.intp)
+            rows.flags.writeable = False
+            self._row_alignments.set(key, rows)
+        return rows
 
-            if from_year < to_year:
-                cumulative = 1.0
-                for year in range(from_year, to_year):
-                    cpi = cpi_data.loc[region, year]
-                    cumulative *= cpi
-            else:
-                cumulative = 1.0
-                for year in range(to_year, from_year):
-                    cpi = cpi_data.loc[region, year]
-                    cumulative *= cpi
-                cumulative = 1.0 / cumulative
-
-            return cumulative
-        except Exception:
-            return 1.0
+    def get_inflation_factors(self, region_ids: Sequence[str], from_year: int, to_year: int,
+                              is_regions: bool = True) -> np.ndarray:
+        """Коэффициенты пересчета from_year -> to_year для списка регионов (1.0, если ИПЦ нет)"""
+        factors = np.ones(len(region_ids))
+        matrix = self._cpi_matrices.get(is_regions)
+        if matrix is None or from_year == to_year:
+            return factors
+
+        from_pos = matrix["year_index"].get(from_year)
+        to_pos = matrix["year_index"].get(to_year)
+        if from_pos is None or to_pos is None:
+            return factors
+
+        rows = self._align_rows(region_ids, is_regions)
+        known = rows >= 0
+        factors[known] = self._range_factors(matrix, rows[known], np.array([from_pos]), to_pos)[:, 0]
+        return factors
+
+    def get_inflation_matrix(self, region_ids: Sequence[str], from_years: Sequence[int], to_year: int,
+                             is_regions: bool = True) -> np.ndarray:
+        """Коэффициенты пересчета каждого из from_years -> to_year: матрица регионы × годы"""
+        factors = np.ones((len(region_ids), len(from_years)))
+        matrix = self._cpi_matrices.get(is_regions)
+        if matrix is None:
+            return factors
+
+        to_pos = matrix["year_index"].get(to_year)
+        if to_pos is None:
+            return factors
+
+        from_pos = np.array([matrix["year_index"].get(year, -1) for year in from_years], dtype=np.intp)
+        rows = self._align_rows(region_ids, is_regions)
+        known_rows = np.flatnonzero(rows >= 0)
+        known_years = np.flatnonzero(from_pos >= 0)
+        if known_rows.size and known_years.size:
+            factors[np.ix_(known_rows, known_years)] = self._range_factors(matrix, rows[known_rows],
+                                                                           from_pos[known_years], to_pos)
+        return factors
+
+    def adjust_array(self, values: np.ndarray, region_ids: Sequence[str], from_year: int, to_year: int,
+                     is_regions: bool = True) -> np.ndarray:
+        """Пересчет вектора значений за from_year в цены to_year; NaN остаются NaN"""
+        return np.asarray(values, dtype=float) * self.get_inflation_factors(region_ids, from_year, to_year, is_regions)
 
+    @timed("adjust_value")
     def adjust_value(self, value: float, region: str, data_year: int, target_year: int,
                      is_regions: bool = True) -> float:
         if value is None or value == 0:
@@ -75,8 +283,8 @@ class PriceAdjuster:
         return adjusted_value
 
     def get_available_base_years(self) -> list:
-        if self.regions_cpi is not None:
-            return [int(col) for col in self.regions_cpi.columns]
+        if True in self._cpi_tables:
+            return list(self._cpi_tables[True][1])
         return list(range(2000, 2024))
 
-price_adjuster = PriceAdjuster()
\ No newline at end of file
+price_adjuster = PriceAdjuster(store_path=get_store_path())
\ No newline at end of file
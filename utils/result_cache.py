@@ -0,0 +1,107 @@
+# LRU-кэш готовых результатов (данные карты, легенда) с ограничением по объему в байтах
+#
+# Ключ - параметры состояния карты. Кэш сбрасывается целиком, если меняется
+# версия данных (version_fn), и считает попадания, промахи и вытеснения.
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from plotly.utils import PlotlyJSONEncoder
+
+
+def estimate_size(value: Any) -> int:
+    """Объем значения в байтах - по длине его JSON-представления (так же его отдает Dash)"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    try:
+        return len(json.dumps(value, cls=PlotlyJSONEncoder).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int, max_entries: Optional[int] = None,
+                 version_fn: Optional[Callable[[], Hashable]] = None,
+                 size_fn: Callable[[Any], int] = estimate_size):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.size_fn = size_fn
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None):
+        if size is None:
+            size = self.size_fn(value)
+        with self._lock:
+            self._check_version()
+            if size > self.max_bytes:
+                # Слишком большой результат не вытесняет весь кэш
+                self.rejected += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,157 @@
+# Структура производства: матрица долей секторов регионы × секторы
+#
+# Строится один раз на (год, уровень) и используется для преобладающего сектора,
+# долей показателей в суммарном объеме и индексов диверсификации. Кэши структур и долей
+# сбрасываются при смене версии данных; объем - SECTOR_CACHE_MAX_BYTES (по умолчанию 64 МБ),
+# с запасом на все годы обоих уровней, которые снимок данных строит до fork.
+
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from utils.indicators import PRODUCTION_INDICATORS
+from utils.result_cache import ResultCache
+
+# Секторы, из которых выбирается преобладающий
+DOMINANT_SECTORS = {
+    "mining_industry": "Добывающая",
+    "manufacturing_industry": "Обрабатывающая",
+    "agriculture": "Сельское хозяйство",
+    "services": "Сфера услуг"
+}
+
+# Все составляющие суммарного объема производства
+PRODUCTION_SECTORS = list(PRODUCTION_INDICATORS)
+
+DIVERSIFIED_LABEL = "Диверсифицированная"
+UNDEFINED_LABEL = "Не определен"
+# Если ни один сектор не дает хотя бы такой доли (%), экономика считается диверсифицированной
+DIVERSIFICATION_THRESHOLD = 25
+
+SECTOR_CACHE_MAX_BYTES = int(os.environ.get("SECTOR_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def _get_data_loader():
+    from utils.geo_utils import _get_data_loader as get_loader
+    return get_loader()
+
+
+def _data_version() -> str:
+    return _get_data_loader().get_data_version()
+
+
+def _structure_size(structure: "SectorStructure") -> int:
+    return structure.totals.nbytes + structure.values.nbytes + structure.shares.nbytes
+
+
+structure_cache = ResultCache(SECTOR_CACHE_MAX_BYTES, version_fn=_data_version, size_fn=_structure_size)
+share_cache = ResultCache(SECTOR_CACHE_MAX_BYTES, version_fn=_data_version, size_fn=lambda shares: shares.nbytes)
+
+
+class SectorStructure:
+    """Доли секторов в суммарном объеме производства регионов за один год.
+
+    shares - матрица регионы × PRODUCTION_SECTORS в процентах: NaN, если значения сектора нет,
+    0, если нет суммарного объема или он равен нулю. Строки выровнены по DataLoader.get_region_ids().
+    """
+
+    def __init__(self, year: int, is_regions: bool = True):
+        data_loader = _get_data_loader()
+        self.year = year
+        self.is_regions = is_regions
+        self.region_ids = data_loader.get_region_ids(is_regions)
+        self.sectors = list(PRODUCTION_SECTORS)
+
+        totals, total_mask = data_loader.get_indicator_array("total_volume", year, is_regions)
+        self.totals = np.where(total_mask, totals, np.nan)
+        self.has_totals = bool(total_mask.any())
+
+        values = np.full((len(self.region_ids), len(self.sectors)), np.nan)
+        for column, sector in enumerate(self.sectors):
+            sector_values, sector_mask = data_loader.get_indicator_array(sector, year, is_regions)
+            values[sector_mask, column] = sector_values[sector_mask]
+        self.values = values
+
+        self.shares = share_of_total(values, self.totals[:, None]) if self.has_totals else np.full(values.shape, np.nan)
+
+        for array in (self.totals, self.values, self.shares):
+            array.flags.writeable = False
+
+    def get_share_vector(self, sector: str) -> np.ndarray:
+        return self.shares[:, self.sectors.index(sector)]
+
+    def dominant_sectors(self) -> Dict[str, str]:
+        """Преобладающий сектор региона с порогом диверсификации DIVERSIFICATION_THRESHOLD"""
+        columns = [self.sectors.index(sector) for sector in DOMINANT_SECTORS]
+        labels = list(DOMINANT_SECTORS.values())
+
+        present = ~np.isnan(self.values[:, columns])
+        has_any = present.any(axis=1)
+        positive_total = np.nan_to_num(self.totals) > 0
+        # Отсутствующий сектор считается нулевым, как и при построчном расчете
+        shares = np.where(present & positive_total[:, None], np.nan_to_num(self.shares[:, columns]), 0.0)
+
+        best = shares.argmax(axis=1)
+        best_share = shares.max(axis=1)
+
+        result = {}
+        for i in np.flatnonzero(has_any):
+            result[self.region_ids[i]] = labels[best[i]] if best_share[i] >= DIVERSIFICATION_THRESHOLD else DIVERSIFIED_LABEL
+        return result
+
+    def herfindahl_index(self) -> np.ndarray:
+        """Индекс Херфиндаля-Хиршмана по долям всех секторов (0..1, NaN без данных)"""
+        fractions = self.shares / 100
+        index = np.nansum(fractions * fractions, axis=1)
+        index[np.isnan(fractions).all(axis=1) | ~(np.nan_to_num(self.totals) > 0)] = np.nan
+        return index
+
+
+def share_of_total(values: np.ndarray, totals: np.ndarray) -> np.ndarray:
+    """Доля values в totals, %: NaN без значения, 0 без суммарного объема или при нулевом объеме"""
+    values, totals = np.broadcast_arrays(values, totals)
+    shares = np.where(np.isnan(values), np.nan, 0.0)
+    divisible = ~np.isnan(values) & ~np.isnan(totals) & (np.nan_to_num(totals) != 0)
+    shares[divisible] = values[divisible] / totals[divisible] * 100
+    return shares
+
+
+def get_sector_structure(year: int, is_regions: bool = True) -> SectorStructure:
+    return structure_cache.get_or_compute((year, is_regions), lambda: SectorStructure(year, is_regions))
+
+
+def get_share_vector(data_type: str, year: int, is_regions: bool = True) -> np.ndarray:
+    """Доля показателя в суммарном объеме по всем регионам уровня, %"""
+    structure = get_sector_structure(year, is_regions)
+    if data_type in structure.sectors:
+        return structure.get_share_vector(data_type)
+
+    key = (data_type, year, is_regions)
+    shares = share_cache.get(key)
+    if shares is None:
+        values, mask = _get_data_loader().get_indicator_array(data_type, year, is_regions)
+        if structure.has_totals:
+            shares = share_of_total(np.where(mask, values, np.nan), structure.totals)
+        else:
+            shares = np.full(values.shape, np.nan)
+        shares.flags.writeable = False
+        share_cache.set(key, shares)
+    return shares
+
+
+def get_share_series(data_type: str, region_names: List[str], years: List[int],
+                     is_regions: bool = True) -> np.ndarray:
+    """Доли показателя для выбранных регионов по годам: матрица регионы × годы"""
+    from utils.comparison import align_to_regions
+    positions = align_to_regions(region_names, is_regions)
+    result = np.full((len(region_names), len(years)), np.nan)
+    known = positions >= 0
+    for column, year in enumerate(years):
+        result[known, column] = get_share_vector(data_type, year, is_regions)[positions[known]]
+    return result
+
+
+def clear_cache():
+    structure_cache.clear()
+    share_cache.clear()
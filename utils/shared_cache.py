@@ -0,0 +1,348 @@
+# Общий для всех процессов (воркеров gunicorn) кэш результатов на локальном диске
+#
+# Бэкенд выбирается переменными окружения:
+#   SHARED_CACHE_BACKEND   - "sqlite" (по умолчанию), "file" или "none";
+#   SHARED_CACHE_PATH      - файл базы SQLite или каталог файлового кэша (по умолчанию в cache/);
+#   SHARED_CACHE_TTL       - время жизни записи в секундах (по умолчанию сутки);
+#   SHARED_CACHE_MAX_BYTES - предельный объем кэша, старые записи вытесняются первыми.
+#
+# Значения сериализуются pickle: кэш пишет и читает только само приложение.
+# Ключ записи включает хеш исходного кода приложения (get_code_version): после обновления
+# кода записи, собранные прежней версией, не читаются и вытесняются по сроку жизни и объему.
+# Ошибки кэша не прерывают работу - запись просто считается отсутствующей.
+
+import abc
+import glob
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.data_cache import CACHE_DIR
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CODE_FILES = ("app.py", "utils/*.py", "assets/*.py")
+
+_MISSING = object()
+_code_version = None
+
+
+def get_code_version() -> str:
+    """Хеш модулей, которые строят кэшируемые значения (легенды, GeoJSON, компоненты аналитики)"""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha1()
+        for pattern in CODE_FILES:
+            for path in sorted(glob.glob(os.path.join(PROJECT_ROOT, pattern))):
+                digest.update(os.path.relpath(path, PROJECT_ROOT).encode("utf-8"))
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+def make_key(namespace: str, key: Hashable) -> str:
+    return hashlib.sha1(repr((get_code_version(), namespace, key)).encode("utf-8")).hexdigest()
+
+
+class NullCache:
+    """Кэш отключен: всегда промах"""
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        return default
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: Optional[float] = None):
+        pass
+
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        return compute()
+
+    def clear(self):
+        pass
+
+    def reset(self):
+        """Забыть соединения, унаследованные от родительского процесса"""
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"backend": "none"}
+
+
+class _SharedCacheBase(NullCache, abc.ABC):
+    backend = None
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @abc.abstractmethod
+    def _read(self, key: str) -> Optional[bytes]:
+        """Сериализованное значение записи или None, если ее нет или срок истек"""
+
+    @abc.abstractmethod
+    def _write(self, key: str, payload: bytes, expires: float):
+        """Сохранить сериализованное значение до момента expires (time.time())"""
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        try:
+            payload = self._read(make_key(namespace, key))
+            if payload is not None:
+                value = pickle.loads(payload)
+                self.hits += 1
+                return value
+        except Exception as e:
+            self.errors += 1
+            print(f"Ошибка чтения общего кэша: {e}")
+        self.misses += 1
+        return default
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: Optional[float] = None):
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(payload) > self.max_bytes:
+                return
+            expires = time.time() + (self.ttl if ttl is None else ttl)
+            self._write(make_key(namespace, key), payload, expires)
+        except Exception as e:
+            self.errors += 1
+            print(f"Ошибка записи общего кэша: {e}")
+
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(namespace, key, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {"backend": self.backend, "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+class SQLiteCache(_SharedCacheBase):
+    """Кэш в базе SQLite в режиме WAL: читатели не блокируют писателя
+
+    Чтение ничего не пишет в базу: время доступа для вытеснения копится в памяти и записывается
+    одним запросом - при записи в кэш, раз в ACCESS_FLUSH_INTERVAL секунд или по ACCESS_FLUSH_ENTRIES
+    отметкам. Просроченные записи удаляются при записи.
+    """
+    backend = "sqlite"
+    ACCESS_FLUSH_INTERVAL = 30.0
+    ACCESS_FLUSH_ENTRIES = 256
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(path, ttl, max_bytes)
+        self._local = threading.local()
+        self._accessed = {}
+        self._accessed_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение на поток и на процесс: после fork унаследованное соединение не используется
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                key TEXT PRIMARY KEY,
+                                value BLOB NOT NULL,
+                                size INTEGER NOT NULL,
+                                expires REAL NOT NULL,
+                                accessed REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def reset(self):
+        self._local = threading.local()
+        with self._accessed_lock:
+            self._accessed = {}
+
+    def _take_accessed(self) -> Dict[str, float]:
+        with self._accessed_lock:
+            accessed, self._accessed = self._accessed, {}
+            self._last_flush = time.monotonic()
+        return accessed
+
+    def _flush_accessed(self):
+        accessed = self._take_accessed()
+        if not accessed:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                                 [(when, key) for key, when in accessed.items()])
+        except sqlite3.Error:
+            # Время доступа нужно только для порядка вытеснения - потеря отметок не ошибка
+            pass
+
+    def _read(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or row[1] < now:
+            return None
+        with self._accessed_lock:
+            self._accessed[key] = now
+            due = len(self._accessed) >= self.ACCESS_FLUSH_ENTRIES or \
+                time.monotonic() - self._last_flush >= self.ACCESS_FLUSH_INTERVAL
+        if due:
+            self._flush_accessed()
+        return row[0]
+
+    def _write(self, key: str, payload: bytes, expires: float):
+        conn = self._connection()
+        accessed = self._take_accessed()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if accessed:
+                conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                                 [(when, accessed_key) for accessed_key, when in accessed.items()])
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                         (key, payload, len(payload), expires, now))
+            conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                # Вытесняем давно не читавшиеся записи, пока не уложимся в лимит
+                for old_key, size in conn.execute("SELECT key, size FROM entries WHERE key != ? ORDER BY accessed",
+                                                  (key,)).fetchall():
+                    conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM entries")
+        except sqlite3.Error as e:
+            print(f"Ошибка очистки общего кэша: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        result = super().stats()
+        try:
+            entries, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            result.update(entries=entries, bytes=size)
+        except sqlite3.Error:
+            pass
+        return result
+
+
+class FileCache(_SharedCacheBase):
+    """Кэш в каталоге: одна запись - один файл, запись через временный файл и os.replace"""
+    backend = "file"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pkl")
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                expires = float(f.readline())
+                payload = f.read()
+        except (OSError, ValueError):
+            return None
+        if expires < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            # Время доступа для вытеснения давно не читавшихся записей
+            os.utime(path)
+        except OSError:
+            pass
+        return payload
+
+    def _write(self, key: str, payload: bytes, expires: float):
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(f"{expires!r}\n".encode("ascii"))
+                f.write(payload)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(keep=self._entry_path(key))
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self, keep: str):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        if os.path.isdir(self.path):
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, int]:
+        result = super().stats()
+        if os.path.isdir(self.path):
+            entries = self._entries()
+            result.update(entries=len(entries), bytes=sum(size for _, size, _ in entries))
+        return result
+
+
+def create_shared_cache():
+    backend = os.environ.get("SHARED_CACHE_BACKEND", "sqlite").lower()
+    ttl = float(os.environ.get("SHARED_CACHE_TTL", DEFAULT_TTL))
+    max_bytes = int(os.environ.get("SHARED_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+    if backend == "sqlite":
+        path = os.environ.get("SHARED_CACHE_PATH", os.path.join(CACHE_DIR, "shared.sqlite3"))
+        return SQLiteCache(path, ttl, max_bytes)
+    if backend == "file":
+        path = os.environ.get("SHARED_CACHE_PATH", os.path.join(CACHE_DIR, "shared"))
+        return FileCache(path, ttl, max_bytes)
+    if backend != "none":
+        print(f"Неизвестный бэкенд общего кэша: {backend}, кэш отключен")
+    return NullCache()
+
+
+shared_cache = create_shared_cache()
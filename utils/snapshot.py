@@ -0,0 +1,69 @@
+# Неизменяемый снимок данных для запуска gunicorn с preload_app
+#
+# Мастер-процесс до fork строит все разделяемые структуры (массивы показателей,
+# матрицы ИПЦ, разобранную геометрию, структуру секторов) и замораживает их в gc,
+# чтобы воркеры использовали эти страницы памяти совместно (copy-on-write).
+
+import gc
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from utils.geometry_build import GEOJSON_FILES
+
+
+def prepare_snapshot(file_paths: Optional[List[str]] = None) -> Dict:
+    """Построить все данные, которые воркеры должны получить готовыми; вызывается в мастере до fork"""
+    start = time.perf_counter()
+
+    from utils.data_loader import data_loader
+    from utils.price_adjuster import price_adjuster
+    from utils.geo_utils import DETAIL_LEVELS, get_geometry_json, set_data_loader
+    from utils.sector_structure import get_sector_structure
+
+    set_data_loader(data_loader)
+    data_loader.get_data_version()
+
+    geometry_count = 0
+    for file_path in file_paths or GEOJSON_FILES:
+        if not os.path.exists(file_path):
+            continue
+        for level in DETAIL_LEVELS.values():
+            get_geometry_json(file_path, level["value"])
+            geometry_count += 1
+
+    for is_regions in (True, False):
+        for year in data_loader.get_available_years():
+            get_sector_structure(year, is_regions)
+
+    # Все созданные объекты переносятся в постоянное поколение: сборщик мусора
+    # больше не обходит их и не трогает страницы, общие с мастером
+    gc.collect()
+    gc.freeze()
+
+    summary = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "geometry": geometry_count,
+        "cpi_levels": len(price_adjuster._cpi_matrices),
+        "frozen_objects": gc.get_freeze_count()
+    }
+    print(f"Снимок данных подготовлен за {summary['seconds']} с: геометрий {summary['geometry']}, "
+          f"заморожено объектов {summary['frozen_objects']}")
+    return summary
+
+
+def after_fork():
+    """Сброс состояния, которое нельзя делить между процессами; вызывается в воркере сразу после fork"""
+    random.seed()
+
+    from utils.shared_cache import shared_cache
+    shared_cache.reset()
+
+    # Замеры мастер-процесса при подготовке снимка не относятся к воркеру
+    from utils.metrics import metrics
+    metrics.reset()
+
+    # Время запуска воркера отсчитывается от fork
+    from utils.startup import mark_boot
+    mark_boot()
@@ -0,0 +1,116 @@
+# Быстрый запуск: отложенный импорт тяжелых модулей и замеры фаз запуска
+#
+# Фазы отмечаются вызовами startup_checkpoint(<фаза>) по ходу импорта приложения - каждая
+# фаза длится от предыдущей отметки. startup_complete() печатает итог, а track_first_request
+# добавляет время от запуска процесса (или fork воркера) до первого запроса. Все значения
+# доступны в метриках как startup_seconds{phase="..."}.
+#
+# Отложенные модули (lazy_module) нужно загрузить до того, как сервер начнет принимать запросы
+# (load_lazy_modules в wsgi.py и при запуске app.py): импорт pandas занимает около секунды,
+# и в это время другие потоки (кодировщик JSON plotly, прогрев карты) видят в sys.modules
+# недозагруженный модуль.
+#
+# Настройки:
+#   STARTUP_LOG=0  - не печатать фазы запуска;
+#   LAZY_STARTUP=1 - не строить начальные данные карты при импорте: их отдает первый
+#                    callback, когда сервер уже принимает запросы.
+
+import importlib
+import os
+import threading
+import time
+from typing import Dict, List
+
+STARTUP_LOG = os.environ.get("STARTUP_LOG", "1") != "0"
+LAZY_STARTUP = os.environ.get("LAZY_STARTUP", "0") == "1"
+
+startup_phases: Dict[str, float] = {}
+_lazy_modules: List["LazyModule"] = []
+
+
+def _process_age() -> float:
+    """Время с запуска процесса по /proc (включает запуск интерпретатора); 0, если /proc недоступен"""
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+_boot_time = time.perf_counter() - _process_age()
+_last_checkpoint = _boot_time
+_first_request_lock = threading.Lock()
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к его атрибуту"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    module = LazyModule(name)
+    _lazy_modules.append(module)
+    return module
+
+
+def load_lazy_modules():
+    """Импортировать все отложенные модули; вызывается до приема запросов, пока работает один поток"""
+    start = time.perf_counter()
+    for module in _lazy_modules:
+        module.load()
+    startup_phases["modules"] = round(time.perf_counter() - start, 4)
+
+
+def startup_checkpoint(phase: str):
+    """Завершить фазу запуска: ее длительность - время с предыдущей отметки"""
+    global _last_checkpoint
+    now = time.perf_counter()
+    startup_phases[phase] = round(now - _last_checkpoint, 4)
+    _last_checkpoint = now
+
+
+def startup_complete():
+    startup_phases["total"] = round(time.perf_counter() - _boot_time, 4)
+    if STARTUP_LOG:
+        phases = ", ".join(f"{phase} {seconds:.2f}" for phase, seconds in startup_phases.items() if phase != "total")
+        print(f"Приложение запущено за {startup_phases['total']:.2f} с ({phases})")
+
+
+def mark_boot():
+    """Новая точка отсчета для фаз и первого запроса; вызывается в воркере сразу после fork"""
+    global _boot_time, _last_checkpoint
+    _boot_time = _last_checkpoint = time.perf_counter()
+    startup_phases.pop("first_request", None)
+
+
+def track_first_request(server):
+    """Время от запуска процесса до первого запроса к серверу Flask"""
+
+    @server.before_request
+    def record_first_request():
+        if "first_request" in startup_phases:
+            return
+        with _first_request_lock:
+            if "first_request" not in startup_phases:
+                startup_phases["first_request"] = round(time.perf_counter() - _boot_time, 4)
+                if STARTUP_LOG:
+                    print(f"Первый запрос через {startup_phases['first_request']:.2f} с после запуска "
+                          f"(pid {os.getpid()})")
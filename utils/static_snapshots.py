@@ -0,0 +1,237 @@
+# Статические снимки карты: данные, hideout и легенда каждого состояния в виде сжатых JSON
+#
+# Пространство состояний конечно: показатели кейсов × годы × слои × уровни детализации ×
+# годы пересчета цен × режим значений. python build_cache.py snapshots считает их все в пуле
+# процессов и пишет в <каталог>/<версия снимка>/ файлы .json.gz (и .json.br, если установлен
+# brotli) с manifest.json. В режиме "vectors" данные не зависят от детализации - файлы общие.
+# Версия снимка - хеш версии данных, кода приложения, формата и режима карты: она же входит
+# в URL файлов, поэтому после обновления кода браузер не берет из кэша прежние состояния.
+#
+# STATIC_SNAPSHOTS=1 включает раздачу: браузер сам загружает файл состояния (маршрут Flask
+# с долгим кэшированием или любой статический сервер по STATIC_SNAPSHOTS_URL), и сервер
+# считает только состояния, которых нет в снимке (например, сравнение годов).
+# STATIC_SNAPSHOTS_PATH - каталог снимков (по умолчанию cache/static_maps).
+
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from plotly.utils import PlotlyJSONEncoder
+
+from utils.data_cache import CACHE_DIR
+from utils.shared_cache import get_code_version
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_SNAPSHOTS = os.environ.get("STATIC_SNAPSHOTS", "0") == "1"
+STATIC_SNAPSHOTS_PATH = os.environ.get("STATIC_SNAPSHOTS_PATH", os.path.join(CACHE_DIR, "static_maps"))
+STATIC_SNAPSHOTS_URL = os.environ.get("STATIC_SNAPSHOTS_URL", "")
+STATIC_ROUTE = "/static-maps"
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+CACHE_MAX_AGE = 31536000
+
+# Аргументы build_map_payload: слой, детализация, год, показатель, год сравнения,
+# режим сравнения, режим значений, год пересчета цен
+MapState = Tuple[str, str, int, str, str, str, str, str]
+
+
+def snapshot_name(layer: str, detail_level: str, data_type: str, year, adjustment_year, display_mode: str,
+                  with_detail: bool) -> str:
+    """Путь файла состояния относительно каталога версии (тот же путь строит assets/static_maps.js)"""
+    detail_part = f"{detail_level}/" if with_detail else ""
+    return f"{layer}/{detail_part}{data_type}/{year}_{adjustment_year}_{display_mode}.json"
+
+
+def get_snapshot_version(data_version: str, mode: str) -> str:
+    """Версия снимка: меняется вместе с данными, кодом, форматом файлов и режимом карты"""
+    key = repr((SNAPSHOT_FORMAT_VERSION, data_version, get_code_version(), mode))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def enumerate_states(layers: Sequence[str], detail_levels: Sequence[str], data_types: Sequence[str],
+                     years: Sequence[int], adjustment_years: Sequence[str],
+                     display_modes: Sequence[str] = ("absolute", "relative")) -> List[MapState]:
+    """Все состояния без сравнения годов; detail_levels - один уровень, если данные от него не зависят"""
+    return [(layer, detail_level, year, data_type, "none", "absolute", display_mode, adjustment_year)
+            for layer, detail_level, data_type, year, adjustment_year, display_mode
+            in product(layers, detail_levels, data_types, years, adjustment_years, display_modes)]
+
+
+def encode_payload(geojson_data, hideout, legend) -> bytes:
+    """JSON состояния в той же кодировке, в какой Dash отдает ответ callback'а"""
+    return json.dumps({"data": geojson_data, "hideout": hideout, "legend": legend},
+                      cls=PlotlyJSONEncoder, separators=(",", ":")).encode("utf-8")
+
+
+def compress_payload(payload: bytes) -> Dict[str, bytes]:
+    variants = {".gz": gzip.compress(payload, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(payload, quality=11)
+    return variants
+
+
+# Сборка
+
+def _render_states(args) -> Dict[str, Dict]:
+    """Задача пула: посчитать состояния и записать их файлы; возвращает размеры для манифеста"""
+    target_dir, states, with_detail = args
+    import app
+
+    files = {}
+    for layer, detail_level, year, data_type, compare_year, comparison_mode, display_mode, adjustment_year \
+            in states:
+        geojson_data, hideout, legend = app.build_map_payload(layer, detail_level, year, data_type, compare_year,
+                                                              comparison_mode, display_mode, adjustment_year)
+        payload = encode_payload(None if geojson_data is app.dash.no_update else geojson_data, hideout, legend)
+        name = snapshot_name(layer, detail_level, data_type, year, adjustment_year, display_mode, with_detail)
+        path = os.path.join(target_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"bytes": len(payload)}
+        for suffix, data in compress_payload(payload).items():
+            with open(path + suffix, "wb") as f:
+                f.write(data)
+            entry[suffix.lstrip(".")] = len(data)
+        files[name] = entry
+    return files
+
+
+def build_snapshots(path: Optional[str] = None, processes: Optional[int] = None) -> str:
+    """Посчитать все состояния карты и записать снимок текущей версии данных"""
+    import app
+    from utils.snapshot import after_fork
+
+    started = time.perf_counter()
+    with_detail = app.MAP_UPDATE_MODE != "vectors"
+    data_types = list(dict.fromkeys(["none"] + [indicator for case in app.CASES.values()
+                                                for indicator in case["allowed_indicators"]]))
+    detail_levels = list(app.DETAIL_LEVELS) if with_detail else ["high"]
+    states = enumerate_states(list(app.LAYER_FILES), detail_levels, data_types, app.AVAILABLE_YEARS,
+                              ["none"] + app.PRICE_ADJUSTMENT_YEARS)
+    data_version = app.get_data_version()
+    version = get_snapshot_version(data_version, app.MAP_UPDATE_MODE)
+
+    root = os.path.abspath(path or STATIC_SNAPSHOTS_PATH)
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=f".{version}.")
+    try:
+        # Задача - все состояния одного слоя и показателя: легенды и векторы соседних лет
+        # переиспользуются внутри процесса
+        groups = {}
+        for state in states:
+            groups.setdefault((state[0], state[3]), []).append(state)
+        tasks = [(tmp_dir, group, with_detail) for group in groups.values()]
+
+        files = {}
+        if processes == 1:
+            for task in tasks:
+                files.update(_render_states(task))
+        else:
+            # fork: процессы пула получают уже загруженное приложение и данные
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            with ProcessPoolExecutor(processes or os.cpu_count(), mp_context=context,
+                                     initializer=after_fork) as pool:
+                for result in pool.map(_render_states, tasks):
+                    files.update(result)
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "data_version": data_version,
+            "code_version": get_code_version(),
+            "mode": app.MAP_UPDATE_MODE,
+            "with_detail": with_detail,
+            "encodings": ["gzip"] + (["br"] if brotli is not None else []),
+            "created": int(time.time()),
+            "files": files
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.chmod(tmp_dir, 0o755)
+
+        target = os.path.join(root, version)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(tmp_dir, target)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Снимки прежних версий данных и кода больше не раздаются
+    for name in os.listdir(root):
+        if name != version and not name.startswith(".") and os.path.isdir(os.path.join(root, name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    raw_bytes = sum(entry["bytes"] for entry in files.values())
+    gz_bytes = sum(entry["gz"] for entry in files.values())
+    print(f"Снимок карты: {len(files)} состояний, {raw_bytes / 2 ** 20:.1f} МБ JSON, "
+          f"{gz_bytes / 2 ** 20:.1f} МБ gzip, за {time.perf_counter() - started:.1f} с")
+    return target
+
+
+# Раздача
+
+def load_manifest(version: str, path: Optional[str] = None) -> Optional[Dict]:
+    """Манифест снимка текущих данных, кода и режима карты (None - снимка нет: он устарел или не собран)"""
+    manifest_path = os.path.join(path or STATIC_SNAPSHOTS_PATH, version, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        print(f"Статический снимок карты {manifest_path} не найден (нужна пересборка после обновления "
+              f"данных или кода), карта считается сервером")
+        return None
+    return manifest
+
+
+def install_static_snapshots(server, data_version: str, mode: str,
+                             relative_path: Callable[[str], str]) -> Optional[Dict]:
+    """Маршрут раздачи снимка и настройки для браузера (None - раздача выключена)"""
+    if not STATIC_SNAPSHOTS:
+        return None
+    version = get_snapshot_version(data_version, mode)
+    manifest = load_manifest(version)
+    if manifest is None:
+        return None
+
+    import flask
+    from werkzeug.security import safe_join
+
+    root = os.path.abspath(STATIC_SNAPSHOTS_PATH)
+
+    @server.route(f"{STATIC_ROUTE}/<version>/<path:name>")
+    def serve_static_snapshot(version, name):
+        path = safe_join(root, version, name)
+        if path is None or not name.endswith(".json"):
+            flask.abort(404)
+        accepted = flask.request.accept_encodings
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if accepted[encoding] and os.path.exists(path + suffix):
+                response = flask.send_file(path + suffix, mimetype="application/json", max_age=CACHE_MAX_AGE)
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            # Клиент без поддержки сжатия - редкий случай, распаковка на лету
+            if not os.path.exists(path + ".gz"):
+                flask.abort(404)
+            with gzip.open(path + ".gz", "rb") as f:
+                response = flask.Response(f.read(), mimetype="application/json")
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = f"public, max-age={CACHE_MAX_AGE}, immutable"
+        return response
+
+    base = STATIC_SNAPSHOTS_URL.rstrip("/") or relative_path(STATIC_ROUTE)
+    print(f"Статический снимок карты: {len(manifest['files'])} состояний")
+    return {"base": f"{base}/{version}/", "with_detail": manifest["with_detail"]}
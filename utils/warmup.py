@@ -0,0 +1,213 @@
+# Прогрев кэшей карты и упреждающий расчет соседних состояний
+#
+# После запуска воркера фоновый поток заранее считает данные карты для самых частых
+# состояний (показатель, год, слой, детализация). Список берется:
+#   WARMUP_STATES     - из файла JSON со списком состояний (статическая конфигурация), или
+#   WARMUP_STATS_PATH - из записанной статистики обращений (по умолчанию cache/map_access.json),
+#   иначе - показатели кейсов по порядку за год по умолчанию.
+# WARMUP_TOP_N ограничивает число состояний (по умолчанию 20), WARMUP_ENABLED=0 отключает прогрев.
+#
+# Когда пользователь меняет карту, тот же поток считает вероятные следующие состояния
+# (соседние годы текущего показателя); PREFETCH_ENABLED=0 отключает упреждающий расчет.
+#
+# Статистика обращений копится в памяти и раз в WARMUP_STATS_FLUSH секунд (и при выходе)
+# добавляется к файлу; воркеры дописывают ее под блокировкой файла.
+
+import atexit
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.data_cache import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "1") != "0"
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "1") != "0"
+WARMUP_TOP_N = int(os.environ.get("WARMUP_TOP_N", 20))
+WARMUP_STATES = os.environ.get("WARMUP_STATES", "")
+WARMUP_STATS_PATH = os.environ.get("WARMUP_STATS_PATH", os.path.join(CACHE_DIR, "map_access.json"))
+WARMUP_STATS_FLUSH = float(os.environ.get("WARMUP_STATS_FLUSH", 60))
+
+PREFETCH_QUEUE_SIZE = 256
+
+# (показатель, год, слой, детализация)
+WarmupState = Tuple[str, int, str, str]
+
+
+def parse_state(item) -> Optional[WarmupState]:
+    """Состояние из записи конфигурации: список [показатель, год, слой, детализация] или словарь"""
+    try:
+        if isinstance(item, dict):
+            item = [item["indicator"], item["year"], item.get("layer", "regions"), item.get("detail", "high")]
+        indicator, year, layer, detail = item[:4]
+        return str(indicator), int(year), str(layer), str(detail)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def load_states_file(path: str) -> List[WarmupState]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения списка прогрева {path}: {e}")
+        return []
+    return [state for state in map(parse_state, items) if state is not None]
+
+
+class AccessStats:
+    """Счетчики обращений к состояниям карты с накоплением в файле JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, state: WarmupState):
+        if self.path:
+            with self._lock:
+                self._pending[state] += 1
+
+    def _read(self) -> Counter:
+        counts = Counter()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for item in json.load(f):
+                    state = parse_state(item.get("state"))
+                    if state is not None:
+                        counts[state] += int(item.get("count", 0))
+        except (OSError, ValueError, AttributeError):
+            pass
+        return counts
+
+    def top(self, n: int) -> List[WarmupState]:
+        if not self.path:
+            return []
+        counts = self._read()
+        with self._lock:
+            counts.update(self._pending)
+        return [state for state, _ in counts.most_common(n)]
+
+    def save(self):
+        """Добавить накопленные обращения к файлу"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending or not self.path:
+            return
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".lock", "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                counts = self._read()
+                counts.update(pending)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".map_access.", suffix=".json")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump([{"state": list(state), "count": count} for state, count in counts.most_common()],
+                                  f, ensure_ascii=False)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+        except Exception as e:
+            print(f"Ошибка записи статистики обращений {self.path}: {e}")
+
+
+class Warmup:
+    """Фоновый поток: сначала прогрев списка состояний, затем очередь упреждающего расчета"""
+
+    def __init__(self):
+        self.compute: Optional[Callable[[Any], Any]] = None
+        self.states_fn: Optional[Callable[[], List[Any]]] = None
+        self.progress: Dict[str, float] = {"total": 0, "done": 0, "failed": 0, "seconds": 0.0}
+        self.prefetch_counts = Counter()
+        self.stats = AccessStats(WARMUP_STATS_PATH)
+        self._pid = None
+        self._thread = None
+        self._queue = None
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def configure(self, compute: Callable[[Any], Any], states_fn: Callable[[], List[Any]]):
+        """compute(state) считает и кэширует данные состояния; states_fn() - список для прогрева"""
+        self.compute = compute
+        self.states_fn = states_fn
+
+    def start(self):
+        """Запустить поток в текущем процессе (после fork - заново); повторный вызов ничего не делает"""
+        if self.compute is None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(PREFETCH_QUEUE_SIZE)
+            self._queued = set()
+            self.prefetch_counts.clear()
+            self._thread = threading.Thread(target=self._run, name="map-warmup", daemon=True)
+            self._thread.start()
+
+    def prefetch(self, states: Iterable[Any]):
+        """Поставить состояния в очередь упреждающего расчета"""
+        if not PREFETCH_ENABLED or self.compute is None:
+            return
+        self.start()
+        for state in states:
+            with self._lock:
+                if state in self._queued:
+                    continue
+                try:
+                    self._queue.put_nowait(state)
+                except queue.Full:
+                    self.prefetch_counts["dropped"] += 1
+                    continue
+                self._queued.add(state)
+            self.prefetch_counts["queued"] += 1
+
+    def _compute(self, state) -> bool:
+        try:
+            self.compute(state)
+            return True
+        except Exception as e:
+            print(f"Ошибка прогрева состояния {state}: {e}")
+            return False
+
+    def _run(self):
+        if WARMUP_ENABLED and self.states_fn is not None:
+            start = time.perf_counter()
+            states = self.states_fn()
+            self.progress.update(total=len(states), done=0, failed=0, seconds=0.0)
+            for state in states:
+                self.progress["done" if self._compute(state) else "failed"] += 1
+                self.progress["seconds"] = round(time.perf_counter() - start, 3)
+            print(f"Прогрев карты: {self.progress['done']} состояний за {self.progress['seconds']} с "
+                  f"(pid {os.getpid()})")
+
+        last_flush = time.monotonic()
+        while True:
+            try:
+                state = self._queue.get(timeout=WARMUP_STATS_FLUSH)
+            except queue.Empty:
+                state = None
+            if state is not None:
+                with self._lock:
+                    self._queued.discard(state)
+                self.prefetch_counts["done" if self._compute(state) else "failed"] += 1
+            if time.monotonic() - last_flush >= WARMUP_STATS_FLUSH:
+                self.stats.save()
+                last_flush = time.monotonic()
+
+
+warmup = Warmup()
+atexit.register(warmup.stats.save)
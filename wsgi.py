@@ -4,5 +4,9 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from app import app
+from utils.startup import load_lazy_modules
 
-application = app.server
\ No newline at end of file
+# pandas и plotly загружаются до приема запросов: в preload-мастере gunicorn или при запуске воркера
+load_lazy_modules()
+
+application = app.server